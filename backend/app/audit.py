@@ -0,0 +1,250 @@
+import glob
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+from dotenv import load_dotenv
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+from .database import engine
+from .models import Log
+
+try:
+    import fcntl
+except ImportError:  # no cross-process spool locking; run a single worker
+    fcntl = None
+
+load_dotenv()
+
+# "async" queues entries for a background writer, "sync" writes each entry in
+# the transaction of the change it describes: the entry is visible to /logs as
+# soon as the change is, and no spool directory is needed, at one INSERT per write
+AUDIT_MODE = os.getenv("AUDIT_MODE", "async").lower()
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+AUDIT_FLUSH_SECONDS = float(os.getenv("AUDIT_FLUSH_SECONDS", "1.0"))
+# fsync every spooled entry; without it entries survive a process crash but not power loss
+AUDIT_FSYNC = os.getenv("AUDIT_FSYNC", "false").lower() == "true"
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AUDIT_SPOOL_DIR = os.getenv("AUDIT_SPOOL_DIR", os.path.join(BASE_DIR, "audit_spool"))
+
+LOG_FIELDS = ("item_id", "action", "old_status", "new_status", "changed_by", "changed_at")
+
+
+def _value(enum_or_str):
+    return getattr(enum_or_str, "value", enum_or_str)
+
+
+def _lock(file, blocking=True):
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        return True
+    except OSError:
+        return False
+
+
+class AuditLog:
+    """Write-behind writer for the logs table.
+
+    Entries are recorded on the session making the change and only released
+    once it commits. In async mode they are then appended to this process's
+    spool segment (so a crash loses nothing) and queued; a background thread
+    bulk inserts the queue when it reaches AUDIT_BATCH_SIZE or every
+    AUDIT_FLUSH_SECONDS, then deletes the flushed segment. Segments left by a
+    crashed process or a failed insert are replayed by whichever worker locks
+    them first. Delivery is at least once: a crash between the insert and the
+    delete replays that batch.
+    """
+
+    def __init__(self, mode=AUDIT_MODE, spool_dir=AUDIT_SPOOL_DIR, batch_size=AUDIT_BATCH_SIZE, flush_seconds=AUDIT_FLUSH_SECONDS):
+        self.mode = mode
+        self.spool_dir = spool_dir
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._condition = threading.Condition()
+        self._queue = []
+        self._segment = None
+        self._thread = None
+        self._stopping = False
+        self._retry = False
+        self.flushed = 0
+        self.replayed = 0
+        self.failures = 0
+
+    # -- recording ---------------------------------------------------------
+
+    def record(self, db: Session, item_id, action, changed_by, old_status=None, new_status=None):
+        """Record an entry for a change about to be committed on db."""
+        entry = {
+            "item_id": item_id,
+            "action": action,
+            "old_status": _value(old_status),
+            "new_status": _value(new_status),
+            "changed_by": changed_by,
+            "changed_at": datetime.utcnow(),
+        }
+        if self.mode == "sync":
+            db.add(Log(**entry))
+        else:
+            # Session.info is shared with the AsyncSession wrapping it
+            db.info.setdefault("audit_entries", []).append(entry)
+
+    def _committed(self, session):
+        # Releasing a savepoint fires after_commit too; the entries wait for the real commit
+        if session.in_nested_transaction():
+            return
+        entries = session.info.pop("audit_entries", None)
+        if entries:
+            self._enqueue(entries)
+
+    def _rolled_back(self, session, previous_transaction):
+        # A savepoint rolling back leaves the changes recorded before it in place
+        if previous_transaction.parent is not None:
+            return
+        session.info.pop("audit_entries", None)
+
+    def _enqueue(self, entries):
+        lines = "".join(
+            json.dumps({**entry, "changed_at": entry["changed_at"].isoformat()}) + "\n" for entry in entries
+        )
+        with self._condition:
+            if self._segment is None:
+                os.makedirs(self.spool_dir, exist_ok=True)
+                path = os.path.join(self.spool_dir, f"audit-{uuid.uuid4().hex}.jsonl")
+                self._segment = open(path, "a", encoding="utf-8")
+                _lock(self._segment)
+            self._segment.write(lines)
+            self._segment.flush()
+            if AUDIT_FSYNC:
+                os.fsync(self._segment.fileno())
+            self._queue.extend(entries)
+            if len(self._queue) >= self.batch_size:
+                self._condition.notify()
+        self._ensure_started()
+
+    # -- writing -----------------------------------------------------------
+
+    def _insert(self, entries):
+        with engine.begin() as conn:
+            for start in range(0, len(entries), self.batch_size):
+                conn.execute(insert(Log).values([
+                    {field: entry[field] for field in LOG_FIELDS}
+                    for entry in entries[start:start + self.batch_size]
+                ]))
+
+    def flush(self):
+        """Insert everything queued so far; returns the number of entries written."""
+        with self._condition:
+            entries, self._queue = self._queue, []
+            segment, self._segment = self._segment, None
+        if segment is None:
+            return 0
+        # The segment stays locked until its entries are in the database
+        try:
+            if entries:
+                self._insert(entries)
+            os.remove(segment.name)
+        except Exception as error:
+            # Left in place unlocked: replay_orphans() retries it
+            self.failures += 1
+            self._retry = True
+            print(f"Audit log flush failed, {len(entries)} entries kept in {segment.name}: {error}")
+            return 0
+        finally:
+            segment.close()
+        self.flushed += len(entries)
+        return len(entries)
+
+    def replay_orphans(self):
+        """Insert spool segments no live writer holds (crashed processes, failed flushes)."""
+        own = self._segment.name if self._segment is not None else None
+        replayed = 0
+        for path in sorted(glob.glob(os.path.join(self.spool_dir, "audit-*.jsonl"))):
+            if path == own:
+                continue
+            try:
+                segment = open(path, "r", encoding="utf-8")
+            except FileNotFoundError:
+                continue
+            try:
+                if not _lock(segment, blocking=False):
+                    continue
+                # Another worker may have replayed and deleted it while we waited to open it
+                if not os.path.exists(path) or os.stat(path).st_ino != os.fstat(segment.fileno()).st_ino:
+                    continue
+                entries = []
+                for line in segment:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line from a crash mid-write
+                    entry["changed_at"] = datetime.fromisoformat(entry["changed_at"])
+                    entries.append(entry)
+                if entries:
+                    self._insert(entries)
+                os.remove(path)
+                replayed += len(entries)
+            except Exception as error:
+                self.failures += 1
+                self._retry = True
+                print(f"Audit log replay of {path} failed: {error}")
+            finally:
+                segment.close()
+        self.replayed += replayed
+        return replayed
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._stopping and len(self._queue) < self.batch_size:
+                    self._condition.wait(self.flush_seconds)
+                stopping = self._stopping
+            self.flush()
+            if self._retry:
+                self._retry = False
+                self.replay_orphans()
+            if stopping:
+                return
+
+    def _ensure_started(self):
+        if self._thread is None and not self._stopping:
+            with self._condition:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="audit-log", daemon=True)
+                    self._thread.start()
+
+    def start(self):
+        """Replay what an earlier run left behind; call once the schema exists."""
+        if os.path.isdir(self.spool_dir):
+            replayed = self.replay_orphans()
+            if replayed:
+                print(f"Replayed {replayed} spooled audit log entries")
+
+    def stop(self):
+        """Flush and stop the writer thread."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def snapshot(self):
+        with self._condition:
+            queued = len(self._queue)
+        return {
+            "mode": self.mode,
+            "queued": queued,
+            "flushed": self.flushed,
+            "replayed": self.replayed,
+            "failures": self.failures,
+        }
+
+
+audit_log = AuditLog()
+
+event.listen(Session, "after_commit", audit_log._committed)
+event.listen(Session, "after_soft_rollback", audit_log._rolled_back)
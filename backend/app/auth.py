@@ -3,11 +3,11 @@ from datetime import datetime, timedelta
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
-from .database import get_db
+from .database import get_db, run_db
 from .models import User
+from .cache import TTLCache
 import os
 from dotenv import load_dotenv
-from passlib.context import CryptContext
 
 load_dotenv()
 
@@ -15,8 +15,20 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 
+# Authenticated users are cached by student number so most requests skip the DB lookup
+AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "4096"))
+# When enabled, tokens carrying id/name/role claims are trusted without any lookup;
+# role changes then only take effect once the token expires
+AUTH_TRUST_TOKEN_CLAIMS = os.getenv("AUTH_TRUST_TOKEN_CLAIMS", "false").lower() == "true"
+
+# Columns copied into the cached principal; the password hash is deliberately left out
+PRINCIPAL_FIELDS = ("id", "student_number", "name", "email", "role")
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+principal_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     if expires_delta:
@@ -27,32 +39,74 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str, credentials_exception):
+def token_claims(user: User) -> dict:
+    return {
+        "sub": user.student_number,
+        "uid": user.id,
+        "name": user.name,
+        "email": user.email,
+        "role": user.role,
+    }
+
+def decode_token(token: str, credentials_exception):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        student_number: str = payload.get("sub")
-        if student_number is None:
+        if payload.get("sub") is None:
             raise credentials_exception
-        return student_number
+        return payload
     except JWTError:
         raise credentials_exception
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def verify_token(token: str, credentials_exception):
+    return decode_token(token, credentials_exception)["sub"]
+
+def make_principal(**fields) -> User:
+    # Transient User never attached to a session; safe to share between requests
+    return User(**{field: fields.get(field) for field in PRINCIPAL_FIELDS})
+
+def invalidate_principal(student_number: str):
+    """Drop a cached user, e.g. after a password or role change."""
+    principal_cache.delete(student_number)
+
+def get_user_by_student_number(db: Session, student_number: str):
+    return db.query(User).filter(User.student_number == student_number).first()
+
+def save_password(db: Session, user: User, hashed_password: str):
+    """Store a new hash for a user loaded in this session (a rehash or a password change)."""
+    user.password = hashed_password
+    db.commit()
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    student_number = verify_token(token, credentials_exception)
-    user = db.query(User).filter(User.student_number == student_number).first()
+    payload = decode_token(token, credentials_exception)
+    student_number = payload["sub"]
+    
+    if AUTH_TRUST_TOKEN_CLAIMS and payload.get("uid") is not None and payload.get("role"):
+        return make_principal(
+            id=payload["uid"],
+            student_number=student_number,
+            name=payload.get("name"),
+            email=payload.get("email"),
+            role=payload["role"],
+        )
+    
+    principal = principal_cache.get(student_number)
+    if principal is not None:
+        return principal
+    
+    user = await run_db(db, get_user_by_student_number, student_number)
     if user is None:
         raise credentials_exception
-    return user
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    
+    principal = make_principal(**{field: getattr(user, field) for field in PRINCIPAL_FIELDS})
+    principal_cache.set(student_number, principal)
+    return principal
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
\ No newline at end of file
+async def get_current_admin(current_user: User = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user
@@ -0,0 +1,234 @@
+"""Bulk import and export of items as CSV or NDJSON.
+
+Imports are read row by row from the uploaded file, validated against the
+item schema and inserted IMPORT_BATCH_SIZE rows per transaction. A row that
+fails validation is reported and skipped; the rest of its batch still goes in.
+
+Within a batch, rows are still sent as one INSERT each. The audit entries,
+matches and feed events need every new id, and MySQL can neither return
+them from a multi-row INSERT nor promise they are consecutive (InnoDB's
+default interleaved auto-increment). A batch therefore costs one commit but
+IMPORT_BATCH_SIZE round trips.
+"""
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from dotenv import load_dotenv
+from pydantic import ValidationError
+from sqlalchemy.exc import DBAPIError
+from .audit import audit_log
+from .database import SessionLocal
+from .feed import item_feed
+from .matching import match_key, record_new_matches, term_statistics
+from .models import Item, ItemStatus, User
+from .read_cache import get_read_cache, ITEMS_TAG
+from .search import get_search_backend
+from .stats import stats_cache, item_key
+
+load_dotenv()
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+# Errors listed in the import report; later ones are only counted
+IMPORT_MAX_ERRORS = 100
+
+FORMATS = ("csv", "ndjson")
+EXTENSIONS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson", ".json": "ndjson"}
+CONTENT_TYPES = {"text/csv": "csv", "application/x-ndjson": "ndjson", "application/jsonl": "ndjson"}
+
+# Columns of an export, in order; title through contact_phone can be imported back
+EXPORT_COLUMNS = (
+    Item.id, Item.title, Item.description, Item.category, Item.location, Item.contact_phone,
+    Item.status, Item.image_url, Item.user_id, User.name.label("owner_name"), Item.created_at, Item.updated_at,
+)
+EXPORT_FIELDS = tuple(column.key for column in EXPORT_COLUMNS)
+
+
+class ImportFormatError(ValueError):
+    """The file as a whole cannot be imported (nothing was inserted)."""
+
+
+def detect_format(filename=None, content_type=None, requested=None):
+    """csv or ndjson from an explicit choice, the file extension or the content type."""
+    if requested:
+        return requested if requested in FORMATS else None
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension in EXTENSIONS:
+        return EXTENSIONS[extension]
+    return CONTENT_TYPES.get((content_type or "").split(";")[0].strip())
+
+
+def _decode(line: bytes) -> str:
+    # Spreadsheet "CSV" exports are often Windows-1252 rather than UTF-8
+    try:
+        return line.decode("utf-8")
+    except UnicodeDecodeError:
+        return line.decode("cp1252", errors="replace")
+
+
+def _lines(file):
+    for index, line in enumerate(file):
+        text = _decode(line)
+        yield text.lstrip("\ufeff") if index == 0 else text
+
+
+def read_rows(file, fmt, fields):
+    """Yield (row number, dict or error message) from a binary file, one row at a time.
+
+    Row numbers count data rows from 1, so CSV row n is spreadsheet line n + 1.
+    Raises ImportFormatError up front when a CSV header lacks a required field.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(_lines(file))
+        missing = [field for field, required in fields.items() if required and field not in (reader.fieldnames or ())]
+        if missing:
+            raise ImportFormatError(f"CSV header is missing: {', '.join(missing)}")
+        for number, row in enumerate(reader, start=1):
+            # Empty cells are absent values, not empty strings
+            yield number, {key: value for key, value in row.items() if key in fields and value not in ("", None)}
+        return
+    number = 0
+    for line in _lines(file):
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            yield number, f"Invalid JSON: {error}"
+            continue
+        if not isinstance(row, dict):
+            yield number, "Each line must be a JSON object"
+            continue
+        yield number, {key: value for key, value in row.items() if key in fields}
+
+
+def _too_long(values):
+    errors = []
+    for field, value in values.items():
+        column = Item.__table__.columns.get(field)
+        length = getattr(column.type, "length", None) if column is not None else None
+        if length and isinstance(value, str) and len(value) > length:
+            errors.append({"loc": [field], "msg": f"ensure this value has at most {length} characters"})
+    return errors
+
+
+def validate_row(schema, row):
+    """(column values, None) or (None, [errors]) for one row."""
+    try:
+        values = schema(**row).dict()
+    except ValidationError as error:
+        return None, [{"loc": list(detail["loc"]), "msg": detail["msg"]} for detail in error.errors()]
+    errors = _too_long(values)
+    return (None, errors) if errors else (values, None)
+
+
+class ImportReport:
+    def __init__(self):
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+
+    def error(self, row, errors):
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"row": row, "errors": errors})
+
+    def as_dict(self):
+        return {"imported": self.imported, "failed": self.failed, "errors": self.errors}
+
+
+def _insert(db, batch, item_status, current_user: User):
+    items = [
+        Item(**values, status=item_status, user_id=current_user.id)
+        for _, values in batch
+    ]
+    db.add_all(items)
+    # One INSERT per row on MySQL (no RETURNING there); the ids are needed below
+    db.flush()
+    for item in items:
+        audit_log.record(db, item_id=item.id, action="CREATE", new_status=item.status, changed_by=current_user.id)
+    db.commit()
+    return items
+
+
+def _insert_batch(db, batch, item_status, current_user: User, report: ImportReport):
+    """Insert one batch in a single transaction, falling back to row by row if the database rejects it."""
+    try:
+        items = _insert(db, batch, item_status, current_user)
+    except DBAPIError:
+        db.rollback()
+        items = []
+        for number, values in batch:
+            try:
+                items.extend(_insert(db, [(number, values)], item_status, current_user))
+            except DBAPIError as error:
+                db.rollback()
+                report.error(number, [{"loc": [], "msg": str(error.orig)}])
+
+    search = get_search_backend()
+    for item in items:
+        search.index_item(item)
+        stats_cache.item_changed(new=item_key(item))
+        term_statistics.item_changed(new=match_key(item))
+    record_new_matches(db, items)
+    get_read_cache().invalidate(ITEMS_TAG)
+    if items:
+        item_feed.publish_refresh("import", len(items))
+    report.imported += len(items)
+    # Committed rows are not needed again; keep the identity map from growing
+    db.expunge_all()
+
+
+def import_items(file, fmt, schema, item_status: ItemStatus, current_user: User, batch_size=IMPORT_BATCH_SIZE):
+    """Import every valid row of an uploaded file; returns the report dict.
+
+    Blocking (file reads and its own session), so callers run it on the threadpool.
+    """
+    fields = {name: field.required for name, field in schema.__fields__.items()}
+    rows = read_rows(file, fmt, fields)
+    report = ImportReport()
+    # Committed items are still read for the search index and matching; do not reload each one
+    db = SessionLocal(expire_on_commit=False)
+    try:
+        batch = []
+        for number, row in rows:
+            if isinstance(row, str):
+                report.error(number, [{"loc": [], "msg": row}])
+                continue
+            values, errors = validate_row(schema, row)
+            if errors:
+                report.error(number, errors)
+                continue
+            batch.append((number, values))
+            if len(batch) >= batch_size:
+                _insert_batch(db, batch, item_status, current_user, report)
+                batch = []
+        if batch:
+            _insert_batch(db, batch, item_status, current_user, report)
+    finally:
+        db.close()
+    return report.as_dict()
+
+
+def _cell(value):
+    value = getattr(value, "value", value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def format_rows(rows, fmt, header=False):
+    """Serialize EXPORT_COLUMNS rows as one CSV or NDJSON chunk."""
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if header:
+            writer.writerow(EXPORT_FIELDS)
+        writer.writerows([[_cell(value) for value in row] for row in rows])
+        return buffer.getvalue()
+    return "".join(
+        json.dumps({field: _cell(value) for field, value in zip(EXPORT_FIELDS, row)}) + "\n"
+        for row in rows
+    )
@@ -0,0 +1,166 @@
+"""In-process publish/subscribe for item changes, pushed to WebSocket and SSE clients.
+
+The item routes publish an event after each committed write, next to the
+stats and index updates. Each event is encoded once and handed to every
+subscriber whose category/status filter matches; subscribers sharing a
+filter are grouped so the match is evaluated once per filter, not once per
+client. Every subscriber has a bounded queue: one that falls FEED_QUEUE_SIZE
+events behind is dropped (its connection closed) instead of buffering
+without limit or slowing everyone else down.
+
+Events only reach clients connected to the worker that handled the write.
+"""
+import asyncio
+import os
+import threading
+from dotenv import load_dotenv
+from .responses import dumps
+
+load_dotenv()
+
+FEED_QUEUE_SIZE = int(os.getenv("FEED_QUEUE_SIZE", "100"))
+# SSE comment sent when a client has been idle this long, so proxies keep the stream open
+FEED_KEEPALIVE_SECONDS = float(os.getenv("FEED_KEEPALIVE_SECONDS", "15"))
+
+
+def _value(enum_or_str):
+    return getattr(enum_or_str, "value", enum_or_str)
+
+
+def _filter_values(values):
+    values = {_value(value) for value in values or () if value}
+    return frozenset(values) if values else None
+
+
+class Subscriber:
+    def __init__(self, categories=None, statuses=None, queue_size=FEED_QUEUE_SIZE):
+        self.key = (_filter_values(categories), _filter_values(statuses))
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.closed = False
+
+    async def next_event(self):
+        """The next encoded event, or None once the subscriber was dropped or closed."""
+        if self.closed:
+            return None
+        message = await self.queue.get()
+        # A dropped subscriber may still have a full queue; do not send it any of it
+        return None if self.closed else message
+
+    def close(self):
+        self.closed = True
+        try:
+            self.queue.put_nowait(None)  # wakes a consumer waiting on an empty queue
+        except asyncio.QueueFull:
+            pass
+
+
+class ItemFeed:
+    def __init__(self, queue_size=FEED_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._groups = {}
+        self._lock = threading.Lock()
+        self._loop = None
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def subscribe(self, categories=None, statuses=None) -> Subscriber:
+        """Register a subscriber; call from the event loop that will consume it."""
+        self._loop = asyncio.get_running_loop()
+        subscriber = Subscriber(categories, statuses, self.queue_size)
+        with self._lock:
+            self._groups.setdefault(subscriber.key, set()).add(subscriber)
+        return subscriber
+
+    def resubscribe(self, subscriber: Subscriber, categories=None, statuses=None):
+        with self._lock:
+            self._discard(subscriber)
+            subscriber.key = (_filter_values(categories), _filter_values(statuses))
+            self._groups.setdefault(subscriber.key, set()).add(subscriber)
+
+    def _discard(self, subscriber: Subscriber):
+        group = self._groups.get(subscriber.key)
+        if group is not None:
+            group.discard(subscriber)
+            if not group:
+                del self._groups[subscriber.key]
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._lock:
+            self._discard(subscriber)
+
+    def publish(self, event_type: str, item: dict, old_status=None):
+        """Queue an event for matching subscribers; safe to call from any thread.
+
+        item needs at least id, category and status. A status change also
+        reaches subscribers filtering on the old status, so they can drop the item.
+        """
+        if not self._groups:
+            return
+        statuses = {_value(item.get("status")), _value(old_status)} - {None}
+        event = {"type": event_type, "item": item}
+        if old_status is not None:
+            event["old_status"] = _value(old_status)
+        self._dispatch(_value(item.get("category")), statuses, dumps(event).decode())
+
+    def publish_refresh(self, reason: str, count: int):
+        """Tell every subscriber to re-fetch, e.g. after a bulk import."""
+        if self._groups:
+            self._dispatch(None, None, dumps({"type": "refresh", "reason": reason, "count": count}).decode())
+
+    def _dispatch(self, category, statuses, message):
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._deliver(category, statuses, message)
+        else:
+            # Sync routes run on the threadpool; queues belong to the event loop
+            loop.call_soon_threadsafe(self._deliver, category, statuses, message)
+
+    def _deliver(self, category, statuses, message):
+        self.published += 1
+        with self._lock:
+            groups = list(self._groups.items())
+        slow = []
+        for (categories, wanted), subscribers in groups:
+            if category is not None and categories is not None and category not in categories:
+                continue
+            if statuses is not None and wanted is not None and not (wanted & statuses):
+                continue
+            for subscriber in list(subscribers):
+                try:
+                    subscriber.queue.put_nowait(message)
+                    self.delivered += 1
+                except asyncio.QueueFull:
+                    slow.append(subscriber)
+        for subscriber in slow:
+            self.dropped += 1
+            self.unsubscribe(subscriber)
+            subscriber.close()
+
+    def close_all(self):
+        with self._lock:
+            subscribers = [subscriber for group in self._groups.values() for subscriber in group]
+            self._groups.clear()
+        for subscriber in subscribers:
+            subscriber.close()
+
+    def snapshot(self):
+        with self._lock:
+            subscribers = sum(len(group) for group in self._groups.values())
+            filters = len(self._groups)
+        return {
+            "subscribers": subscribers,
+            "filters": filters,
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+
+item_feed = ItemFeed()
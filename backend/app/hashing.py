@@ -0,0 +1,115 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+load_dotenv()
+
+# bcrypt runs in its own worker processes so it never holds the server's GIL.
+# HASH_WORKERS=0 hashes on a thread instead (handy for tests and tiny hosts).
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 1)))
+# Hash jobs allowed to wait for a worker before new ones are turned away
+HASH_QUEUE_SIZE = int(os.getenv("HASH_QUEUE_SIZE", str(max(HASH_WORKERS, 1) * 4)))
+HASH_RETRY_AFTER_SECONDS = int(os.getenv("HASH_RETRY_AFTER_SECONDS", "1"))
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# The only CryptContext in the app. Hashes from deprecated schemes or below the
+# current cost factor are flagged for upgrade and rehashed on the next login.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+)
+
+
+def _verify_and_update(plain_password, hashed_password):
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+def _hash(password):
+    return pwd_context.hash(password)
+
+
+class HashingBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    """Bounded executor for bcrypt work, awaited from async endpoints."""
+
+    def __init__(self, workers=HASH_WORKERS, queue_size=HASH_QUEUE_SIZE):
+        self.workers = workers
+        self.capacity = max(workers, 1) + queue_size
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.workers > 0:
+                        # spawn, not fork: the server process already runs threads
+                        self._executor = ProcessPoolExecutor(
+                            max_workers=self.workers,
+                            mp_context=multiprocessing.get_context("spawn"),
+                        )
+                    else:
+                        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hashing")
+        return self._executor
+
+    async def _submit(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.capacity:
+                raise HashingBusy()
+            self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    async def verify_and_update(self, plain_password, hashed_password):
+        """Return (valid, new_hash); new_hash is set when the stored hash needs upgrading."""
+        return await self._submit(_verify_and_update, plain_password, hashed_password)
+
+    async def hash(self, password):
+        return await self._submit(_hash, password)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+password_hasher = PasswordHasher()
+
+
+def _busy():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server is busy, please try again shortly",
+        headers={"Retry-After": str(HASH_RETRY_AFTER_SECONDS)},
+    )
+
+
+async def verify_password(plain_password, hashed_password):
+    """Check a password; returns (valid, new_hash) where new_hash replaces an outdated hash."""
+    try:
+        return await password_hasher.verify_and_update(plain_password, hashed_password)
+    except HashingBusy:
+        raise _busy()
+
+
+async def hash_password(password):
+    try:
+        return await password_hasher.hash(password)
+    except HashingBusy:
+        raise _busy()
@@ -0,0 +1,367 @@
+import argparse
+import asyncio
+import hashlib
+import os
+import re
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+from dotenv import load_dotenv
+from sqlalchemy.orm import Session
+from .models import ArchivedItem, Item
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # resizing is skipped and only originals are served
+    Image = None
+
+load_dotenv()
+
+# Get the base directory of the project
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATIC_DIR = os.path.join(BASE_DIR, "static", "images")
+STATIC_URL = "/static/images"
+
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(15 * 1024 * 1024)))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Files are only removed once untouched this long, so a concurrent re-upload of
+# the same bytes can't lose its file between the reference check and the delete
+IMAGE_GC_GRACE_SECONDS = int(os.getenv("IMAGE_GC_GRACE_SECONDS", "300"))
+
+# WebP widths generated for every upload; the smallest doubles as the thumbnail
+VARIANT_WIDTHS = (320, 640, 1280)
+THUMBNAIL_WIDTH = VARIANT_WIDTHS[0]
+WEBP_QUALITY = 80
+
+# dHash compares horizontally adjacent pixels of a 9x8 grayscale thumbnail: 64 bits
+HASH_GRID = 8
+
+# Magic numbers of the formats we accept; the client's filename is never trusted
+SIGNATURES = (
+    (b"\xff\xd8\xff", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+)
+
+# {sha256}.{ext} originals and their {sha256}_{width}.webp variants
+CONTENT_ADDRESSED = re.compile(r"^[0-9a-f]{64}(_\d+)?\.[a-z]+$")
+
+# Errors Pillow raises for files that look like images but can't be decoded
+IMAGE_ERRORS = (OSError, ValueError, SyntaxError) + ((Image.DecompressionBombError,) if Image else ())
+
+os.makedirs(STATIC_DIR, exist_ok=True)
+
+_executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="images")
+
+
+def sniff_extension(header: bytes):
+    for signature, extension in SIGNATURES:
+        if header.startswith(signature):
+            return extension
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def variant_filename(filename: str, width: int) -> str:
+    stem = filename.rsplit(".", 1)[0]
+    return f"{stem}_{width}.webp"
+
+
+def is_content_addressed(filename: str) -> bool:
+    return CONTENT_ADDRESSED.match(filename) is not None
+
+
+def has_variants(filename: str) -> bool:
+    """Uploads get their variants when stored; older images only once backfilled."""
+    if is_content_addressed(filename):
+        return True
+    return os.path.exists(os.path.join(STATIC_DIR, variant_filename(filename, THUMBNAIL_WIDTH)))
+
+
+def variant_urls(image_url):
+    """(thumbnail_url, srcset) for an uploaded image, or (None, None) so clients use image_url."""
+    if not image_url or Image is None or not image_url.startswith(STATIC_URL + "/"):
+        return None, None
+    filename = image_url[len(STATIC_URL) + 1:]
+    if not has_variants(filename):
+        return None, None
+    srcset = ", ".join(
+        f"{STATIC_URL}/{variant_filename(filename, width)} {width}w" for width in VARIANT_WIDTHS
+    )
+    return f"{STATIC_URL}/{variant_filename(filename, THUMBNAIL_WIDTH)}", srcset
+
+
+def create_variants(path: str):
+    """Write the resized WebP variants next to the original."""
+    if Image is None:
+        return
+    directory, filename = os.path.split(path)
+    with Image.open(path) as original:
+        # Let the JPEG decoder downscale while decoding instead of loading every pixel
+        original.draft("RGB", (VARIANT_WIDTHS[-1], VARIANT_WIDTHS[-1]))
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        for width in VARIANT_WIDTHS:
+            variant = image.copy()
+            # Width bound only; thumbnail() never upscales
+            variant.thumbnail((width, width * 4))
+            variant.save(os.path.join(directory, variant_filename(filename, width)), "WEBP", quality=WEBP_QUALITY)
+
+
+def perceptual_hash(path: str) -> str:
+    """64-bit difference hash of an image as 16 hex digits.
+
+    Survives resizing, recompression and small edits, so near-duplicate photos
+    end up a few bits apart.
+    """
+    with Image.open(path) as original:
+        original.draft("L", (HASH_GRID * 8, HASH_GRID * 8))
+        image = ImageOps.exif_transpose(original).convert("L").resize((HASH_GRID + 1, HASH_GRID), Image.LANCZOS)
+        pixels = image.tobytes()  # one byte per pixel in mode L
+    bits = 0
+    for row in range(HASH_GRID):
+        for column in range(HASH_GRID):
+            left = pixels[row * (HASH_GRID + 1) + column]
+            bits = (bits << 1) | (left > pixels[row * (HASH_GRID + 1) + column + 1])
+    return f"{bits:016x}"
+
+
+async def hash_upload(filename: str, directory: str = STATIC_DIR):
+    """Perceptual hash of a stored upload, computed on the image worker pool; None if unavailable."""
+    if Image is None:
+        return None
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            _executor, perceptual_hash, os.path.join(directory, filename)
+        )
+    except IMAGE_ERRORS:
+        return None
+
+
+def _remove(path: str):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def _store(partial_path: str, path: str) -> bool:
+    """Move a finished upload into place; False if identical bytes are already stored."""
+    if os.path.exists(path):
+        os.remove(partial_path)
+        # Refresh the mtime so garbage collection treats the file as in use again
+        os.utime(path)
+        return False
+    os.replace(partial_path, path)
+    return True
+
+
+async def save_upload(upload: UploadFile, directory: str = STATIC_DIR) -> str:
+    """Stream an upload to disk in chunks and return the stored filename.
+
+    Files are content addressed (SHA-256 of the bytes), so re-uploading the same
+    photo reuses the stored file and its variants. Rejects files over
+    IMAGE_MAX_BYTES and anything that isn't a JPEG, PNG, GIF or WebP by content.
+    Variants are generated on the image worker pool.
+    """
+    chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+    extension = sniff_extension(chunk)
+    if extension is None:
+        raise HTTPException(status_code=415, detail="Image must be a JPEG, PNG, GIF or WebP file")
+
+    digest = hashlib.sha256()
+    partial_path = os.path.join(directory, f".{uuid.uuid4()}.part")
+
+    buffer = await run_in_threadpool(open, partial_path, "wb")
+    try:
+        size = 0
+        while chunk:
+            size += len(chunk)
+            if size > IMAGE_MAX_BYTES:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Image must be smaller than {IMAGE_MAX_BYTES // (1024 * 1024)} MB"
+                )
+            digest.update(chunk)
+            await run_in_threadpool(buffer.write, chunk)
+            chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+        await run_in_threadpool(buffer.close)
+    except BaseException:
+        buffer.close()
+        await run_in_threadpool(_remove, partial_path)
+        raise
+
+    filename = f"{digest.hexdigest()}.{extension}"
+    path = os.path.join(directory, filename)
+    stored = await run_in_threadpool(_store, partial_path, path)
+    if not stored and os.path.exists(os.path.join(directory, variant_filename(filename, THUMBNAIL_WIDTH))):
+        return filename
+
+    try:
+        await asyncio.get_running_loop().run_in_executor(_executor, create_variants, path)
+    except IMAGE_ERRORS:
+        # Pillow could not decode it: the header matched but the image is broken
+        for width in VARIANT_WIDTHS:
+            await run_in_threadpool(_remove, os.path.join(directory, variant_filename(filename, width)))
+        await run_in_threadpool(_remove, path)
+        raise HTTPException(status_code=400, detail="Image file is corrupt or unsupported")
+
+    return filename
+
+
+def _image_files(filename: str, directory: str = STATIC_DIR):
+    return [os.path.join(directory, filename)] + [
+        os.path.join(directory, variant_filename(filename, width)) for width in VARIANT_WIDTHS
+    ]
+
+
+def _is_original(filename: str) -> bool:
+    # Skip partial uploads, generated variants and anything that isn't ours
+    return not filename.startswith(".") and "_" not in filename and "." in filename
+
+
+def image_in_use(db: Session, image_url: str) -> bool:
+    """Reference check: whether any item, live or archived, still points at this image."""
+    return any(
+        db.query(model.id).filter(model.image_url == image_url).first() is not None
+        for model in (Item, ArchivedItem)
+    )
+
+
+def delete_image_files(image_url: str, grace_seconds: int = IMAGE_GC_GRACE_SECONDS, directory: str = STATIC_DIR) -> bool:
+    """Remove an unreferenced image and its variants unless it was touched recently."""
+    if not image_url or not image_url.startswith(STATIC_URL + "/"):
+        return False
+    filename = image_url[len(STATIC_URL) + 1:]
+    path = os.path.join(directory, filename)
+    if not _is_original(filename) or not os.path.exists(path):
+        return False
+    if time.time() - os.path.getmtime(path) < grace_seconds:
+        # Possibly just re-uploaded; collect_garbage picks it up later if still orphaned
+        return False
+    for file_path in _image_files(filename, directory):
+        _remove(file_path)
+    return True
+
+
+def collect_garbage(db: Session, grace_seconds: int = IMAGE_GC_GRACE_SECONDS, directory: str = STATIC_DIR, dry_run: bool = False):
+    """Delete stored images no item references, plus abandoned partial uploads.
+
+    Returns the list of removed (or, with dry_run, removable) filenames.
+    """
+    referenced = set()
+    # Archived items keep their photos
+    for model in (Item, ArchivedItem):
+        for (image_url,) in db.query(model.image_url).filter(model.image_url.isnot(None)).distinct().yield_per(1000):
+            referenced.add(image_url.rsplit("/", 1)[-1])
+
+    now = time.time()
+    removed = []
+    for filename in sorted(os.listdir(directory)):
+        path = os.path.join(directory, filename)
+        if now - os.path.getmtime(path) < grace_seconds:
+            continue
+        if filename.endswith(".part") or (_is_original(filename) and filename not in referenced):
+            removed.append(filename)
+            if not dry_run:
+                files = [path] if filename.endswith(".part") else _image_files(filename, directory)
+                for file_path in files:
+                    _remove(file_path)
+    return removed
+
+
+def backfill_variants(directory: str = STATIC_DIR):
+    """Generate missing variants for images stored before resizing existed."""
+    created = 0
+    for filename in sorted(os.listdir(directory)):
+        if not _is_original(filename):
+            continue
+        if os.path.exists(os.path.join(directory, variant_filename(filename, THUMBNAIL_WIDTH))):
+            continue
+        try:
+            create_variants(os.path.join(directory, filename))
+            created += 1
+        except IMAGE_ERRORS as error:
+            print(f"Skipping {filename}: {error}")
+    return created
+
+
+def _hash_file(path: str):
+    try:
+        return perceptual_hash(path)
+    except IMAGE_ERRORS:
+        return None
+
+
+def backfill_hashes(db: Session, directory: str = STATIC_DIR, workers: int = None) -> int:
+    """Hash the photos of items stored without a perceptual hash, across all cores."""
+    urls = [
+        image_url for (image_url,) in db.query(Item.image_url)
+        .filter(Item.image_url.isnot(None), Item.image_hash.is_(None))
+        .distinct()
+    ]
+    paths = {}
+    for image_url in urls:
+        path = os.path.join(directory, image_url.rsplit("/", 1)[-1])
+        if os.path.exists(path):
+            paths[image_url] = path
+
+    updated = 0
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        hashes = pool.map(_hash_file, paths.values(), chunksize=16)
+        for image_url, image_hash in zip(paths, hashes):
+            if image_hash is None:
+                print(f"Skipping {image_url}: not a decodable image")
+                continue
+            updated += db.query(Item)\
+                         .filter(Item.image_url == image_url, Item.image_hash.is_(None))\
+                         .update({Item.image_hash: image_hash}, synchronize_session=False)
+    db.commit()
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintenance for uploaded item images")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("backfill", help="generate missing resized variants")
+    hashes = commands.add_parser("hash", help="compute missing perceptual hashes in parallel")
+    hashes.add_argument("--workers", type=int, default=None)
+    gc = commands.add_parser("gc", help="delete images no item references")
+    gc.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "backfill":
+        if Image is None:
+            sys.exit("Pillow is not installed")
+        print(f"Generated variants for {backfill_variants()} images")
+    elif args.command == "hash":
+        if Image is None:
+            sys.exit("Pillow is not installed")
+        from .database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            print(f"Hashed images for {backfill_hashes(db, workers=args.workers)} items")
+        finally:
+            db.close()
+    elif args.command == "gc":
+        from .database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            removed = collect_garbage(db, dry_run=args.dry_run)
+        finally:
+            db.close()
+        verb = "Would remove" if args.dry_run else "Removed"
+        for filename in removed:
+            print(f"{verb} {filename}")
+        print(f"{verb} {len(removed)} orphaned files")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+"""Periodic background jobs: item archival, image pruning, log rotation and stats refresh.
+
+JobScheduler runs on a daemon thread in every web worker, started once the
+bootstrap succeeds, and checks every JOBS_TICK_SECONDS which jobs are due.
+Shared jobs change the database or the image directory: each run takes the
+job's lock (GET_LOCK on MySQL, a file lock otherwise) without waiting for it
+and is recorded in job_runs. A shared job is due once its latest recorded
+run, by any worker, is older than its interval, so however many workers
+there are it runs about once per interval. Local jobs only refresh this
+process's caches, so every worker runs them and they are not recorded.
+
+With JOBS_MODE=worker the web workers keep only the local jobs and the
+shared ones run in a process of their own:
+
+    python -m app.jobs worker
+    python -m app.jobs run archive_items
+    python -m app.jobs history [--limit N]
+
+Runs are bounded: archive_items moves at most ITEM_ARCHIVE_BATCHES batches of
+JOB_BATCH_SIZE items, one transaction each, and leaves the rest for the next run.
+"""
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from sqlalchemy import delete, func, insert, literal, or_, select, text, update
+from .database import engine, SessionLocal
+from .feed import item_feed
+from .images import collect_garbage
+from .log_archive import archive_logs
+from .matching import match_key, term_statistics
+from .metrics import job_duration, job_processed, job_runs
+from .models import ArchivedItem, Item, ItemMatch, ItemStatus, JobRun
+from .read_cache import get_read_cache, item_tag, ITEMS_TAG
+from .search import get_search_backend
+from .similarity import image_index
+from .stats import stats_cache, item_key, STATS_RECONCILE_SECONDS
+
+try:
+    import fcntl
+except ImportError:  # no cross-process locking; run one web worker or JOBS_MODE=worker
+    fcntl = None
+
+load_dotenv()
+
+# inline: web workers run every job; worker: web workers run the local jobs and
+# `python -m app.jobs worker` the shared ones; off: no jobs run
+JOBS_MODE = os.getenv("JOBS_MODE", "inline").lower()
+JOBS_TICK_SECONDS = float(os.getenv("JOBS_TICK_SECONDS", "30"))
+# Delay before a web worker's first check, so jobs do not compete with warm-up
+JOBS_START_DELAY_SECONDS = float(os.getenv("JOBS_START_DELAY_SECONDS", "60"))
+JOB_BATCH_SIZE = int(os.getenv("JOB_BATCH_SIZE", "500"))
+# Lost and found reports older than this move to archived_items; claimed ones stay
+ITEM_ARCHIVE_DAYS = int(os.getenv("ITEM_ARCHIVE_DAYS", "180"))
+ITEM_ARCHIVE_BATCHES = int(os.getenv("ITEM_ARCHIVE_BATCHES", "20"))
+JOB_HISTORY_DAYS = int(os.getenv("JOB_HISTORY_DAYS", "30"))
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+JOBS_LOCK_DIR = os.getenv("JOBS_LOCK_DIR", os.path.join(BASE_DIR, "job_locks"))
+JOB_LOCK_PREFIX = "lostfound_job_"
+
+WORKER = f"{socket.gethostname()}:{os.getpid()}"
+
+# Every items column, in the order archived_items takes them
+ARCHIVED_FIELDS = tuple(column.key for column in Item.__table__.columns)
+UNCLAIMED = (ItemStatus.LOST, ItemStatus.FOUND)
+
+
+def archive_items(engine, days=ITEM_ARCHIVE_DAYS, batch_size=JOB_BATCH_SIZE, batches=ITEM_ARCHIVE_BATCHES, now=None):
+    """Move unclaimed items not updated for more than days to archived_items; returns the number moved."""
+    cutoff = (now or datetime.utcnow()) - timedelta(days=days)
+    # An item is never updated before it is created, so the created_at bound only
+    # narrows the index range; the last update is what decides (NULL: never updated)
+    stale = (
+        Item.status.in_(UNCLAIMED),
+        Item.created_at < cutoff,
+        func.coalesce(Item.updated_at, Item.created_at) < cutoff,
+    )
+    moved = 0
+    for _ in range(batches):
+        with engine.begin() as conn:
+            # Oldest first along ix_items_status_created_at; locked so a claim
+            # made meanwhile waits instead of being archived with the old status
+            rows = conn.execute(
+                select(Item.id, Item.status, Item.category, Item.title, Item.description, Item.location, Item.created_at)
+                .where(*stale)
+                .order_by(Item.created_at, Item.id)
+                .limit(batch_size)
+                .with_for_update()
+            ).all()
+            if not rows:
+                break
+            ids = [row.id for row in rows]
+            conn.execute(insert(ArchivedItem).from_select(
+                ARCHIVED_FIELDS + ("archived_at",),
+                select(*[getattr(Item, field) for field in ARCHIVED_FIELDS], literal(datetime.utcnow()))
+                .where(Item.id.in_(ids))
+            ))
+            conn.execute(delete(ItemMatch).where(
+                or_(ItemMatch.lost_item_id.in_(ids), ItemMatch.found_item_id.in_(ids))
+            ))
+            conn.execute(delete(Item).where(Item.id.in_(ids)))
+        _items_archived(rows)
+        moved += len(rows)
+        if len(rows) < batch_size:
+            break
+    return moved
+
+
+def _items_archived(rows):
+    # The same hooks as a delete through the API
+    search = get_search_backend()
+    for row in rows:
+        search.remove_item(row.id)
+        image_index.item_changed(row.id)
+        stats_cache.item_changed(old=item_key(row))
+        term_statistics.item_changed(old=match_key(row))
+    get_read_cache().invalidate(ITEMS_TAG, *[item_tag(row.id) for row in rows])
+    item_feed.publish_refresh("archive", len(rows))
+
+
+def prune_images(engine):
+    """Delete image files no live or archived item references."""
+    db = SessionLocal(bind=engine)
+    try:
+        return len(collect_garbage(db))
+    finally:
+        db.close()
+
+
+def rotate_logs(engine, history_days=JOB_HISTORY_DAYS, now=None):
+    """Archive old audit log months and job history, then give the space back on MySQL."""
+    moved = sum(archive_logs(engine, now=now).values())
+    cutoff = (now or datetime.utcnow()) - timedelta(days=history_days)
+    with engine.begin() as conn:
+        pruned = conn.execute(delete(JobRun).where(JobRun.started_at < cutoff)).rowcount
+    if moved and engine.dialect.name == "mysql":
+        # InnoDB keeps the pages of deleted rows; an online rebuild returns them
+        with engine.connect() as conn:
+            conn.execute(text("OPTIMIZE TABLE logs"))
+    return moved + pruned
+
+
+def refresh_stats(engine):
+    """Rebuild this worker's stats counters before they go stale, so GET /items/stats/overview never does."""
+    db = SessionLocal(bind=engine)
+    try:
+        return int(stats_cache.refresh(db))
+    finally:
+        db.close()
+
+
+class Job:
+    def __init__(self, name, run, interval_seconds, shared=True):
+        self.name = name
+        self.run = run
+        self.interval_seconds = interval_seconds
+        self.shared = shared
+        self.next_check = 0.0
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_status = None
+        self.last_processed = None
+        self.last_duration_ms = None
+        self.last_error = None
+        self.last_finished_at = None
+
+    def snapshot(self):
+        return {
+            "shared": self.shared,
+            "interval_seconds": self.interval_seconds,
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "last_status": self.last_status,
+            "last_processed": self.last_processed,
+            "last_duration_ms": self.last_duration_ms,
+            "last_error": self.last_error,
+            "last_finished_at": self.last_finished_at,
+        }
+
+
+def _interval(name, default):
+    return float(os.getenv(f"JOB_{name.upper()}_SECONDS", str(default)))
+
+
+JOBS = (
+    Job("archive_items", archive_items, _interval("archive_items", 3600)),
+    Job("prune_images", prune_images, _interval("prune_images", 6 * 3600)),
+    Job("rotate_logs", rotate_logs, _interval("rotate_logs", 24 * 3600)),
+    # Inside the reconcile window, so reads keep finding the counters fresh
+    Job("refresh_stats", refresh_stats, _interval("refresh_stats", STATS_RECONCILE_SECONDS / 2), shared=False),
+)
+JOBS_BY_NAME = {job.name: job for job in JOBS}
+
+
+@contextmanager
+def _job_lock(engine, name):
+    """Yields whether this process holds the job's lock; never waits for it."""
+    if engine.dialect.name == "mysql":
+        with engine.connect() as conn:
+            acquired = conn.execute(text("SELECT GET_LOCK(:name, 0)"), {"name": JOB_LOCK_PREFIX + name}).scalar()
+            try:
+                yield bool(acquired)
+            finally:
+                if acquired:
+                    conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": JOB_LOCK_PREFIX + name})
+        return
+    os.makedirs(JOBS_LOCK_DIR, exist_ok=True)
+    with open(os.path.join(JOBS_LOCK_DIR, f"{name}.lock"), "w") as lock:
+        acquired = True
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                acquired = False
+        # Closing the file releases the lock
+        yield acquired
+
+
+def _last_started(engine, name):
+    with engine.connect() as conn:
+        return conn.execute(select(func.max(JobRun.started_at)).where(JobRun.job == name)).scalar()
+
+
+def _start_run(engine, name):
+    with engine.begin() as conn:
+        result = conn.execute(insert(JobRun).values(
+            job=name, status="running", worker=WORKER, started_at=datetime.utcnow(), processed=0
+        ))
+        return result.inserted_primary_key[0]
+
+
+def _finish_run(engine, run_id, status, processed, duration_ms, error):
+    with engine.begin() as conn:
+        conn.execute(update(JobRun).where(JobRun.id == run_id).values(
+            status=status, finished_at=datetime.utcnow(), duration_ms=duration_ms, processed=processed,
+            error=error[:500] if error else None
+        ))
+
+
+def recent_runs(engine, limit=20, job=None):
+    """The latest job_runs rows, newest first."""
+    query = select(JobRun).order_by(JobRun.started_at.desc(), JobRun.id.desc()).limit(limit)
+    if job:
+        query = query.where(JobRun.job == job)
+    with engine.connect() as conn:
+        return [dict(row._mapping) for row in conn.execute(query)]
+
+
+class JobScheduler:
+    def __init__(self, jobs=JOBS, engine=engine, tick_seconds=JOBS_TICK_SECONDS, start_delay=JOBS_START_DELAY_SECONDS):
+        self.jobs = tuple(jobs)
+        self.engine = engine
+        self.tick_seconds = tick_seconds
+        self.start_delay = start_delay
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def _execute(self, job, run_id):
+        started = time.perf_counter()
+        processed, error = 0, None
+        try:
+            processed = job.run(self.engine) or 0
+            status = "succeeded"
+        except Exception as exc:
+            status = "failed"
+            error = f"{type(exc).__name__}: {exc}"
+            print(f"Job {job.name} failed: {error}")
+        duration = time.perf_counter() - started
+
+        labels = (("job", job.name),)
+        job_runs.inc(labels + (("status", status),))
+        job_duration.observe(duration, labels)
+        job_processed.inc(labels, processed)
+        job.runs += 1
+        if status == "failed":
+            job.failures += 1
+        job.last_status = status
+        job.last_processed = processed
+        job.last_duration_ms = round(duration * 1000, 1)
+        job.last_error = error
+        job.last_finished_at = datetime.utcnow()
+        job.next_check = time.monotonic() + job.interval_seconds
+        if run_id is not None:
+            _finish_run(self.engine, run_id, status, processed, job.last_duration_ms, error)
+        return status
+
+    def run_job(self, job, force=False):
+        """Run job if it is due (always with force); returns its status, or None when it was not due."""
+        if not job.shared:
+            return self._execute(job, None)
+        with _job_lock(self.engine, job.name) as acquired:
+            if not acquired:
+                # Running in another worker; look again once it has had time to finish
+                job.skipped += 1
+                job_runs.inc((("job", job.name), ("status", "skipped")))
+                job.next_check = time.monotonic() + self.tick_seconds
+                return "skipped"
+            last = _last_started(self.engine, job.name)
+            if last is not None and not force:
+                remaining = job.interval_seconds - (datetime.utcnow() - last).total_seconds()
+                if remaining > 0:
+                    # Another worker ran it within the interval
+                    job.next_check = time.monotonic() + remaining
+                    return None
+            return self._execute(job, _start_run(self.engine, job.name))
+
+    def run_due(self):
+        for job in self.jobs:
+            if self._stopping.is_set():
+                return
+            if time.monotonic() < job.next_check:
+                continue
+            try:
+                self.run_job(job)
+            except Exception as error:
+                # The lock or the history could not be reached; try again next tick
+                print(f"Could not run job {job.name}: {error}")
+                job.next_check = time.monotonic() + self.tick_seconds
+
+    def _run(self):
+        if self._stopping.wait(self.start_delay):
+            return
+        while True:
+            self.run_due()
+            if self._stopping.wait(self.tick_seconds):
+                return
+
+    def start(self):
+        """Start the scheduler thread; a no-op when it is running or has no jobs."""
+        if self._thread is not None or not self.jobs:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="jobs", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop after the job in progress, if any, finishes."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def run_forever(self):
+        """Run in the calling thread until interrupted, for the worker process."""
+        try:
+            self._run()
+        except KeyboardInterrupt:
+            pass
+
+    def snapshot(self):
+        return {
+            "mode": JOBS_MODE,
+            "running": self._thread is not None and self._thread.is_alive(),
+            "jobs": {job.name: job.snapshot() for job in self.jobs},
+        }
+
+
+def _web_worker_jobs(mode=JOBS_MODE):
+    if mode == "inline":
+        return JOBS
+    if mode == "worker":
+        return tuple(job for job in JOBS if not job.shared)
+    return ()
+
+
+job_scheduler = JobScheduler(_web_worker_jobs())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Background jobs for the lost and found backend")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("worker", help="run the shared jobs on their schedule (JOBS_MODE=worker)")
+    run = commands.add_parser("run", help="run one job now, under its lock")
+    run.add_argument("job", choices=sorted(JOBS_BY_NAME))
+    history = commands.add_parser("history", help="show the latest recorded runs")
+    history.add_argument("--job", choices=sorted(JOBS_BY_NAME))
+    history.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.command == "worker":
+        shared = [job for job in JOBS if job.shared]
+        print(f"Scheduling {', '.join(job.name for job in shared)} as {WORKER}, checking every {JOBS_TICK_SECONDS:g}s")
+        JobScheduler(shared, start_delay=0).run_forever()
+    elif args.command == "run":
+        job = JOBS_BY_NAME[args.job]
+        status = JobScheduler([job]).run_job(job, force=True)
+        print(f"{job.name}: {status}, {job.last_processed or 0} processed in {job.last_duration_ms or 0} ms")
+        if status == "failed":
+            sys.exit(1)
+    elif args.command == "history":
+        for run in recent_runs(engine, args.limit, args.job):
+            print(f"{run['started_at']:%Y-%m-%d %H:%M:%S}  {run['job']:<14} {run['status']:<10} "
+                  f"{run['processed'] or 0:>7} in {run['duration_ms'] or 0:>9.1f} ms  {run['worker']}  {run['error'] or ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""Monthly rollover of the audit log into compressed archive files.
+
+The logs table keeps the current month and the AUDIT_HOT_MONTHS before it.
+Older months are moved, one file per month, to gzipped JSONL under
+AUDIT_ARCHIVE_DIR (logs-YYYY-MM.jsonl.gz, newest entry first) and deleted
+from the table. history() merges both so the audit API reads across them:
+
+    python -m app.log_archive archive [--keep-months N] [--dry-run]
+    python -m app.log_archive list
+"""
+import argparse
+import gzip
+import heapq
+import json
+import os
+import re
+from contextlib import contextmanager
+from datetime import datetime
+from dotenv import load_dotenv
+from sqlalchemy import delete, func, select
+from .models import Log
+
+try:
+    import fcntl
+except ImportError:  # no cross-process locking; do not run two archivers at once
+    fcntl = None
+
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AUDIT_ARCHIVE_DIR = os.getenv("AUDIT_ARCHIVE_DIR", os.path.join(BASE_DIR, "audit_archive"))
+# Whole months kept in the table besides the current one
+AUDIT_HOT_MONTHS = int(os.getenv("AUDIT_HOT_MONTHS", "3"))
+ARCHIVE_CHUNK_SIZE = 1000
+
+ARCHIVE_NAME = re.compile(r"^logs-(\d{4})-(\d{2})\.jsonl\.gz$")
+LOG_COLUMNS = (Log.id, Log.item_id, Log.action, Log.old_status, Log.new_status, Log.changed_by, Log.changed_at)
+
+
+def month_start(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, 1)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def archive_path(month: datetime, directory=AUDIT_ARCHIVE_DIR) -> str:
+    return os.path.join(directory, f"logs-{month:%Y-%m}.jsonl.gz")
+
+
+def archived_months(directory=AUDIT_ARCHIVE_DIR):
+    """[(month, path)] of the archive files, newest month first."""
+    if not os.path.isdir(directory):
+        return []
+    months = []
+    for filename in os.listdir(directory):
+        match = ARCHIVE_NAME.match(filename)
+        if match:
+            month = datetime(int(match.group(1)), int(match.group(2)), 1)
+            months.append((month, os.path.join(directory, filename)))
+    return sorted(months, reverse=True)
+
+
+def _value(enum_or_str):
+    return getattr(enum_or_str, "value", enum_or_str)
+
+
+def record_of(row) -> dict:
+    """A LOG_COLUMNS row as the dict stored in archives and returned by history()."""
+    record = dict(row._mapping)
+    record["old_status"] = _value(record["old_status"])
+    record["new_status"] = _value(record["new_status"])
+    return record
+
+
+def sort_key(record):
+    return record["changed_at"], record["id"]
+
+
+def read_archive(path):
+    """Stream the records of one archive file, newest first."""
+    with gzip.open(path, "rt", encoding="utf-8") as archive:
+        for line in archive:
+            record = json.loads(line)
+            record["changed_at"] = datetime.fromisoformat(record["changed_at"])
+            yield record
+
+
+def _write_archive(path, records):
+    # Written beside the target and renamed over it, so readers never see half a file
+    partial = path + ".part"
+    count = 0
+    with open(partial, "wb") as raw:
+        with gzip.GzipFile(filename="", mode="wb", fileobj=raw) as archive:
+            for record in records:
+                line = json.dumps({**record, "changed_at": record["changed_at"].isoformat()})
+                archive.write(line.encode() + b"\n")
+                count += 1
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(partial, path)
+    return count
+
+
+def _unique(records):
+    # Merged streams are ordered, so an entry in both the table and the file is adjacent
+    last = None
+    for record in records:
+        key = sort_key(record)
+        if key != last:
+            yield record
+        last = key
+
+
+@contextmanager
+def _archive_lock(directory):
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, ".lock"), "w") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def archive_month(engine, month: datetime, directory=AUDIT_ARCHIVE_DIR, dry_run=False):
+    """Move one month of logs into its archive file; returns the entries moved.
+
+    Entries are only deleted once the file holding them is on disk. A month that
+    already has a file (late entries, or a run interrupted before the delete) is
+    merged into it.
+    """
+    in_month = (Log.changed_at >= month, Log.changed_at < add_months(month, 1))
+    path = archive_path(month, directory)
+    ids = []
+    with engine.connect() as conn:
+        if dry_run:
+            return conn.execute(select(func.count(Log.id)).where(*in_month)).scalar()
+        if conn.execute(select(Log.id).where(*in_month).limit(1)).first() is None:
+            return 0
+        rows = conn.execution_options(stream_results=True).execute(
+            select(*LOG_COLUMNS).where(*in_month).order_by(Log.changed_at.desc(), Log.id.desc())
+        )
+
+        def exported():
+            for row in rows:
+                ids.append(row.id)
+                yield record_of(row)
+
+        records = exported()
+        if os.path.exists(path):
+            records = _unique(heapq.merge(records, read_archive(path), key=sort_key, reverse=True))
+        _write_archive(path, records)
+
+    with engine.begin() as conn:
+        for start in range(0, len(ids), ARCHIVE_CHUNK_SIZE):
+            conn.execute(delete(Log).where(Log.id.in_(ids[start:start + ARCHIVE_CHUNK_SIZE])))
+    return len(ids)
+
+
+def archive_logs(engine, keep_months=AUDIT_HOT_MONTHS, directory=AUDIT_ARCHIVE_DIR, dry_run=False, now=None):
+    """Archive every month older than keep_months; returns {month: entries moved}."""
+    cutoff = add_months(month_start(now or datetime.utcnow()), -keep_months)
+    moved = {}
+    with _archive_lock(directory):
+        with engine.connect() as conn:
+            oldest = conn.execute(select(func.min(Log.changed_at)).where(Log.changed_at < cutoff)).scalar()
+        month = month_start(oldest) if oldest else cutoff
+        while month < cutoff:
+            count = archive_month(engine, month, directory, dry_run)
+            if count:
+                moved[month] = count
+            month = add_months(month, 1)
+    return moved
+
+
+def _matches(record, item_id, changed_by, action, since, until, before):
+    return (
+        (item_id is None or record["item_id"] == item_id)
+        and (changed_by is None or record["changed_by"] == changed_by)
+        and (action is None or record["action"] == action)
+        and (since is None or record["changed_at"] >= since)
+        and (until is None or record["changed_at"] < until)
+        and (before is None or sort_key(record) < before)
+    )
+
+
+def history(hot, item_id=None, changed_by=None, action=None, since=None, until=None, before=None, directory=AUDIT_ARCHIVE_DIR):
+    """Merge table records with matching archived ones, newest first.
+
+    hot must already be filtered the same way and ordered by (changed_at, id)
+    descending; before is the (changed_at, id) of a keyset cursor. Archive files
+    are opened lazily, only once the consumer reads past the newer entries, so a
+    page served from the table never touches them. Filters on archived entries
+    cost a read of each month file in the time range.
+    """
+    hot = iter(hot)
+    head = [next(hot, None)]
+
+    def hot_from(bound):
+        while head[0] is not None and head[0]["changed_at"] >= bound:
+            yield head[0]
+            head[0] = next(hot, None)
+
+    bounds = [bound for bound in (until, before[0] if before else None) if bound is not None]
+    newest = min(bounds) if bounds else None
+    for month, path in archived_months(directory):
+        if since is not None and add_months(month, 1) <= since:
+            break
+        if newest is not None and month > newest:
+            continue
+        yield from hot_from(add_months(month, 1))
+        cold = (
+            record for record in read_archive(path)
+            if _matches(record, item_id, changed_by, action, since, until, before)
+        )
+        # Late entries for an archived month wait in the table until the next run
+        yield from heapq.merge(hot_from(month), cold, key=sort_key, reverse=True)
+    yield from hot_from(datetime.min)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monthly archival of the audit log")
+    commands = parser.add_subparsers(dest="command", required=True)
+    archive = commands.add_parser("archive", help="move months older than --keep-months into archive files")
+    archive.add_argument("--keep-months", type=int, default=AUDIT_HOT_MONTHS)
+    archive.add_argument("--dry-run", action="store_true")
+    commands.add_parser("list", help="show the archive files")
+    args = parser.parse_args()
+
+    if args.command == "archive":
+        from .database import engine
+
+        moved = archive_logs(engine, keep_months=args.keep_months, dry_run=args.dry_run)
+        verb = "Would archive" if args.dry_run else "Archived"
+        for month, count in moved.items():
+            print(f"{verb} {count} entries from {month:%Y-%m}")
+        print(f"{verb} {sum(moved.values())} entries")
+    elif args.command == "list":
+        for month, path in archived_months():
+            print(f"{month:%Y-%m}  {os.path.getsize(path):>12} bytes  {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,25 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from .database import init_db
-from .routes import auth, items, users
+from .audit import audit_log
+from .database import init_db, warm_pools, async_engine
+from .feed import item_feed
+from .hashing import password_hasher
+from .http_cache import CachedStaticFiles
+from .jobs import job_scheduler
+from .metrics import RequestMetricsMiddleware
+from .rate_limit import AdmissionControlMiddleware
+from .readiness import readiness, ReadinessGate
+from .routes import auth, items, users, instrumentation, logs, feed, health
+from starlette.concurrency import run_in_threadpool
 import os
-import time
-from sqlalchemy.exc import OperationalError
 
 app = FastAPI(title="Campus Digital Lost & Found", version="1.0.0")
 
+# Innermost, so its 503s (and the 429s below) still get CORS headers and show up in the metrics
+app.add_middleware(ReadinessGate)
+# Rejects over-budget and over-capacity requests before their body is read
+app.add_middleware(AdmissionControlMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -17,6 +28,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so the timings include CORS handling
+app.add_middleware(RequestMetricsMiddleware)
 
 
 # Mount static files - FIXED PATH
@@ -27,38 +40,47 @@ STATIC_DIR = os.path.join(BASE_DIR, "static")
 # Create the static directory if it doesn't exist
 os.makedirs(STATIC_DIR, exist_ok=True)
 
-# Mount static files
-app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
+# Mount static files; content-addressed images are cached as immutable
+app.mount("/static", CachedStaticFiles(directory=STATIC_DIR), name="static")
+
+async def bootstrap():
+    await run_in_threadpool(init_db)
+    await warm_pools()
+    await run_in_threadpool(audit_log.start)
+    # Only once the schema is there; a no-op on a retried bootstrap
+    job_scheduler.start()
 
-# Initialize database
 @app.on_event("startup")
-def on_startup():
-    init_db()
-    
+async def on_startup():
+    # Never blocks the event loop; if the database is not up yet this returns
+    # and retries in the background while /healthz answers
+    await readiness.start(bootstrap)
 
+@app.on_event("shutdown")
+async def on_shutdown():
+    await readiness.stop()
+    # Let a running job finish its batch before the engine goes away
+    await run_in_threadpool(job_scheduler.stop)
+    # End open feed connections so the server can finish shutting down
+    item_feed.close_all()
+    password_hasher.shutdown()
+    # Write out queued audit entries before the engine goes away
+    audit_log.stop()
+    if async_engine is not None:
+        # Close pooled connections while their event loop is still running
+        await async_engine.dispose()
 
 
 # Include routers
 app.include_router(auth.router)
 app.include_router(items.router)
 app.include_router(users.router)
+app.include_router(instrumentation.router)
+app.include_router(instrumentation.metrics_router)
+app.include_router(logs.router)
+app.include_router(feed.router)
+app.include_router(health.router)
 
 @app.get("/")
 def read_root():
     return {"message": "Welcome to Campus Digital Lost & Found API"}
-
-
-async def on_startup():
-    max_retries = 30
-    for attempt in range(max_retries):
-        try:
-            init_db()
-            print("Database initialized successfully!")
-            break
-        except OperationalError:
-            print(f"Database not ready, retrying... ({attempt + 1}/{max_retries})")
-            time.sleep(2)
-    else:
-        print("Failed to initialize database after multiple attempts")
-
-app.add_event_handler("startup", on_startup)
\ No newline at end of file
@@ -0,0 +1,370 @@
+import argparse
+import math
+import os
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from sqlalchemy import case, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from .models import Item, ItemMatch, ItemStatus, User
+from .search import FIELD_WEIGHTS, SEARCH_FIELDS, tokenize
+
+try:
+    import numpy as np
+except ImportError:  # only the batch rebuild needs it
+    np = None
+
+load_dotenv()
+
+# Only reports of the same category created this close together are compared
+MATCH_WINDOW_DAYS = int(os.getenv("MATCH_WINDOW_DAYS", "30"))
+MATCH_MIN_SCORE = float(os.getenv("MATCH_MIN_SCORE", "0.15"))
+# Best matches stored per report
+MATCH_LIMIT = int(os.getenv("MATCH_LIMIT", "20"))
+REBUILD_CHUNK_SIZE = 256
+
+OPPOSITE = {ItemStatus.LOST.value: ItemStatus.FOUND.value, ItemStatus.FOUND.value: ItemStatus.LOST.value}
+OPEN_STATUSES = tuple(OPPOSITE)
+
+
+def _value(enum_or_str):
+    return getattr(enum_or_str, "value", enum_or_str)
+
+
+def _seconds(created_at):
+    # Naive UTC timestamps; datetime.timestamp() would assume local time
+    return ((created_at or datetime.utcnow()) - datetime(1970, 1, 1)).total_seconds()
+
+
+def term_weights(title, description, location) -> Counter:
+    """Field-weighted term frequencies, the same weighting search ranks with."""
+    weights = Counter()
+    for field, value in zip(SEARCH_FIELDS, (title, description, location)):
+        for token in tokenize(value):
+            weights[token] += FIELD_WEIGHTS[field]
+    return weights
+
+
+def match_key(item):
+    """(category, status, terms) of an open report, or None once it is claimed."""
+    status = _value(item.status)
+    if status not in OPEN_STATUSES:
+        return None
+    return _value(item.category), status, frozenset(term_weights(item.title, item.description, item.location))
+
+
+def _idf(documents, frequency):
+    return math.log((1 + documents) / (1 + frequency)) + 1
+
+
+class TermStatistics:
+    """Per-category document frequencies of open reports, used for IDF.
+
+    Built from the items table on first use and kept current with deltas, like
+    the stats cache. Another worker's writes only shift the weights slightly.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frequencies = defaultdict(Counter)
+        self._documents = Counter()
+        self._built = False
+
+    def _ensure_built(self, db: Session):
+        if self._built:
+            return
+        with self._lock:
+            if self._built:
+                return
+            rows = db.query(Item.category, Item.title, Item.description, Item.location)\
+                     .filter(Item.status.in_(OPEN_STATUSES))\
+                     .yield_per(1000)
+            for category, title, description, location in rows:
+                self._add(_value(category), term_weights(title, description, location))
+            self._built = True
+
+    def _add(self, category, terms, sign=1):
+        self._documents[category] += sign
+        frequencies = self._frequencies[category]
+        for term in terms:
+            frequencies[term] += sign
+            if frequencies[term] <= 0:
+                del frequencies[term]
+
+    def item_changed(self, old=None, new=None):
+        """Apply a write; old/new are match_key() tuples (None when not open)."""
+        with self._lock:
+            if not self._built:
+                return
+            if old is not None:
+                self._add(old[0], old[2], -1)
+            if new is not None:
+                self._add(new[0], new[2])
+
+    def idf(self, db: Session, category):
+        self._ensure_built(db)
+        with self._lock:
+            documents = self._documents[category]
+            frequencies = dict(self._frequencies[category])
+        return lambda term: _idf(documents, frequencies.get(term, 0))
+
+    def invalidate(self):
+        with self._lock:
+            self._frequencies.clear()
+            self._documents.clear()
+            self._built = False
+
+
+term_statistics = TermStatistics()
+
+
+def _unit_vector(weights, idf):
+    vector = {term: weight * idf(term) for term, weight in weights.items()}
+    norm = math.sqrt(sum(value * value for value in vector.values()))
+    return {term: value / norm for term, value in vector.items()} if norm else {}
+
+
+def _cosine(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(value * b.get(term, 0.0) for term, value in a.items())
+
+
+def candidate_query(db: Session, category, status, created_at, item_id):
+    """Open reports one report is compared against: one range of the (status, category, created_at) index."""
+    window = timedelta(days=MATCH_WINDOW_DAYS)
+    return db.query(Item.id, Item.title, Item.description, Item.location)\
+             .filter(
+                 Item.status == status,
+                 Item.category == category,
+                 Item.created_at.between(created_at - window, created_at + window),
+                 Item.id != item_id
+             )
+
+
+def score_candidates(db: Session, item):
+    """[(other_item_id, score)] best first, among open reports of the opposite status.
+
+    Blocking on category and the time window keeps this to one indexed range
+    read instead of a comparison against the whole table.
+    """
+    opposite = OPPOSITE.get(_value(item.status))
+    if opposite is None:
+        return []
+    category = _value(item.category)
+    idf = term_statistics.idf(db, category)
+    vector = _unit_vector(term_weights(item.title, item.description, item.location), idf)
+    if not vector:
+        return []
+
+    scored = []
+    candidates = candidate_query(db, category, opposite, item.created_at or datetime.utcnow(), item.id)
+    for other_id, title, description, location in candidates.yield_per(1000):
+        score = _cosine(vector, _unit_vector(term_weights(title, description, location), idf))
+        if score >= MATCH_MIN_SCORE:
+            scored.append((other_id, score))
+    scored.sort(key=lambda match: (-match[1], -match[0]))
+    return scored[:MATCH_LIMIT]
+
+
+def _matches_of(item_id):
+    return or_(ItemMatch.lost_item_id == item_id, ItemMatch.found_item_id == item_id)
+
+
+def forget_matches(db: Session, item_id: int):
+    """Delete every stored pair involving the item (the caller commits)."""
+    db.query(ItemMatch).filter(_matches_of(item_id)).delete(synchronize_session=False)
+
+
+def store_matches(db: Session, item, attempts: int = 2) -> bool:
+    """Recompute the item's best matches inside the caller's transaction; the caller commits.
+
+    Each attempt runs in a savepoint, so losing a race for a pair only undoes
+    the pairs and never the item write around it.
+    """
+    for attempt in range(attempts):
+        try:
+            with db.begin_nested():
+                forget_matches(db, item.id)
+                is_lost = _value(item.status) == ItemStatus.LOST.value
+                for other_id, score in score_candidates(db, item):
+                    db.add(ItemMatch(
+                        lost_item_id=item.id if is_lost else other_id,
+                        found_item_id=other_id if is_lost else item.id,
+                        score=score
+                    ))
+            return True
+        except IntegrityError:
+            # The other report was matched against this one concurrently
+            continue
+    print(f"Could not store matches for item {item.id}")
+    return False
+
+
+def record_matches(db: Session, item, attempts: int = 2):
+    """store_matches() in a transaction of its own, for reports that are already committed."""
+    store_matches(db, item, attempts)
+    db.commit()
+
+
+def record_new_matches(db: Session, items):
+    """record_matches() for a batch of just created reports, in one commit."""
+    pairs = {}
+    for item in items:
+        is_lost = _value(item.status) == ItemStatus.LOST.value
+        for other_id, score in score_candidates(db, item):
+            # Two new opposite reports find each other twice; keep the pair once
+            pairs[(item.id, other_id) if is_lost else (other_id, item.id)] = score
+    for (lost_id, found_id), score in pairs.items():
+        db.add(ItemMatch(lost_item_id=lost_id, found_item_id=found_id, score=score))
+    try:
+        db.commit()
+    except IntegrityError:
+        # Some report was matched against one of these concurrently
+        db.rollback()
+        for item in items:
+            record_matches(db, item)
+
+
+def matches_query(db: Session, item_id: int):
+    other_id = case(
+        (ItemMatch.lost_item_id == item_id, ItemMatch.found_item_id),
+        else_=ItemMatch.lost_item_id
+    )
+    return db.query(Item, User.name, ItemMatch.score)\
+             .join(ItemMatch, Item.id == other_id)\
+             .join(User, Item.user_id == User.id)\
+             .filter(_matches_of(item_id), Item.status.in_(OPEN_STATUSES))\
+             .order_by(ItemMatch.score.desc(), Item.id.desc())
+
+
+def get_matches(db: Session, item_id: int, limit: int = MATCH_LIMIT):
+    """[(item, owner_name, score)] for the other side of each stored pair, best first."""
+    return matches_query(db, item_id).limit(limit).all()
+
+
+def _top_k(groups, scores, k):
+    """Mask keeping the k highest scores within each group."""
+    order = np.lexsort((-scores, groups))
+    sorted_groups = groups[order]
+    starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+    lengths = np.diff(np.r_[starts, len(order)])
+    rank = np.arange(len(order)) - np.repeat(starts, lengths)
+    mask = np.zeros(len(order), dtype=bool)
+    mask[order[rank < k]] = True
+    return mask
+
+
+def _dense(rows, vocabulary):
+    matrix = np.zeros((len(rows), len(vocabulary)), dtype=np.float32)
+    for i, vector in enumerate(rows):
+        for term, value in vector.items():
+            column = vocabulary.get(term)
+            if column is not None:
+                matrix[i, column] = value
+    return matrix
+
+
+def _match_category(lost, found, chunk_size):
+    """Score every LOST/FOUND pair of one category inside the time window.
+
+    lost and found are [(item_id, created_at seconds, unit vector)] sorted by time.
+    Only terms present on both sides can contribute to a dot product, so the
+    dense chunks are restricted to that shared vocabulary.
+    """
+    shared = set().union(*(vector for _, _, vector in lost)) & set().union(*(vector for _, _, vector in found))
+    if not shared:
+        return []
+    vocabulary = {term: column for column, term in enumerate(sorted(shared))}
+    found_ids = np.array([item_id for item_id, _, _ in found])
+    found_times = np.array([created for _, created, _ in found])
+    window = MATCH_WINDOW_DAYS * 86400
+
+    lost_idx, found_idx, scores = [], [], []
+    for start in range(0, len(lost), chunk_size):
+        chunk = lost[start:start + chunk_size]
+        lost_times = np.array([created for _, created, _ in chunk])
+        lost_matrix = _dense([vector for _, _, vector in chunk], vocabulary)
+        # Found reports inside the window of any report in this (time sorted) chunk
+        low = np.searchsorted(found_times, lost_times[0] - window, side="left")
+        high = np.searchsorted(found_times, lost_times[-1] + window, side="right")
+        for found_start in range(low, high, chunk_size):
+            found_end = min(found_start + chunk_size, high)
+            found_matrix = _dense([vector for _, _, vector in found[found_start:found_end]], vocabulary)
+            similarity = lost_matrix @ found_matrix.T
+            in_window = np.abs(lost_times[:, None] - found_times[None, found_start:found_end]) <= window
+            rows, columns = np.nonzero((similarity >= MATCH_MIN_SCORE) & in_window)
+            lost_idx.append(rows + start)
+            found_idx.append(columns + found_start)
+            scores.append(similarity[rows, columns])
+
+    if not lost_idx:
+        return []
+    lost_idx = np.concatenate(lost_idx)
+    found_idx = np.concatenate(found_idx)
+    scores = np.concatenate(scores).astype(np.float64)
+    # Same pairs the incremental path keeps: each report's MATCH_LIMIT best
+    keep = _top_k(lost_idx, scores, MATCH_LIMIT) | _top_k(found_idx, scores, MATCH_LIMIT)
+    lost_ids = np.array([item_id for item_id, _, _ in lost])
+    return list(zip(lost_ids[lost_idx[keep]].tolist(), found_ids[found_idx[keep]].tolist(), scores[keep].tolist()))
+
+
+def rebuild_matches(db: Session, chunk_size: int = REBUILD_CHUNK_SIZE) -> int:
+    """Recompute the whole item_matches table with vectorized scoring; returns the pair count."""
+    if np is None:
+        raise RuntimeError("NumPy is required to rebuild matches")
+
+    documents = defaultdict(lambda: {ItemStatus.LOST.value: [], ItemStatus.FOUND.value: []})
+    rows = db.query(Item.id, Item.category, Item.status, Item.created_at, Item.title, Item.description, Item.location)\
+             .filter(Item.status.in_(OPEN_STATUSES))\
+             .yield_per(1000)
+    for item_id, category, status, created_at, title, description, location in rows:
+        documents[_value(category)][_value(status)].append(
+            (item_id, _seconds(created_at), term_weights(title, description, location))
+        )
+
+    term_statistics.invalidate()
+    pairs = []
+    for category, by_status in documents.items():
+        reports = by_status[ItemStatus.LOST.value] + by_status[ItemStatus.FOUND.value]
+        frequencies = Counter(term for _, _, weights in reports for term in weights)
+        idf = lambda term: _idf(len(reports), frequencies[term])
+        lost, found = (
+            sorted(((item_id, created, _unit_vector(weights, idf)) for item_id, created, weights in by_status[status]),
+                   key=lambda document: document[1])
+            for status in (ItemStatus.LOST.value, ItemStatus.FOUND.value)
+        )
+        if lost and found:
+            pairs.extend(_match_category(lost, found, chunk_size))
+
+    db.query(ItemMatch).delete(synchronize_session=False)
+    now = datetime.utcnow()
+    for start in range(0, len(pairs), 1000):
+        db.bulk_insert_mappings(ItemMatch, [
+            {"lost_item_id": lost_id, "found_item_id": found_id, "score": score, "created_at": now}
+            for lost_id, found_id, score in pairs[start:start + 1000]
+        ])
+    db.commit()
+    return len(pairs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lost/found report matching")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("rebuild", help="recompute every stored match")
+    args = parser.parse_args()
+
+    from .database import SessionLocal
+
+    if args.command == "rebuild":
+        db = SessionLocal()
+        try:
+            print(f"Stored {rebuild_matches(db)} matches")
+        finally:
+            db.close()
+
+
+if __name__ == "__main__":
+    main()
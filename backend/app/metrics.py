@@ -0,0 +1,334 @@
+"""Per-request latency, SQL query counts and Prometheus exposition.
+
+RequestMetricsMiddleware times every HTTP request and labels it with the
+route template (/items/{item_id}, not /items/42) so the series stay bounded.
+Cursor events on the engines count each statement and its time against the
+request that ran it, through a context variable that follows the request
+onto the threadpool and into AsyncSession greenlets; a request that runs far
+more queries than usual (an N+1) or a statement over SLOW_QUERY_MS is logged.
+Those reports go to the "app.metrics" logger: slow statements and N+1s at
+WARNING, slow requests at INFO.
+
+render() writes these, plus the background job metrics and the pool, audit,
+read cache, feed and rate limit counters, in the Prometheus text format for
+GET /metrics. With DEBUG=true responses also carry a Server-Timing header for
+the browser's network panel.
+"""
+import contextvars
+import logging
+import os
+import threading
+import time
+from dotenv import load_dotenv
+from sqlalchemy import event
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+DEBUG = os.getenv("DEBUG", "false").lower() == "true"
+# Statements slower than this are logged with the route that ran them
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "1000"))
+# Requests running more statements than this are logged as likely N+1s
+REQUEST_QUERY_WARN = int(os.getenv("REQUEST_QUERY_WARN", "25"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+JOB_DURATION_BUCKETS = (0.01, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, labels, value) for labels, value in self._values.items()]
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, labels=()):
+        with self._lock:
+            counts = self._values.get(labels)
+            if counts is None:
+                # One slot per bucket, then the sum and the count
+                counts = self._values[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            values = [(labels, list(counts)) for labels, counts in self._values.items()]
+        samples = []
+        for labels, counts in values:
+            for bound, count in zip(self.buckets, counts):
+                samples.append((self.name + "_bucket", labels + (("le", _format(bound)),), count))
+            samples.append((self.name + "_bucket", labels + (("le", "+Inf"),), counts[-1]))
+            samples.append((self.name + "_sum", labels, counts[-2]))
+            samples.append((self.name + "_count", labels, counts[-1]))
+        return samples
+
+
+request_duration = Histogram(
+    "http_request_duration_seconds", "Time to the end of the response body", ("method", "route"))
+requests_total = Counter("http_requests_total", "Requests by route and status", ("method", "route", "status"))
+request_queries = Histogram(
+    "http_request_db_queries", "SQL statements per request", ("method", "route"), QUERY_COUNT_BUCKETS)
+request_db_seconds = Histogram(
+    "http_request_db_seconds", "Time spent in SQL statements per request", ("method", "route"))
+query_duration = Histogram("db_query_duration_seconds", "SQL statement execution time, requests and background jobs")
+slow_queries = Counter("db_slow_queries_total", f"SQL statements slower than {SLOW_QUERY_MS:g} ms")
+
+REQUEST_METRICS = (request_duration, requests_total, request_queries, request_db_seconds, query_duration, slow_queries)
+
+job_runs = Counter("job_runs_total", "Background job runs by outcome (skipped: another worker held the lock)", ("job", "status"))
+job_processed = Counter("job_processed_total", "Rows or files handled by background jobs", ("job",))
+job_duration = Histogram("job_duration_seconds", "Background job run time", ("job",), JOB_DURATION_BUCKETS)
+
+JOB_METRICS = (job_runs, job_processed, job_duration)
+
+
+class RequestStats:
+    __slots__ = ("request", "queries", "db_seconds")
+
+    def __init__(self, request=None):
+        self.request = request
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+# One mutable RequestStats per request; copies of the context (threadpool,
+# greenlets) share the object, so statements run there still add to it
+_current_request = contextvars.ContextVar("current_request", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_query_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    query_duration.observe(elapsed)
+    stats = _current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        slow_queries.inc()
+        where = stats.request if stats is not None else "background"
+        logger.warning("Slow query (%.0f ms, %s): %s", elapsed * 1000, where, " ".join(statement.split())[:500])
+
+
+def instrument_engine(engine):
+    """Count and time every statement run on this (sync) engine."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _route_label(scope):
+    """The matched route's path template, so ids do not become label values."""
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    for route in scope["app"].router.routes:
+        if getattr(route, "endpoint", None) is endpoint or getattr(route, "app", None) is endpoint:
+            return route.path
+    return "unmatched"
+
+
+class RequestMetricsMiddleware:
+    """Pure ASGI middleware, so streamed responses are timed to their last chunk."""
+
+    def __init__(self, app, server_timing: bool = DEBUG):
+        self.app = app
+        self.server_timing = server_timing
+        self._labels = {}
+
+    def _label(self, scope):
+        endpoint = scope.get("endpoint")
+        label = self._labels.get(endpoint)
+        if label is None:
+            label = self._labels[endpoint] = _route_label(scope)
+        return label
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(f"{scope['method']} {scope['path']}")
+        token = _current_request.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_metrics(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", _server_timing(stats, time.perf_counter() - started)))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            _current_request.reset(token)
+            elapsed = time.perf_counter() - started
+            route = self._label(scope)
+            labels = (("method", scope["method"]), ("route", route))
+            request_duration.observe(elapsed, labels)
+            requests_total.inc(labels + (("status", str(status)),))
+            request_queries.observe(stats.queries, labels)
+            request_db_seconds.observe(stats.db_seconds, labels)
+            if stats.queries > REQUEST_QUERY_WARN:
+                logger.warning(
+                    "%s %s ran %d queries (%.0f ms)", scope["method"], route, stats.queries, stats.db_seconds * 1000
+                )
+            if elapsed * 1000 >= SLOW_REQUEST_MS:
+                logger.info(
+                    "Slow request: %s %s took %.0f ms, %d queries (%.0f ms)",
+                    scope["method"], route, elapsed * 1000, stats.queries, stats.db_seconds * 1000
+                )
+
+
+def _server_timing(stats, elapsed):
+    return (
+        f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries", '
+        f"app;dur={(elapsed - stats.db_seconds) * 1000:.1f}, total;dur={elapsed * 1000:.1f}"
+    ).encode()
+
+
+def _format(value):
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, float):
+        return repr(value) if value != int(value) else f"{value:.1f}"
+    return str(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _sample_line(name, labels, value):
+    if labels:
+        name += "{" + ",".join(f'{key}="{_escape(label)}"' for key, label in labels) + "}"
+    return f"{name} {_format(value)}"
+
+
+def _family(lines, name, kind, documentation, samples):
+    lines.append(f"# HELP {name} {documentation}")
+    lines.append(f"# TYPE {name} {kind}")
+    lines.extend(_sample_line(*sample) for sample in samples)
+
+
+def _simple_families(prefix, snapshot, fields, labels=()):
+    families = []
+    for key, kind, documentation in fields:
+        if key in snapshot:
+            name = f"{prefix}_{key}_total" if kind == "counter" else f"{prefix}_{key}"
+            families.append((name, kind, documentation, [(name, labels, snapshot[key])]))
+    return families
+
+
+def _pool_families(pools):
+    families = []
+    for key, kind, documentation in (
+        ("size", "gauge", "Configured pool size"),
+        ("checked_out", "gauge", "Connections in use"),
+        ("overflow", "gauge", "Overflow connections open"),
+        ("checkouts", "counter", "Connection checkouts"),
+        ("timeouts", "counter", "Checkouts that timed out waiting for a connection"),
+    ):
+        name = f"db_pool_{key}_total" if kind == "counter" else f"db_pool_{key}"
+        samples = [(name, (("pool", pool),), snapshot[key]) for pool, snapshot in pools.items() if key in snapshot]
+        if samples:
+            families.append((name, kind, documentation, samples))
+
+    samples = []
+    for pool, snapshot in pools.items():
+        labels = (("pool", pool),)
+        for bound, count in snapshot.get("checkout_seconds_buckets", {}).items():
+            samples.append(("db_pool_checkout_seconds_bucket", labels + (("le", _format(bound)),), count))
+        if "checkout_seconds_buckets" in snapshot:
+            samples.append(("db_pool_checkout_seconds_bucket", labels + (("le", "+Inf"),), snapshot["checkouts"]))
+            samples.append(("db_pool_checkout_seconds_sum", labels, snapshot["checkout_seconds_total"]))
+            samples.append(("db_pool_checkout_seconds_count", labels, snapshot["checkouts"]))
+    if samples:
+        families.append(("db_pool_checkout_seconds", "histogram", "Time to check out a connection", samples))
+    return families
+
+
+def _rate_limit_families(rate_limits, concurrency):
+    families = []
+    for key, documentation in (("allowed", "Requests within their rate limit budget"),
+                               ("limited", "Requests rejected with 429 by a rate limit budget")):
+        name = f"rate_limit_{key}_total"
+        samples = [(name, (("budget", budget),), count) for budget, count in sorted(rate_limits[key].items())]
+        families.append((name, "counter", documentation, samples))
+    for key, kind, documentation in (
+        ("limit", "gauge", "Concurrent requests allowed per group"),
+        ("in_flight", "gauge", "Requests running per concurrency group"),
+        ("rejected", "counter", "Requests rejected with 429 for exceeding a concurrency cap"),
+    ):
+        name = f"concurrency_{key}_total" if kind == "counter" else f"concurrency_{key}"
+        samples = [(name, (("group", group),), values[key]) for group, values in concurrency.items()]
+        families.append((name, kind, documentation, samples))
+    return families
+
+
+def render(pools, audit, cache, feed, rate_limits, concurrency) -> str:
+    """Everything in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for metric in REQUEST_METRICS + JOB_METRICS:
+        kind = "histogram" if isinstance(metric, Histogram) else "counter"
+        _family(lines, metric.name, kind, metric.documentation, metric.samples())
+    families = _pool_families(pools)
+    families += _simple_families("audit", audit, (
+        ("queued", "gauge", "Audit entries waiting to be written"),
+        ("flushed", "counter", "Audit entries written"),
+        ("failures", "counter", "Audit batches that failed to write"),
+    ))
+    families += _simple_families("read_cache", cache, (
+        ("hits", "counter", "Read cache hits"),
+        ("misses", "counter", "Read cache misses"),
+        ("errors", "counter", "Read cache backend errors"),
+        ("size", "gauge", "Entries in the read cache"),
+        ("evictions", "counter", "Read cache entries evicted for space"),
+    ), (("backend", cache["backend"]),))
+    families += _simple_families("feed", feed, (
+        ("subscribers", "gauge", "Connected feed clients"),
+        ("published", "counter", "Feed events published"),
+        ("delivered", "counter", "Feed events queued to clients"),
+        ("dropped", "counter", "Feed clients disconnected for falling behind"),
+    ))
+    families += _rate_limit_families(rate_limits, concurrency)
+    for name, kind, documentation, samples in families:
+        _family(lines, name, kind, documentation, samples)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,174 @@
+"""Ordered, recorded schema changes for databases created by earlier versions.
+
+create_all() only creates missing tables, so columns, indexes and type changes
+added later go here. Each migration runs once per database, is recorded in
+schema_version and is written to be a no-op where the schema is already
+current (fresh databases get everything from create_all()).
+"""
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy import inspect, insert, select, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from .models import Base, Item, SchemaVersion
+
+MIGRATION_LOCK_NAME = "lostfound_schema_migrations"
+MIGRATION_LOCK_TIMEOUT = 60
+
+
+class MigrationLockTimeout(RuntimeError):
+    """Another process held the migration lock for longer than MIGRATION_LOCK_TIMEOUT."""
+
+
+def _add_column(conn, table, column):
+    existing = {info["name"] for info in inspect(conn).get_columns(table.name)}
+    if column.name not in existing:
+        column_type = column.type.compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+
+def add_later_columns(conn):
+    _add_column(conn, Item.__table__, Item.__table__.c.image_hash)
+    if conn.dialect.name == "mysql":
+        # Matches init.sql; create_all() used to make it VARCHAR(20)
+        conn.execute(text("ALTER TABLE items MODIFY contact_phone VARCHAR(100)"))
+
+
+def log_status_values(conn):
+    # Log statuses were stored by enum name ('LOST'), items and init.sql use the value ('lost')
+    if conn.dialect.name == "mysql":
+        conn.execute(text(
+            "ALTER TABLE logs "
+            "MODIFY old_status ENUM('lost','found','claimed') NULL, "
+            "MODIFY new_status ENUM('lost','found','claimed') NULL"
+        ))
+    else:
+        conn.execute(text("UPDATE logs SET old_status = lower(old_status), new_status = lower(new_status)"))
+
+
+def detach_logs_from_items(conn):
+    # SQLite cannot drop a constraint in place and does not enforce it by default
+    if conn.dialect.name != "mysql":
+        return
+    for foreign_key in inspect(conn).get_foreign_keys("logs"):
+        if foreign_key["referred_table"] == "items" and foreign_key.get("name"):
+            conn.execute(text(f"ALTER TABLE logs DROP FOREIGN KEY {foreign_key['name']}"))
+
+
+def create_declared_indexes(conn):
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(conn)
+                existing.add(index.name)
+
+
+def create_declared_tables(conn):
+    Base.metadata.create_all(bind=conn, checkfirst=True)
+
+
+def sqlite_fulltext_index(conn):
+    from .search import create_sqlite_fulltext
+
+    create_sqlite_fulltext(conn)
+
+
+# (version, description, upgrade(connection)); append only, never renumber
+MIGRATIONS = (
+    (1, "Add columns introduced after the initial schema", add_later_columns),
+    (2, "Store log statuses by value", log_status_values),
+    (3, "Keep audit logs when their item is deleted", detach_logs_from_items),
+    (4, "Composite indexes for item filters and log lookups", create_declared_indexes),
+    (5, "Index logs by time for the audit API and archival", create_declared_indexes),
+    (6, "Index items by owner and status for my items", create_declared_indexes),
+    (7, "Add the item archive and background job history", create_declared_tables),
+    (8, "Full-text search table for SQLite", sqlite_fulltext_index),
+)
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+@contextmanager
+def _migration_lock(engine):
+    """Serialize migrations between workers starting at the same time (MySQL only)."""
+    if engine.dialect.name != "mysql":
+        yield
+        return
+    with engine.connect() as conn:
+        acquired = conn.execute(
+            text("SELECT GET_LOCK(:name, :timeout)"),
+            {"name": MIGRATION_LOCK_NAME, "timeout": MIGRATION_LOCK_TIMEOUT}
+        ).scalar()
+        if not acquired:
+            raise MigrationLockTimeout("Timed out waiting for another process to finish migrating")
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": MIGRATION_LOCK_NAME})
+
+
+def applied_versions(conn):
+    return {row[0] for row in conn.execute(select(SchemaVersion.version))}
+
+
+def current_version(conn):
+    return max(applied_versions(conn), default=0)
+
+
+def _apply_pending(engine):
+    applied = []
+    with engine.connect() as conn:
+        done = applied_versions(conn)
+    for version, description, upgrade in MIGRATIONS:
+        if version in done:
+            continue
+        # MySQL commits DDL implicitly, which is why every upgrade is idempotent
+        with engine.begin() as conn:
+            upgrade(conn)
+            conn.execute(insert(SchemaVersion).values(
+                version=version, description=description, applied_at=datetime.utcnow()
+            ))
+        print(f"Applied migration {version}: {description}")
+        applied.append(version)
+    return applied
+
+
+def migrate(engine):
+    """Apply pending migrations in order; returns the versions applied."""
+    with _migration_lock(engine):
+        return _apply_pending(engine)
+
+
+def schema_is_current(engine) -> bool:
+    """Whether every migration is recorded; one query, no DDL or table inspection."""
+    with engine.connect() as conn:
+        try:
+            return current_version(conn) >= LATEST_VERSION
+        except ProgrammingError:
+            return False  # no schema_version table yet: a fresh database
+        except OperationalError as error:
+            # SQLite reports a missing table as an OperationalError
+            if "no such table" in str(error):
+                return False
+            raise
+
+
+def bootstrap_schema(engine, *steps):
+    """Create tables, run steps(engine) and pending migrations, once per database.
+
+    Workers find the schema current with a single query and return False. The
+    first one to find it behind does the work under the migration lock while
+    the others wait, then see it current and skip it. steps run before the
+    migrations are recorded, so an interrupted bootstrap is retried in full.
+    """
+    if schema_is_current(engine):
+        return False
+    with _migration_lock(engine):
+        if schema_is_current(engine):
+            return False
+        Base.metadata.create_all(bind=engine)
+        for step in steps:
+            step(engine)
+        _apply_pending(engine)
+    return True
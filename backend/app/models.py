@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, Enum, DateTime, ForeignKey
+from sqlalchemy import create_engine, Column, Integer, String, Text, Enum, DateTime, Float, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
@@ -47,6 +47,16 @@ class User(Base):
 
 class Item(Base):
     __tablename__ = "items"
+    __table_args__ = (
+        # One per filter combination get_items serves, each ending in the keyset sort column
+        Index("ix_items_created_at", "created_at"),
+        Index("ix_items_category_created_at", "category", "created_at"),
+        Index("ix_items_status_created_at", "status", "created_at"),
+        Index("ix_items_status_category_created_at", "status", "category", "created_at"),
+        Index("ix_items_user_id_created_at", "user_id", "created_at"),
+        # /users/me/items: an owner's reports by status, and their per-status counts
+        Index("ix_items_user_id_status_created_at", "user_id", "status", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(100), nullable=False)
@@ -54,27 +64,87 @@ class Item(Base):
     #category = Column(Enum(ItemCategory), nullable=False)
     category = Column(Enum(ItemCategory, values_callable=lambda x: [e.value for e in x]), nullable=False)
     #status = Column(Enum(ItemStatus), default=ItemStatus.LOST)
-    status = Column(Enum(ItemStatus, values_callable=lambda obj: [e.value for e in obj]), default=ItemStatus.LOST.value)
+    status = Column(Enum(ItemStatus, values_callable=lambda obj: [e.value for e in obj]), default=ItemStatus.LOST.value, nullable=False)
     location = Column(String(255))
-    image_url = Column(String(255))
-    user_id = Column(Integer, ForeignKey("users.id"))
-    contact_phone = Column(String(20))  # Add this field
+    image_url = Column(String(255), index=True)
+    image_hash = Column(String(16))  # perceptual hash of the photo, hex
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    contact_phone = Column(String(100))  # Add this field
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     owner = relationship("User", back_populates="items")
-    logs = relationship("Log", back_populates="item")
+    # The audit trail outlives the item, so deleting an item leaves its logs alone
+    logs = relationship("Log", back_populates="item", primaryjoin="Item.id == foreign(Log.item_id)", passive_deletes="all")
 
 class Log(Base):
     __tablename__ = "logs"
+    __table_args__ = (
+        Index("ix_logs_item_id_changed_at", "item_id", "changed_at"),
+        Index("ix_logs_changed_by_changed_at", "changed_by", "changed_at"),
+        Index("ix_logs_changed_at", "changed_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    item_id = Column(Integer, ForeignKey("items.id"))
+    # No foreign key: DELETE entries must survive the item they describe
+    item_id = Column(Integer, nullable=False)
     action = Column(String(50), nullable=False)
-    old_status = Column(Enum(ItemStatus))
-    new_status = Column(Enum(ItemStatus))
-    changed_by = Column(Integer, ForeignKey("users.id"))
+    old_status = Column(Enum(ItemStatus, values_callable=lambda obj: [e.value for e in obj]))
+    new_status = Column(Enum(ItemStatus, values_callable=lambda obj: [e.value for e in obj]))
+    changed_by = Column(Integer, ForeignKey("users.id"), nullable=False)
     changed_at = Column(DateTime, default=datetime.utcnow)
     
-    item = relationship("Item", back_populates="logs")
-    changed_by_user = relationship("User", back_populates="logs")
\ No newline at end of file
+    item = relationship("Item", back_populates="logs", primaryjoin="Item.id == foreign(Log.item_id)")
+    changed_by_user = relationship("User", back_populates="logs")
+
+class ItemMatch(Base):
+    __tablename__ = "item_matches"
+    __table_args__ = (UniqueConstraint("lost_item_id", "found_item_id", name="uq_item_matches_pair"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    lost_item_id = Column(Integer, ForeignKey("items.id"), nullable=False, index=True)
+    found_item_id = Column(Integer, ForeignKey("items.id"), nullable=False, index=True)
+    score = Column(Float, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ArchivedItem(Base):
+    """Unclaimed reports moved out of items by the archive_items job, as they were."""
+    __tablename__ = "archived_items"
+    
+    id = Column(Integer, primary_key=True, autoincrement=False)  # the id it had in items
+    title = Column(String(100), nullable=False)
+    description = Column(Text)
+    category = Column(Enum(ItemCategory, values_callable=lambda x: [e.value for e in x]), nullable=False)
+    status = Column(Enum(ItemStatus, values_callable=lambda obj: [e.value for e in obj]), nullable=False)
+    location = Column(String(255))
+    image_url = Column(String(255), index=True)
+    image_hash = Column(String(16))
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    contact_phone = Column(String(100))
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    archived_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class JobRun(Base):
+    """One run of a background job from app/jobs.py."""
+    __tablename__ = "job_runs"
+    __table_args__ = (Index("ix_job_runs_job_started_at", "job", "started_at"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    job = Column(String(50), nullable=False)
+    # running, succeeded or failed
+    status = Column(String(20), nullable=False)
+    worker = Column(String(100), nullable=False)
+    started_at = Column(DateTime, nullable=False, index=True)
+    finished_at = Column(DateTime)
+    duration_ms = Column(Float)
+    processed = Column(Integer, default=0)
+    error = Column(String(500))
+
+class SchemaVersion(Base):
+    """Migrations from app/migrations.py already applied to this database."""
+    __tablename__ = "schema_version"
+    
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    description = Column(String(255), nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
@@ -0,0 +1,46 @@
+import base64
+import json
+from datetime import datetime
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Rows fetched from the DB cursor at a time when streaming
+STREAM_CHUNK_SIZE = 500
+
+
+def encode_cursor(created_at: datetime, item_id: int) -> str:
+    """Pack the (created_at, id) keyset of the last row into an opaque token."""
+    raw = json.dumps([created_at.isoformat(), item_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, item_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(item_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def apply_keyset(query, created_col, id_col, cursor: str = None):
+    """Order newest first and, given a cursor, resume strictly after it.
+
+    The (created_at, id) pair is unique, so pages never overlap or skip rows
+    even when several items share a timestamp.
+    """
+    if cursor:
+        created_at, item_id = decode_cursor(cursor)
+        query = query.filter(
+            # The plain upper bound lets the planner seek into the (..., created_at)
+            # index; the OR alone makes it walk the index from the newest row
+            created_col <= created_at,
+            or_(
+                created_col < created_at,
+                and_(created_col == created_at, id_col < item_id),
+            )
+        )
+    return query.order_by(created_col.desc(), id_col.desc())
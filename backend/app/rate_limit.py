@@ -0,0 +1,354 @@
+"""Admission control for the expensive routes: token buckets and concurrency caps.
+
+Each budget is a token bucket of RATE_LIMIT_<NAME>="count/seconds": a burst
+of up to count requests, refilled at count per seconds. Budgets keyed by
+client IP are enforced by AdmissionControlMiddleware before the request body
+is read; budgets keyed by student number are enforced in the routes, where
+the account is known (the login form, the authenticated user).
+
+The middleware also caps how many requests of each expensive group (bcrypt,
+uploads, bulk import/export) a worker runs at once. Anything over a cap or a
+budget is answered 429 with Retry-After right away instead of queueing on the
+threadpool behind everyone else. Uploads whose Content-Length is over the
+image limit are answered 413 before Starlette spools them, rate limits or not.
+
+Buckets live in process memory by default, so each worker enforces its own
+budgets; RATE_LIMIT_BACKEND=redis shares them between workers. Concurrency
+caps are always per worker.
+"""
+import math
+import os
+import threading
+import time
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from .images import IMAGE_MAX_BYTES
+from .responses import dumps
+
+try:
+    import redis
+except ImportError:  # only needed for RATE_LIMIT_BACKEND=redis
+    redis = None
+
+load_dotenv()
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+# memory or redis
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+RATE_LIMIT_URL = os.getenv("RATE_LIMIT_URL", "redis://localhost:6379/0")
+RATE_LIMIT_PREFIX = "lostfound:ratelimit:"
+# Only behind a proxy that sets it; otherwise clients could pick their own key
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() == "true"
+# Memory store size before idle buckets are swept
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+
+class Budget:
+    def __init__(self, name, spec):
+        count, _, seconds = spec.partition("/")
+        self.name = name
+        self.capacity = int(count)
+        self.refill_per_second = self.capacity / float(seconds)
+
+
+def _budget(name, default):
+    return Budget(name, os.getenv(f"RATE_LIMIT_{name.upper()}", default))
+
+
+# A campus shares few public IPs, so the per-IP budgets are generous and the
+# per-account ones do the real work against credential stuffing
+BUDGETS = {
+    budget.name: budget for budget in (
+        _budget("login_ip", "60/60"),
+        _budget("login_account", "10/300"),
+        _budget("register_ip", "20/600"),
+        _budget("create_item_ip", "60/60"),
+        _budget("create_item_account", "20/60"),
+    )
+}
+
+# (method, path) -> budget keyed by client IP, checked in the middleware
+IP_BUDGETS = {
+    ("POST", "/auth/token"): "login_ip",
+    ("POST", "/auth/register"): "register_ip",
+    ("POST", "/items/"): "create_item_ip",
+}
+
+# (method, path) -> concurrency group; limits are requests in flight per worker
+CONCURRENCY_GROUPS = {
+    ("POST", "/auth/token"): "auth",
+    ("POST", "/auth/register"): "auth",
+    ("POST", "/items/"): "upload",
+    ("POST", "/items/import"): "bulk",
+    ("GET", "/items/export"): "bulk",
+}
+# Room for the form fields and multipart boundaries around the image
+UPLOAD_FORM_SLACK_BYTES = int(os.getenv("UPLOAD_FORM_SLACK_BYTES", str(64 * 1024)))
+# (method, path) -> largest Content-Length accepted, checked in the middleware
+BODY_LIMITS = {
+    ("POST", "/items/"): IMAGE_MAX_BYTES + UPLOAD_FORM_SLACK_BYTES,
+}
+
+CONCURRENCY_LIMITS = {
+    "auth": int(os.getenv("CONCURRENCY_AUTH", "32")),
+    "upload": int(os.getenv("CONCURRENCY_UPLOAD", "8")),
+    "bulk": int(os.getenv("CONCURRENCY_BULK", "2")),
+}
+
+
+class MemoryStore:
+    name = "memory"
+    blocking = False
+
+    def __init__(self, max_keys=RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        # A bucket untouched this long is full again, the same as an absent one
+        self.idle_seconds = max(budget.capacity / budget.refill_per_second for budget in BUDGETS.values())
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, refill_per_second, now):
+        """(allowed, tokens left) after taking one token from the bucket."""
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * refill_per_second)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            if key not in self._buckets and len(self._buckets) >= self.max_keys:
+                self._sweep(now)
+            self._buckets[key] = (tokens, now)
+            return allowed, tokens
+
+    def _sweep(self, now):
+        for key, (_, updated) in list(self._buckets.items()):
+            if now - updated > self.idle_seconds:
+                del self._buckets[key]
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+# Atomic refill-and-take, so workers sharing a bucket cannot both spend its last token
+_TAKE_SCRIPT = """
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local capacity, rate, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local tokens, updated = tonumber(bucket[1]), tonumber(bucket[2])
+if tokens == nil then
+    tokens, updated = capacity, now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisStore:
+    """Any client speaking the redis-py API with register_script; shared by all workers."""
+
+    name = "redis"
+    blocking = True
+
+    def __init__(self, client, prefix=RATE_LIMIT_PREFIX):
+        self.prefix = prefix
+        self._take = client.register_script(_TAKE_SCRIPT)
+
+    def take(self, key, capacity, refill_per_second, now):
+        allowed, tokens = self._take(keys=[self.prefix + key], args=[capacity, refill_per_second, now])
+        return bool(allowed), float(tokens)
+
+
+class RateLimiter:
+    def __init__(self, store, budgets=BUDGETS):
+        self.store = store
+        self.budgets = budgets
+        self.allowed = {}
+        self.limited = {}
+        self.errors = 0
+
+    def _hit(self, name, key):
+        budget = self.budgets[name]
+        try:
+            allowed, tokens = self.store.take(f"{name}:{key}", budget.capacity, budget.refill_per_second, time.time())
+        except Exception as error:
+            # Fail open: a limiter outage must not lock everyone out
+            self.errors += 1
+            print(f"Rate limit store failed: {error}")
+            return None
+        counts = self.allowed if allowed else self.limited
+        counts[name] = counts.get(name, 0) + 1
+        if allowed:
+            return None
+        return max(1, math.ceil((1 - tokens) / budget.refill_per_second))
+
+    async def hit(self, name, key):
+        """Seconds until a token is available, or None if the request may proceed."""
+        if not RATE_LIMIT_ENABLED:
+            return None
+        if self.store.blocking:
+            return await run_in_threadpool(self._hit, name, key)
+        return self._hit(name, key)
+
+    async def enforce(self, name, key):
+        """Raise 429 if the budget for key is spent."""
+        retry_after = await self.hit(name, key)
+        if retry_after is not None:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests, please try again later",
+                headers={"Retry-After": str(retry_after)},
+            )
+
+    def snapshot(self):
+        return {
+            "enabled": RATE_LIMIT_ENABLED,
+            "backend": self.store.name,
+            "allowed": dict(self.allowed),
+            "limited": dict(self.limited),
+            "errors": self.errors,
+        }
+
+
+class ConcurrencyLimiter:
+    """Requests in flight per group; only touched from the event loop, so no lock."""
+
+    def __init__(self, limits=CONCURRENCY_LIMITS):
+        self.limits = limits
+        self.in_flight = {group: 0 for group in limits}
+        self.rejected = {group: 0 for group in limits}
+
+    def try_acquire(self, group):
+        if self.in_flight[group] >= self.limits[group]:
+            self.rejected[group] += 1
+            return False
+        self.in_flight[group] += 1
+        return True
+
+    def release(self, group):
+        self.in_flight[group] -= 1
+
+    def snapshot(self):
+        return {
+            group: {"limit": limit, "in_flight": self.in_flight[group], "rejected": self.rejected[group]}
+            for group, limit in self.limits.items()
+        }
+
+
+concurrency_limiter = ConcurrencyLimiter()
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def _make_store():
+    if RATE_LIMIT_BACKEND == "redis":
+        if redis is None:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis needs the redis package")
+        return RedisStore(redis.Redis.from_url(RATE_LIMIT_URL))
+    return MemoryStore()
+
+
+def get_rate_limiter() -> RateLimiter:
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter(_make_store())
+    return _limiter
+
+
+def set_rate_limit_store(store):
+    """Swap the store, e.g. for a fake redis client in tests."""
+    global _limiter
+    with _limiter_lock:
+        _limiter = RateLimiter(store)
+
+
+def client_ip(scope) -> str:
+    if RATE_LIMIT_TRUST_FORWARDED:
+        for name, value in scope.get("headers", []):
+            if name == b"x-forwarded-for":
+                return value.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+async def _reject(send, retry_after, detail):
+    await send({
+        "type": "http.response.start",
+        "status": 429,
+        "headers": [(b"content-type", b"application/json"), (b"retry-after", str(retry_after).encode())],
+    })
+    await send({"type": "http.response.body", "body": dumps({"detail": detail})})
+
+
+async def _too_large(send, limit):
+    await send({
+        "type": "http.response.start",
+        "status": 413,
+        # The unread body is dropped with the connection rather than drained
+        "headers": [(b"content-type", b"application/json"), (b"connection", b"close")],
+    })
+    await send({
+        "type": "http.response.body",
+        "body": dumps({"detail": f"Request body must be smaller than {limit // (1024 * 1024)} MB"}),
+    })
+
+
+def _content_length(scope):
+    for name, value in scope["headers"]:
+        if name == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+class AdmissionControlMiddleware:
+    """Body size limits, concurrency caps and per-IP budgets, checked before the body is read."""
+
+    def __init__(self, app, concurrency: ConcurrencyLimiter = concurrency_limiter):
+        self.app = app
+        self.concurrency = concurrency
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        route = (scope["method"], scope["path"])
+        # Chunked bodies carry no length; save_upload still stops those at IMAGE_MAX_BYTES
+        limit = BODY_LIMITS.get(route)
+        if limit is not None and (_content_length(scope) or 0) > limit:
+            await _too_large(send, limit)
+            return
+        if not RATE_LIMIT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        group = CONCURRENCY_GROUPS.get(route)
+        budget = IP_BUDGETS.get(route)
+        if group is None and budget is None:
+            await self.app(scope, receive, send)
+            return
+
+        # Capacity first, so a request turned away as busy does not also spend a token
+        if group is not None and not self.concurrency.try_acquire(group):
+            await _reject(send, 1, "Server is busy, please try again shortly")
+            return
+        try:
+            if budget is not None:
+                retry_after = await get_rate_limiter().hit(budget, client_ip(scope))
+                if retry_after is not None:
+                    await _reject(send, retry_after, "Too many requests, please try again later")
+                    return
+            await self.app(scope, receive, send)
+        finally:
+            if group is not None:
+                self.concurrency.release(group)
@@ -0,0 +1,244 @@
+"""Read-through cache for item reads, invalidated by write events.
+
+Entries are the encoded response body plus its validators, stored under a key
+built from the request's normalized parameters and the current version of
+each tag the response depends on. A write bumps the versions of the tags it
+touches (every list page depends on "items", a single item on "item:<id>"),
+so stale entries are never looked up again and simply age out.
+
+The memory backend is per process: with several workers, another worker's
+write only reaches this one's cache after READ_CACHE_TTL_SECONDS. The redis
+backend shares entries and versions between workers.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
+from .cache import TTLCache
+from .responses import dumps
+
+try:
+    import redis
+except ImportError:  # only needed for READ_CACHE_BACKEND=redis
+    redis = None
+
+load_dotenv()
+
+# memory, redis or none
+READ_CACHE_BACKEND = os.getenv("READ_CACHE_BACKEND", "memory").lower()
+READ_CACHE_URL = os.getenv("READ_CACHE_URL", "redis://localhost:6379/0")
+READ_CACHE_TTL_SECONDS = int(os.getenv("READ_CACHE_TTL_SECONDS", "30"))
+READ_CACHE_SIZE = int(os.getenv("READ_CACHE_SIZE", "2048"))
+READ_CACHE_PREFIX = "lostfound:cache:"
+# During an outage every request fails the same way; print at most one line per interval
+READ_CACHE_ERROR_LOG_SECONDS = float(os.getenv("READ_CACHE_ERROR_LOG_SECONDS", "60"))
+
+ITEMS_TAG = "items"
+
+
+def item_tag(item_id: int) -> str:
+    return f"item:{item_id}"
+
+
+def normalize(value):
+    """Parameter value as it should count for the cache key: enums by value, anything else as is.
+
+    Opaque values such as pagination cursors are case-sensitive and must stay
+    exact; wrap free-text parameters in fold_text() to share their entries.
+    """
+    return getattr(value, "value", value)
+
+
+def fold_text(value):
+    """Free text as the search treats it: whitespace collapsed, lowercased, blank as None."""
+    if value is None:
+        return None
+    return " ".join(value.split()).lower() or None
+
+
+class MemoryBackend:
+    name = "memory"
+    blocking = False
+
+    def __init__(self, maxsize=READ_CACHE_SIZE, ttl=READ_CACHE_TTL_SECONDS):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def set(self, key, value):
+        self._entries.set(key, value)
+
+    def versions(self, tags):
+        with self._lock:
+            return [self._versions.get(tag, 0) for tag in tags]
+
+    def bump(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+
+    def stats(self):
+        return {"size": len(self._entries), "evictions": self._entries.evictions}
+
+
+class NullBackend(MemoryBackend):
+    """Caching disabled: nothing is ever stored."""
+
+    name = "none"
+
+    def __init__(self):
+        super().__init__(maxsize=0, ttl=0)
+
+
+class RedisBackend:
+    """Any client speaking the redis-py API (get/set/mget/pipeline); tests can pass a fake."""
+
+    name = "redis"
+    blocking = True
+
+    def __init__(self, client, ttl=READ_CACHE_TTL_SECONDS, prefix=READ_CACHE_PREFIX):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value):
+        if self.ttl > 0:
+            self.client.set(self.prefix + key, value, ex=self.ttl)
+
+    def versions(self, tags):
+        return [int(version or 0) for version in self.client.mget([self.prefix + "v:" + tag for tag in tags])]
+
+    def bump(self, tags):
+        pipeline = self.client.pipeline()
+        for tag in tags:
+            pipeline.incr(self.prefix + "v:" + tag)
+        pipeline.execute()
+
+    def stats(self):
+        # Evictions happen inside redis (maxmemory policy); see INFO stats there
+        return {}
+
+
+class ReadCache:
+    def __init__(self, backend, error_log_seconds=READ_CACHE_ERROR_LOG_SECONDS):
+        self.backend = backend
+        self.error_log_seconds = error_log_seconds
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._error_logged_at = None
+        self._errors_unlogged = 0
+        self._error_lock = threading.Lock()
+
+    def _failed(self, operation, error):
+        """Count every failure; print the first and then one summary line per interval."""
+        now = time.monotonic()
+        with self._error_lock:
+            self.errors += 1
+            if self._error_logged_at is not None and now - self._error_logged_at < self.error_log_seconds:
+                self._errors_unlogged += 1
+                return
+            suppressed, self._errors_unlogged = self._errors_unlogged, 0
+            self._error_logged_at = now
+        more = f" ({suppressed} more failures since the last report)" if suppressed else ""
+        print(f"Read cache {operation} failed: {error}{more}")
+
+    def _key(self, namespace, params, tags):
+        versions = self.backend.versions(tags)
+        digest = hashlib.sha1(json.dumps([normalize(value) for value in params]).encode()).hexdigest()
+        return f"{namespace}:{'.'.join(map(str, versions))}:{digest}"
+
+    def lookup(self, namespace, params, tags):
+        """(key to store under, (meta, body) or None)."""
+        try:
+            key = self._key(namespace, params, tags)
+            raw = self.backend.get(key)
+        except Exception as error:
+            # A cache outage only costs the database a query
+            self._failed("lookup", error)
+            return None, None
+        if raw is None:
+            self.misses += 1
+            return key, None
+        self.hits += 1
+        meta, body = raw.split(b"\n", 1)
+        return key, (json.loads(meta), body)
+
+    def store(self, key, meta, body: bytes):
+        if key is None:
+            return
+        try:
+            # dumps() never emits a raw newline, so it can frame the metadata
+            self.backend.set(key, dumps(meta) + b"\n" + body)
+        except Exception as error:
+            self._failed("store", error)
+
+    def invalidate(self, *tags):
+        try:
+            self.backend.bump(tags)
+        except Exception as error:
+            self._failed("invalidation", error)
+
+    async def _call(self, fn, *args):
+        if self.backend.blocking:
+            return await run_in_threadpool(fn, *args)
+        return fn(*args)
+
+    async def alookup(self, namespace, params, tags):
+        return await self._call(self.lookup, namespace, params, tags)
+
+    async def astore(self, key, meta, body: bytes):
+        await self._call(self.store, key, meta, body)
+
+    async def ainvalidate(self, *tags):
+        await self._call(self.invalidate, *tags)
+
+    def snapshot(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "errors": self.errors,
+            **self.backend.stats(),
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def _make_backend():
+    if READ_CACHE_BACKEND == "redis":
+        if redis is None:
+            raise RuntimeError("READ_CACHE_BACKEND=redis needs the redis package")
+        return RedisBackend(redis.Redis.from_url(READ_CACHE_URL))
+    if READ_CACHE_BACKEND == "none":
+        return NullBackend()
+    return MemoryBackend()
+
+
+def get_read_cache() -> ReadCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ReadCache(_make_backend())
+    return _cache
+
+
+def set_read_cache_backend(backend):
+    """Swap the backend, e.g. for a fake redis client in tests."""
+    global _cache
+    with _cache_lock:
+        _cache = ReadCache(backend)
@@ -0,0 +1,129 @@
+"""Startup bootstrap with retries, and the state behind /healthz and /readyz.
+
+Startup makes one bootstrap attempt (schema check, pool warm-up, audit
+replay) before the worker starts serving. If the database is not reachable
+yet, the worker serves anyway and keeps retrying in the background with
+exponential backoff. Until a bootstrap succeeds, ReadinessGate answers
+everything except the health endpoints with 503 and Retry-After, so a
+worker never runs queries against a missing schema.
+
+Only connection errors and the migration lock timing out are retried. Any
+other error is a bug or a bad schema: it fails startup, or, once the worker
+is already serving, stops the worker so the supervisor reports it.
+"""
+import asyncio
+import os
+import random
+import signal
+import time
+import traceback
+from dotenv import load_dotenv
+from sqlalchemy import exc
+from .migrations import MigrationLockTimeout
+from .responses import dumps
+
+load_dotenv()
+
+STARTUP_RETRY_INITIAL_SECONDS = float(os.getenv("STARTUP_RETRY_INITIAL_SECONDS", "0.5"))
+STARTUP_RETRY_MAX_SECONDS = float(os.getenv("STARTUP_RETRY_MAX_SECONDS", "10"))
+
+# Answered before the bootstrap has succeeded
+ALWAYS_AVAILABLE = ("/healthz", "/readyz", "/metrics", "/docs", "/openapi.json")
+
+# Errors that mean "the database is not there yet" rather than a bug; exc.TimeoutError
+# is the pool timing out, MigrationLockTimeout is waiting behind another worker
+RETRYABLE_ERRORS = (exc.OperationalError, exc.InterfaceError, exc.TimeoutError, MigrationLockTimeout)
+
+
+class Readiness:
+    def __init__(self):
+        self.ready = False
+        self.attempts = 0
+        self.last_error = None
+        self.started_at = time.monotonic()
+        self.ready_seconds = None
+        self._task = None
+
+    async def _attempt(self, bootstrap):
+        self.attempts += 1
+        try:
+            await bootstrap()
+        except RETRYABLE_ERRORS as error:
+            # The driver's own message, without SQLAlchemy's statement and help link
+            self.last_error = f"{type(error).__name__}: {getattr(error, 'orig', None) or error}"
+            return False
+        self.ready = True
+        self.last_error = None
+        self.ready_seconds = round(time.monotonic() - self.started_at, 3)
+        print(f"Ready after {self.ready_seconds}s ({self.attempts} attempt(s))")
+        return True
+
+    async def _retry(self, bootstrap):
+        delay = STARTUP_RETRY_INITIAL_SECONDS
+        try:
+            while not await self._attempt(bootstrap):
+                print(f"Database not ready ({self.last_error}), retrying in {delay:.1f}s")
+                # Jitter keeps a fleet of restarting workers from retrying in lockstep
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+                delay = min(delay * 2, STARTUP_RETRY_MAX_SECONDS)
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            # Startup has already returned, so there is nobody to raise to: a worker that
+            # can never become ready is shut down rather than left answering 503
+            self.last_error = f"{type(error).__name__}: {error}"
+            traceback.print_exc()
+            print(f"Bootstrap failed ({self.last_error}), stopping the worker")
+            os.kill(os.getpid(), signal.SIGTERM)
+
+    async def start(self, bootstrap):
+        """Try bootstrap() once now; on a retryable failure keep retrying in the background.
+
+        Any other error propagates, failing application startup.
+        """
+        self.started_at = time.monotonic()
+        if not await self._attempt(bootstrap):
+            print(f"Database not ready ({self.last_error}), serving health checks while retrying")
+            self._task = asyncio.ensure_future(self._retry(bootstrap))
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def snapshot(self):
+        return {
+            "ready": self.ready,
+            "attempts": self.attempts,
+            "last_error": self.last_error,
+            "ready_seconds": self.ready_seconds,
+        }
+
+
+readiness = Readiness()
+
+
+class ReadinessGate:
+    """Refuse requests with 503 until the bootstrap has succeeded."""
+
+    def __init__(self, app, state: Readiness = readiness):
+        self.app = app
+        self.state = state
+
+    async def __call__(self, scope, receive, send):
+        if self.state.ready or scope["type"] not in ("http", "websocket") or scope["path"] in ALWAYS_AVAILABLE:
+            await self.app(scope, receive, send)
+            return
+        if scope["type"] == "websocket":
+            await send({"type": "websocket.close", "code": 1013})  # try again later
+            return
+        retry_after = str(max(1, round(STARTUP_RETRY_INITIAL_SECONDS)))
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [(b"content-type", b"application/json"), (b"retry-after", retry_after.encode())],
+        })
+        await send({"type": "http.response.body", "body": dumps({"detail": "Service is starting up"})})
@@ -0,0 +1,37 @@
+import enum
+import json
+from datetime import date, datetime
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # falls back to the standard library encoder
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    """JSON bytes for plain data (dicts, lists, enums, naive datetimes), as FastAPI would render it."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """Response for content that is already response-shaped.
+
+    Returning it from a route skips FastAPI's response_model validation and
+    jsonable_encoder pass, so content must already match the declared model.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -2,16 +2,15 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import timedelta
-from ..database import get_db
+from ..database import get_db, run_db
 from ..models import User, RegisteredStudent
-from ..auth import create_access_token, get_current_user, ACCESS_TOKEN_EXPIRE_MINUTES
+from ..auth import create_access_token, get_current_user, token_claims, get_user_by_student_number, save_password, ACCESS_TOKEN_EXPIRE_MINUTES
+from ..hashing import verify_password, hash_password
+from ..rate_limit import get_rate_limiter
 from pydantic import BaseModel
-from passlib.context import CryptContext
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 class UserCreate(BaseModel):
     student_number: str
     password: str
@@ -31,23 +30,23 @@ class Token(BaseModel):
     access_token: str
     token_type: str
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
-
-def authenticate_user(db: Session, student_number: str, password: str):
-    user = db.query(User).filter(User.student_number == student_number).first()
-    if not user or not verify_password(password, user.password):
+async def authenticate_user(db: Session, student_number: str, password: str):
+    # bcrypt goes to the hashing workers, never the event loop or DB session
+    user = await run_db(db, get_user_by_student_number, student_number)
+    if not user:
         return False
+    valid, new_hash = await verify_password(password, user.password)
+    if not valid:
+        return False
+    if new_hash:
+        # Stored hash used outdated bcrypt settings, upgrade it transparently
+        await run_db(db, save_password, user, new_hash)
     return user
 
-@router.post("/register", response_model=UserResponse)
-def register(user_data: UserCreate, db: Session = Depends(get_db)):
+def _check_can_register(db: Session, student_number: str):
     # Check if student is registered
     registered_student = db.query(RegisteredStudent).filter(
-        RegisteredStudent.student_number == user_data.student_number
+        RegisteredStudent.student_number == student_number
     ).first()
     
     if not registered_student:
@@ -58,7 +57,7 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
     
     # Check if user already exists
     existing_user = db.query(User).filter(
-        User.student_number == user_data.student_number
+        User.student_number == student_number
     ).first()
     
     if existing_user:
@@ -66,9 +65,8 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="User already exists"
         )
-    
-    # Create new user
-    hashed_password = get_password_hash(user_data.password)
+
+def _create_user(db: Session, user_data: UserCreate, hashed_password: str):
     db_user = User(
         student_number=user_data.student_number,
         password=hashed_password,
@@ -82,12 +80,22 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
     
     return db_user
 
+@router.post("/register", response_model=UserResponse)
+async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+    await run_db(db, _check_can_register, user_data.student_number)
+    
+    # Create new user
+    hashed_password = await hash_password(user_data.password)
+    return await run_db(db, _create_user, user_data, hashed_password)
+
 @router.post("/token", response_model=Token)
-def login_for_access_token(
+async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(), 
     db: Session = Depends(get_db)
 ):
-    user = authenticate_user(db, form_data.username, form_data.password)
+    # Per account, before any bcrypt work; the per-IP budget was checked in the middleware
+    await get_rate_limiter().enforce("login_account", form_data.username.strip().lower())
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -97,7 +105,7 @@ def login_for_access_token(
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.student_number}, expires_delta=access_token_expires
+        data=token_claims(user), expires_delta=access_token_expires
     )
     
     return {"access_token": access_token, "token_type": "bearer"}
@@ -0,0 +1,119 @@
+import asyncio
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.status import WS_1008_POLICY_VIOLATION, WS_1013_TRY_AGAIN_LATER
+from typing import List, Optional
+from ..database import SessionLocal
+from ..models import ItemStatus, ItemCategory
+from ..auth import get_current_user
+from ..feed import item_feed, FEED_KEEPALIVE_SECONDS
+
+router = APIRouter(prefix="/feed", tags=["feed"])
+
+# Browsers cannot set headers on EventSource or WebSocket requests, so the
+# bearer token may also come as ?token=
+
+async def _authenticate(token: Optional[str]):
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    # Only a principal cache miss touches the database
+    db = SessionLocal()
+    try:
+        return await get_current_user(token=token, db=db)
+    finally:
+        await run_in_threadpool(db.close)
+
+def _bearer(request: Request, token: Optional[str]):
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        return authorization[7:]
+    return token
+
+def _parse_filters(message):
+    """(categories, statuses) from a subscription message, or raise ValueError."""
+    categories = [ItemCategory(value) for value in message.get("category") or []]
+    statuses = [ItemStatus(value) for value in message.get("status") or []]
+    return categories, statuses
+
+@router.websocket("/items")
+async def item_feed_socket(
+    websocket: WebSocket,
+    token: Optional[str] = None,
+    category: List[ItemCategory] = Query(None),
+    status: List[ItemStatus] = Query(None)
+):
+    """Item events as JSON text frames.
+
+    Send {"category": [...], "status": [...]} at any time to change the filter.
+    """
+    try:
+        await _authenticate(token)
+    except HTTPException:
+        await websocket.close(code=WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    subscriber = item_feed.subscribe(category, status)
+
+    async def send():
+        while True:
+            message = await subscriber.next_event()
+            if message is None:
+                return
+            await websocket.send_text(message)
+
+    async def receive():
+        while True:
+            message = await websocket.receive_json()
+            try:
+                item_feed.resubscribe(subscriber, *_parse_filters(message))
+            except (ValueError, AttributeError):
+                await websocket.send_json({"type": "error", "detail": "Invalid subscription"})
+
+    tasks = [asyncio.ensure_future(send()), asyncio.ensure_future(receive())]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        for task in done:
+            if task.exception() is not None and not isinstance(task.exception(), WebSocketDisconnect):
+                raise task.exception()
+        if subscriber.closed:
+            # Dropped for falling behind (or shutting down); the client should reconnect and re-fetch
+            await websocket.close(code=WS_1013_TRY_AGAIN_LATER)
+    finally:
+        item_feed.unsubscribe(subscriber)
+
+async def _event_stream(request: Request, subscriber):
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(subscriber.next_event(), FEED_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield ": keepalive\n\n"
+                continue
+            if message is None:
+                return
+            yield f"data: {message}\n\n"
+    finally:
+        item_feed.unsubscribe(subscriber)
+
+@router.get("/items")
+async def item_feed_events(
+    request: Request,
+    token: Optional[str] = None,
+    category: List[ItemCategory] = Query(None),
+    status: List[ItemStatus] = Query(None)
+):
+    """Item events as Server-Sent Events; the stream ends if the client falls too far behind."""
+    await _authenticate(_bearer(request, token))
+    subscriber = item_feed.subscribe(category, status)
+    return StreamingResponse(
+        _event_stream(request, subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,31 @@
+from fastapi import APIRouter
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+from ..database import engine
+from ..readiness import readiness, RETRYABLE_ERRORS
+from ..responses import FastJSONResponse
+
+router = APIRouter(tags=["health"])
+
+def _ping():
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+@router.get("/healthz")
+def liveness():
+    """The process is up and its event loop answers; says nothing about the database."""
+    return {"status": "ok"}
+
+@router.get("/readyz")
+async def readiness_check():
+    """Bootstrapped and the database answers; 503 otherwise, so load balancers skip this worker."""
+    if not readiness.ready:
+        return FastJSONResponse({"status": "starting", **readiness.snapshot()}, status_code=503)
+    try:
+        await run_in_threadpool(_ping)
+    except RETRYABLE_ERRORS as error:
+        return FastJSONResponse(
+            {"status": "unavailable", "error": f"{type(error).__name__}: {error}", **readiness.snapshot()},
+            status_code=503
+        )
+    return {"status": "ready", **readiness.snapshot()}
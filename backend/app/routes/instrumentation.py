@@ -0,0 +1,61 @@
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import PlainTextResponse
+from ..audit import audit_log
+from ..auth import get_current_admin
+from ..database import engine, async_engine
+from ..feed import item_feed
+from ..jobs import job_scheduler, recent_runs
+from ..metrics import render
+from ..pool import pool_snapshot
+from ..rate_limit import get_rate_limiter, concurrency_limiter
+from ..read_cache import get_read_cache
+
+# Pool, queue and job details are for operators, not students
+router = APIRouter(prefix="/instrumentation", tags=["instrumentation"], dependencies=[Depends(get_current_admin)])
+# Prometheus scrapes /metrics by default and without credentials; it only exposes aggregates
+metrics_router = APIRouter(tags=["instrumentation"])
+
+def _pool_stats():
+    pools = {"sync": pool_snapshot(engine.pool)}
+    if async_engine is not None:
+        pools["async"] = pool_snapshot(async_engine.sync_engine.pool)
+    return pools
+
+@router.get("/pool")
+def get_pool_stats():
+    """Connection pool occupancy, checkout latency and wait timeouts."""
+    return _pool_stats()
+
+@router.get("/audit")
+def get_audit_stats():
+    """Audit log writer mode, queue depth and flush counters."""
+    return audit_log.snapshot()
+
+@router.get("/cache")
+def get_cache_stats():
+    """Read cache backend, hit/miss counts and evictions."""
+    return get_read_cache().snapshot()
+
+@router.get("/feed")
+def get_feed_stats():
+    """Live feed subscribers, events published and slow clients dropped."""
+    return item_feed.snapshot()
+
+@router.get("/rate-limits")
+def get_rate_limit_stats():
+    """Requests allowed and limited per budget, and in-flight requests per concurrency group."""
+    return {**get_rate_limiter().snapshot(), "concurrency": concurrency_limiter.snapshot()}
+
+@router.get("/jobs")
+def get_job_stats(limit: int = Query(20, ge=1, le=200)):
+    """Background jobs run by this worker, and the latest runs recorded by any worker."""
+    return {**job_scheduler.snapshot(), "history": recent_runs(engine, limit)}
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Request, query, job, pool, audit, cache, feed and rate limit metrics in the Prometheus text format."""
+    body = render(
+        _pool_stats(), audit_log.snapshot(), get_read_cache().snapshot(), item_feed.snapshot(),
+        get_rate_limiter().snapshot(), concurrency_limiter.snapshot()
+    )
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
\ No newline at end of file
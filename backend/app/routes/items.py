@@ -1,13 +1,26 @@
-from fastapi import APIRouter, Depends, Form, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, Form, HTTPException, Query, Request, Response, status, UploadFile, File
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from ..database import get_db
-from ..models import Item, User, ItemStatus, ItemCategory, Log
-from ..auth import get_current_user
+from typing import Dict, List, Optional
+from ..database import get_db, run_db, SessionLocal, AsyncSessionLocal, DB_ASYNC
+from ..models import Item, User, ItemStatus, ItemCategory
+from ..audit import audit_log
+from ..feed import item_feed
+from ..bulk import detect_format, format_rows, import_items, ImportFormatError, EXPORT_COLUMNS
+from ..auth import get_current_admin, get_current_user
+from ..search import get_search_backend, SEARCH_FIELDS
+from ..stats import stats_cache, item_key
+from ..matching import forget_matches, get_matches, match_key, store_matches, term_statistics, MATCH_LIMIT
+from ..similarity import image_index, SIMILAR_MAX_DISTANCE, SIMILAR_MAX_RADIUS
+from ..images import save_upload, hash_upload, variant_urls, image_in_use, delete_image_files, STATIC_URL
+from ..responses import dumps, FastJSONResponse
+from ..read_cache import fold_text, get_read_cache, item_tag, ITEMS_TAG
+from ..rate_limit import get_rate_limiter
+from ..http_cache import cache_headers, is_not_modified, make_etag, not_modified
+from ..pagination import apply_keyset, decode_cursor, encode_cursor, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, STREAM_CHUNK_SIZE
 from pydantic import BaseModel
 from datetime import datetime
-import uuid
-import os
 from fastapi.staticfiles import StaticFiles
 
 router = APIRouter(prefix="/items", tags=["items"])
@@ -15,12 +28,7 @@ router = APIRouter(prefix="/items", tags=["items"])
 # Mount static files directory for images
 #router.mount("/static", StaticFiles(directory="static"), name="static")
 
-# Get the base directory of the project
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-STATIC_DIR = os.path.join(BASE_DIR, "static", "images")
-
-# Create the static images directory if it doesn't exist
-os.makedirs(STATIC_DIR, exist_ok=True)
+# Uploaded images and their resized variants live in images.STATIC_DIR
 
 
 class ItemBase(BaseModel):
@@ -37,6 +45,8 @@ class ItemResponse(ItemBase):
     id: int
     status: ItemStatus
     image_url: Optional[str]
+    thumbnail_url: Optional[str] = None
+    srcset: Optional[str] = None
     user_id: int
     owner_name: str
     created_at: datetime
@@ -45,6 +55,18 @@ class ItemResponse(ItemBase):
     class Config:
         orm_mode = True
 
+class ItemPage(BaseModel):
+    items: List[ItemResponse]
+    next_cursor: Optional[str] = None
+
+class MatchResponse(BaseModel):
+    item: ItemResponse
+    score: float
+
+class SimilarItemResponse(BaseModel):
+    item: ItemResponse
+    distance: int
+
 class ItemUpdate(BaseModel):
     status: Optional[ItemStatus] = None
     title: Optional[str] = None
@@ -57,9 +79,70 @@ class StatsResponse(BaseModel):
     lost_items: int
     found_items: int
     claimed_items: int
+    by_category: Dict[str, int] = {}
+    by_day: Dict[str, int] = {}
+
+# Columns read for the fast path: exactly ItemResponse's, plus the owner's name
+ITEM_RESPONSE_COLUMNS = tuple(
+    column for column in Item.__table__.columns if column.key in ItemResponse.__fields__
+)
+ITEM_ROW_COLUMNS = ITEM_RESPONSE_COLUMNS + (User.name.label("owner_name"),)
+ITEM_ROW_FIELDS = tuple(column.key for column in ITEM_ROW_COLUMNS)
+
+def _row_response(row) -> dict:
+    """ItemResponse-shaped dict from an ITEM_ROW_COLUMNS row; nothing is validated."""
+    data = dict(zip(ITEM_ROW_FIELDS, row))
+    data["thumbnail_url"], data["srcset"] = variant_urls(data["image_url"])
+    return data
+
+def _item_response(item: Item, owner_name: str) -> dict:
+    return _row_response([getattr(item, column.key) for column in ITEM_RESPONSE_COLUMNS] + [owner_name])
+
+def _to_response(item: Item, owner_name: str) -> ItemResponse:
+    thumbnail_url, srcset = variant_urls(item.image_url)
+    # Read the mapped columns directly instead of copying item.__dict__
+    return ItemResponse(
+        **{column.key: getattr(item, column.key) for column in Item.__table__.columns},
+        owner_name=owner_name,
+        thumbnail_url=thumbnail_url,
+        srcset=srcset
+    )
+
+def _create_item(db: Session, item_data: dict, image_url: Optional[str], contact_phone: Optional[str], current_user: User):
+    db_item = Item(
+        **item_data,
+        user_id=current_user.id,
+        image_url=image_url,
+        contact_phone=contact_phone  # Set the contact phone
+    )
+    
+    db.add(db_item)
+    db.flush()
+    # Log the creation; written once this commit succeeds
+    audit_log.record(
+        db,
+        item_id=db_item.id,
+        action="CREATE",
+        new_status=db_item.status,
+        changed_by=current_user.id
+    )
+    
+    # Pair the new report with open reports of the opposite status, in the same
+    # commit; the term statistics take the write first so the weights include it
+    term_statistics.item_changed(new=match_key(db_item))
+    store_matches(db, db_item)
+    db.commit()
+    db.refresh(db_item)
+    get_search_backend().index_item(db_item)
+    stats_cache.item_changed(new=item_key(db_item))
+    image_index.item_changed(db_item.id, db_item.image_hash)
+    
+    response = _item_response(db_item, current_user.name)
+    item_feed.publish("created", response)
+    return response
 
 @router.post("/", response_model=ItemResponse)
-def create_item(
+async def create_item(
     title: str = Form(...),
     description: str = Form(...),
     category: ItemCategory = Form(...),
@@ -69,6 +152,8 @@ def create_item(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
+    await get_rate_limiter().enforce("create_item_account", current_user.student_number)
+    
     try:
         category_enum = ItemCategory(category)
     except ValueError:
@@ -78,192 +163,455 @@ def create_item(
         )
     
     image_url = None
+    image_hash = None
     if image:
-        # Generate unique filename
-        file_extension = image.filename.split(".")[-1]
-        filename = f"{uuid.uuid4()}.{file_extension}"
+        # Streamed to disk in chunks, type checked by content, variants generated off the event loop
+        filename = await save_upload(image)
+        image_hash = await hash_upload(filename)
         
-        #  Save image to static directory using absolute path
-        image_path = os.path.join(STATIC_DIR, filename)
-
-        with open(image_path, "wb") as buffer:
-            buffer.write(image.file.read())
-        
-        image_url = f"/static/images/{filename}"
-        print(f"Image saved to: {image_path}")
-        print(f"Image URL: {image_url}")
+        image_url = f"{STATIC_URL}/{filename}"
     
     # Create the item data dict
     item_data = {
         "title": title,
         "description": description,
         "category": category,
-        "location": location
-
+        "location": location,
+        "image_hash": image_hash
     }
 
-     # Use provided contact phone or default to user's email
+    # Use provided contact phone or default to user's email
     final_contact_phone = contact_phone
 
-    db_item = Item(
-        **item_data,
-        user_id=current_user.id,
-        image_url=image_url,
-        contact_phone=final_contact_phone  # Set the contact phone
-    )
+    item = await run_db(db, _create_item, item_data, image_url, final_contact_phone, current_user)
+    await get_read_cache().ainvalidate(ITEMS_TAG)
+    return FastJSONResponse(item)
+
+def _filtered_items_query(db: Session, category, status, location, search):
+    # Join with users table to get owner information
+    query = db.query(Item, User.name).join(User, Item.user_id == User.id)
     
-    db.add(db_item)
-    db.commit()
-    db.refresh(db_item)
+    if category:
+        query = query.filter(Item.category == category)
+    if status:
+        query = query.filter(Item.status == status)
+    if location:
+        query = get_search_backend().apply(db, query, location, fields=("location",))
+    if search:
+        query = get_search_backend().apply(db, query, search, fields=SEARCH_FIELDS)
+    return query
 
-    item_dict = db_item.__dict__.copy()
-    item_dict['owner_name'] = current_user.name  # Add owner's name
+def _get_items_page(db: Session, category, status, location, search, cursor, limit):
+    query = _filtered_items_query(db, category, status, location, search)
+    query = apply_keyset(query, Item.created_at, Item.id, cursor)
     
-    # Log the creation
-    log = Log(
-        item_id=db_item.id,
-        action="CREATE",
-        new_status=db_item.status,
-        changed_by=current_user.id
-    )
-    db.add(log)
-    db.commit()
+    # Fetch one extra row to find out whether another page exists
+    results = query.with_entities(*ITEM_ROW_COLUMNS).limit(limit + 1).all()
+    has_more = len(results) > limit
+    items = [_row_response(row) for row in results[:limit]]
+    
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor(items[-1]["created_at"], items[-1]["id"])
     
-    return db_item
+    return {"items": items, "next_cursor": next_cursor}
 
-@router.get("/", response_model=List[ItemResponse])
-def get_items(
+def _get_items_page_etag(db: Session, category, status, location, search, cursor, limit):
+    """Version of one page: the ids and updated_at of exactly the rows it would return.
+    
+    Only two columns are read, so an unchanged page costs a narrow index read
+    instead of loading, validating and serializing every row.
+    """
+    query = _filtered_items_query(db, category, status, location, search)
+    query = apply_keyset(query, Item.created_at, Item.id, cursor)
+    rows = query.with_entities(Item.id, Item.updated_at).limit(limit + 1).all()
+    return make_etag("items", category, status, location, search, cursor, limit, [tuple(row) for row in rows])
+
+def _cached_response(request: Request, meta: dict, body: bytes):
+    """Replay a read cache entry, honouring conditional request headers."""
+    last_modified = meta.get("last_modified")
+    if last_modified is not None:
+        last_modified = datetime.fromisoformat(last_modified)
+    if is_not_modified(request, meta["etag"], last_modified):
+        return not_modified(meta["etag"], last_modified)
+    return Response(body, media_type="application/json", headers=cache_headers(meta["etag"], last_modified))
+
+@router.get("/", response_model=ItemPage)
+async def get_items(
+    request: Request,
     category: Optional[ItemCategory] = None,
     status: Optional[ItemStatus] = None,
     location: Optional[str] = None,
     search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    # Join with users table to get owner information
-    query = db.query(Item, User.name).join(User, Item.user_id == User.id)
+    filters = (category, status, location, search, cursor, limit)
+    cache = get_read_cache()
+    # Only the free-text filters are case-folded; the cursor is opaque and case-sensitive
+    key_params = (category, status, fold_text(location), fold_text(search), cursor, limit)
+    key, cached = await cache.alookup("items", key_params, (ITEMS_TAG,))
+    if cached is not None:
+        return _cached_response(request, *cached)
     
-    if category:
-        query = query.filter(Item.category == category)
-    if status:
-        query = query.filter(Item.status == status)
-    if location:
-        query = query.filter(Item.location.ilike(f"%{location}%"))
-    if search:
-        query = query.filter(
-            (Item.title.ilike(f"%{search}%")) | 
-            (Item.description.ilike(f"%{search}%"))
+    # No Last-Modified: a deleted row changes the page without touching any updated_at
+    etag = await run_db(db, _get_items_page_etag, *filters)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    
+    page = await run_db(db, _get_items_page, *filters)
+    response = FastJSONResponse(page, headers=cache_headers(etag))
+    await cache.astore(key, {"etag": etag}, response.body)
+    return response
+
+def _ndjson_chunk(rows):
+    return b"".join(dumps(_row_response(row)) + b"\n" for row in rows)
+
+def _stream_items_sync(filters, cursor):
+    # The generator outlives the request dependencies, so it owns its session
+    db = SessionLocal()
+    try:
+        query = _filtered_items_query(db, *filters).with_entities(*ITEM_ROW_COLUMNS)
+        query = apply_keyset(query, Item.created_at, Item.id, cursor)
+        batch = []
+        for row in query.yield_per(STREAM_CHUNK_SIZE):
+            batch.append(row)
+            if len(batch) >= STREAM_CHUNK_SIZE:
+                yield _ndjson_chunk(batch)
+                batch = []
+        if batch:
+            yield _ndjson_chunk(batch)
+    finally:
+        db.close()
+
+async def _stream_items_async(filters, cursor):
+    async with AsyncSessionLocal() as db:
+        statement = await db.run_sync(
+            lambda session: apply_keyset(
+                _filtered_items_query(session, *filters).with_entities(*ITEM_ROW_COLUMNS),
+                Item.created_at, Item.id, cursor
+            ).statement
         )
+        result = await db.stream(statement.execution_options(yield_per=STREAM_CHUNK_SIZE))
+        async for rows in result.partitions(STREAM_CHUNK_SIZE):
+            yield _ndjson_chunk(rows)
+
+@router.get("/stream")
+async def stream_items(
+    category: Optional[ItemCategory] = None,
+    status: Optional[ItemStatus] = None,
+    location: Optional[str] = None,
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Stream every matching item as NDJSON, one object per line."""
+    # Decode the cursor up front so a bad one fails with 400 instead of mid-stream
+    if cursor:
+        decode_cursor(cursor)
     
-    results = query.order_by(Item.created_at.desc()).all()
+    filters = (category, status, location, search)
+    stream = _stream_items_async if DB_ASYNC else _stream_items_sync
+    return StreamingResponse(stream(filters, cursor), media_type="application/x-ndjson")
+
+def _export_items(filters, fmt):
+    # Plain column tuples ordered by primary key; never more than one chunk in memory
+    db = SessionLocal()
+    try:
+        query = _filtered_items_query(db, *filters).with_entities(*EXPORT_COLUMNS).order_by(Item.id)
+        if fmt == "csv":
+            yield format_rows([], fmt, header=True)
+        batch = []
+        for row in query.yield_per(STREAM_CHUNK_SIZE):
+            batch.append(row)
+            if len(batch) >= STREAM_CHUNK_SIZE:
+                yield format_rows(batch, fmt)
+                batch = []
+        if batch:
+            yield format_rows(batch, fmt)
+    finally:
+        db.close()
+
+@router.get("/export")
+async def export_items(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    category: Optional[ItemCategory] = None,
+    status: Optional[ItemStatus] = None,
+    location: Optional[str] = None,
+    search: Optional[str] = None,
+    current_admin: User = Depends(get_current_admin)
+):
+    """Download every matching item as CSV or NDJSON, in the layout /items/import reads."""
+    filters = (category, status, location, search)
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    filename = f"items-{datetime.utcnow():%Y%m%d}.{format}"
+    return StreamingResponse(
+        _export_items(filters, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.post("/import")
+async def import_items_file(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    status: ItemStatus = Query(ItemStatus.FOUND),
+    current_admin: User = Depends(get_current_admin)
+):
+    """Create an item, as status, from each valid CSV/NDJSON row; invalid rows are reported, not fatal."""
+    fmt = detect_format(file.filename, file.content_type, format)
+    if fmt is None:
+        raise HTTPException(status_code=400, detail="Unknown file format; pass format=csv or format=ndjson")
     
-    # Transform the results to include owner information
-    items_with_owner = []
-    for item, owner_name in results:
-        item_dict = item.__dict__.copy()
-        item_dict['owner_name'] = owner_name  # Add owner's name to the response
-        items_with_owner.append(item_dict)
+    try:
+        return await run_in_threadpool(import_items, file.file, fmt, ItemCreate, status, current_admin)
+    except ImportFormatError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+
+def _search_items(db: Session, q: str, limit: int):
+    ranked = get_search_backend().rank(db, q, limit)
+    if not ranked:
+        return []
     
-    return items_with_owner
+    results = db.query(Item, User.name)\
+                .join(User, Item.user_id == User.id)\
+                .filter(Item.id.in_([item_id for item_id, _ in ranked]))\
+                .all()
+    by_id = {item.id: (item, owner_name) for item, owner_name in results}
     
+    return [_to_response(*by_id[item_id]) for item_id, _ in ranked if item_id in by_id]
 
-@router.get("/{item_id}", response_model=ItemResponse)
-def get_item(item_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+@router.get("/search", response_model=List[ItemResponse])
+async def search_items(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Items matching every term of `q` (prefix matched), most relevant first."""
+    return await run_db(db, _search_items, q, limit)
+
+def _get_item(db: Session, item_id: int):
     # Join with users table to get owner information
-    result = db.query(Item, User.name)\
-               .join(User, Item.user_id == User.id)\
-               .filter(Item.id == item_id)\
-               .first()
+    row = db.query(*ITEM_ROW_COLUMNS)\
+            .join(User, Item.user_id == User.id)\
+            .filter(Item.id == item_id)\
+            .first()
     
-    if not result:
+    if not row:
         raise HTTPException(status_code=404, detail="Item not found")
     
-    item, owner_name = result
+    return _row_response(row)
+
+@router.get("/{item_id}", response_model=ItemResponse)
+async def get_item(
+    item_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    cache = get_read_cache()
+    key, cached = await cache.alookup("item", (item_id,), (item_tag(item_id),))
+    if cached is not None:
+        return _cached_response(request, *cached)
+    
+    item = await run_db(db, _get_item, item_id)
     
-    # Add owner information to the response
-    item_dict = item.__dict__.copy()
-    item_dict['owner_name'] = owner_name
+    etag = make_etag("item", item["id"], item["updated_at"])
+    if is_not_modified(request, etag, item["updated_at"]):
+        return not_modified(etag, item["updated_at"])
     
-    return item_dict
+    response = FastJSONResponse(item, headers=cache_headers(etag, item["updated_at"]))
+    await cache.astore(key, {"etag": etag, "last_modified": item["updated_at"]}, response.body)
+    return response
 
-@router.patch("/{item_id}", response_model=ItemResponse)
-def update_item(
+def _get_item_matches(db: Session, item_id: int, limit: int):
+    if db.query(Item.id).filter(Item.id == item_id).first() is None:
+        raise HTTPException(status_code=404, detail="Item not found")
+    
+    return [
+        MatchResponse(item=_to_response(item, owner_name), score=score)
+        for item, owner_name, score in get_matches(db, item_id, limit)
+    ]
+
+@router.get("/{item_id}/matches", response_model=List[MatchResponse])
+async def get_item_matches(
     item_id: int,
-    item_data: ItemUpdate,
+    limit: int = Query(10, ge=1, le=MATCH_LIMIT),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
+    """Likely counterparts of a report (FOUND items for a LOST one and vice versa), best first."""
+    return await run_db(db, _get_item_matches, item_id, limit)
+
+def _get_similar_items(db: Session, item_id: int, max_distance: int, limit: int):
     item = db.query(Item).filter(Item.id == item_id).first()
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
+    if not item.image_hash:
+        return []
     
-    if item.user_id != current_user.id and current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Not authorized to update this item")
-    
-    old_status = item.status
+    # One extra hit because the item itself is always at distance 0
+    hits = [hit for hit in image_index.similar(db, item.image_hash, max_distance, limit + 1) if hit[0] != item_id][:limit]
+    if not hits:
+        return []
+    results = db.query(Item, User.name)\
+                .join(User, Item.user_id == User.id)\
+                .filter(Item.id.in_([other_id for other_id, _ in hits]))\
+                .all()
+    by_id = {other.id: (other, owner_name) for other, owner_name in results}
     
-    update_data = item_data.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(item, field, value)
+    return [
+        SimilarItemResponse(item=_to_response(*by_id[other_id]), distance=distance)
+        for other_id, distance in hits if other_id in by_id
+    ]
+
+@router.get("/{item_id}/similar", response_model=List[SimilarItemResponse])
+async def get_similar_items(
+    item_id: int,
+    max_distance: int = Query(SIMILAR_MAX_DISTANCE, ge=0, le=SIMILAR_MAX_RADIUS),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Items whose photo looks like this item's photo, closest first."""
+    return await run_db(db, _get_similar_items, item_id, max_distance, limit)
+
+def _owned(query, current_user: User):
+    """Limit a write to the current user's items; admins may change any item."""
+    if current_user.role == "admin":
+        return query
+    return query.filter(Item.user_id == current_user.id)
+
+def _write_refused(db: Session, item_id: int, current_user: User, action: str):
+    """Why the locked read or the guarded write matched no row; only read on the failure path."""
+    db.rollback()
+    row = db.query(Item.user_id).filter(Item.id == item_id).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Item not found")
+    if row.user_id != current_user.id and current_user.role != "admin":
+        raise HTTPException(status_code=403, detail=f"Not authorized to {action} this item")
+    # Owned and present: its status changed between the read and the write,
+    # which only happens where SELECT ... FOR UPDATE takes no lock (SQLite)
+    raise HTTPException(
+        status_code=409,
+        detail=f"The item was changed by another request, {action} it again"
+    )
+
+def _locked_item(db: Session, item_id: int, current_user: User):
+    """The columns the write hooks diff against, row locked until commit; None unless owned."""
+    return _owned(db.query(*ITEM_RESPONSE_COLUMNS).filter(Item.id == item_id), current_user)\
+             .with_for_update()\
+             .first()
+
+def _update_item(db: Session, item_id: int, update_data: dict, current_user: User):
+    # Locked, so a concurrent update waits and diffs against this one's result
+    old = _locked_item(db, item_id, current_user)
+    if not old:
+        _write_refused(db, item_id, current_user, "update")
     
-    item.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(item)
+    # The status guard covers databases without row locks
+    values = dict(update_data, updated_at=datetime.utcnow())
+    updated = _owned(db.query(Item).filter(Item.id == item_id, Item.status == old.status), current_user)\
+                .update(values, synchronize_session=False)
+    if not updated:
+        _write_refused(db, item_id, current_user, "update")
     
     # Log the status change if it occurred
-    if "status" in update_data and old_status != item.status:
-        log = Log(
-            item_id=item.id,
+    new_status = update_data.get("status", old.status)
+    if new_status != old.status:
+        audit_log.record(
+            db,
+            item_id=item_id,
             action="UPDATE_STATUS",
-            old_status=old_status,
-            new_status=item.status,
+            old_status=old.status,
+            new_status=new_status,
             changed_by=current_user.id
         )
-        db.add(log)
-        db.commit()
     
-    return item
-
-@router.delete("/{item_id}")
-def delete_item(item_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    item = db.query(Item).filter(Item.id == item_id).first()
-    if not item:
-        raise HTTPException(status_code=404, detail="Item not found")
+    # Read back inside the transaction, so the matches are stored in the same commit
+    row = db.query(*ITEM_ROW_COLUMNS)\
+            .join(User, Item.user_id == User.id)\
+            .filter(Item.id == item_id)\
+            .first()
+    old_match_key = match_key(old)
+    new_match_key = match_key(row)
+    term_statistics.item_changed(old=old_match_key, new=new_match_key)
+    if new_match_key != old_match_key:
+        # Status or text changed: this report's pairs are stale (or it was claimed)
+        store_matches(db, row)
     
-    if item.user_id != current_user.id and current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Not authorized to delete this item")
+    db.commit()
+    get_search_backend().index_item(row)
+    stats_cache.item_changed(old=item_key(old), new=item_key(row))
+    
+    response = _row_response(row)
+    if old.status != row.status:
+        item_feed.publish("status_changed", response, old_status=old.status)
+    else:
+        item_feed.publish("updated", response)
+    return response
+
+@router.patch("/{item_id}", response_model=ItemResponse)
+async def update_item(
+    item_id: int,
+    item_data: ItemUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    update_data = item_data.dict(exclude_unset=True)
+    item = await run_db(db, _update_item, item_id, update_data, current_user)
+    await get_read_cache().ainvalidate(ITEMS_TAG, item_tag(item_id))
+    return FastJSONResponse(item)
+
+def _delete_item(db: Session, item_id: int, current_user: User):
+    old = _locked_item(db, item_id, current_user)
+    if not old:
+        _write_refused(db, item_id, current_user, "delete")
     
     # Only allow deletion if status is found or claimed
-    if item.status not in [ItemStatus.FOUND, ItemStatus.CLAIMED]:
+    if old.status not in [ItemStatus.FOUND, ItemStatus.CLAIMED]:
         raise HTTPException(
             status_code=400, 
             detail="Can only delete items with status 'found' or 'claimed'"
         )
     
+    forget_matches(db, item_id)
+    deleted = _owned(db.query(Item).filter(Item.id == item_id, Item.status == old.status), current_user)\
+                .delete(synchronize_session=False)
+    if not deleted:
+        _write_refused(db, item_id, current_user, "delete")
+    
     # Log the deletion
-    log = Log(
-        item_id=item.id,
+    audit_log.record(
+        db,
+        item_id=item_id,
         action="DELETE",
-        old_status=item.status,
+        old_status=old.status,
         changed_by=current_user.id
     )
-    db.add(log)
     
-    db.delete(item)
     db.commit()
+    term_statistics.item_changed(old=match_key(old))
+    image_index.item_changed(item_id)
+    get_search_backend().remove_item(item_id)
+    stats_cache.item_changed(old=item_key(old))
+    item_feed.publish("deleted", {"id": item_id, "category": old.category, "status": old.status})
+    
+    # Images are shared by content hash; keep the file while another item uses it
+    return old.image_url if old.image_url and not image_in_use(db, old.image_url) else None
+
+@router.delete("/{item_id}")
+async def delete_item(item_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    orphaned_image = await run_db(db, _delete_item, item_id, current_user)
+    await get_read_cache().ainvalidate(ITEMS_TAG, item_tag(item_id))
+    if orphaned_image:
+        await run_in_threadpool(delete_image_files, orphaned_image)
     
     return {"message": "Item deleted successfully"}
 
 @router.get("/stats/overview", response_model=StatsResponse)
-def get_stats(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    total_items = db.query(Item).count()
-    lost_items = db.query(Item).filter(Item.status == ItemStatus.LOST).count()
-    found_items = db.query(Item).filter(Item.status == ItemStatus.FOUND).count()
-    claimed_items = db.query(Item).filter(Item.status == ItemStatus.CLAIMED).count()
-    
-    return StatsResponse(
-        total_items=total_items,
-        lost_items=lost_items,
-        found_items=found_items,
-        claimed_items=claimed_items
-    )
\ No newline at end of file
+async def get_stats(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    return StatsResponse(**await run_db(db, stats_cache.snapshot))
@@ -0,0 +1,122 @@
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from itertools import islice
+from ..database import get_db, run_db, SessionLocal
+from ..models import Log, User, ItemStatus
+from ..auth import get_current_admin
+from ..log_archive import history, record_of, LOG_COLUMNS
+from ..pagination import apply_keyset, decode_cursor, encode_cursor, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, STREAM_CHUNK_SIZE
+from pydantic import BaseModel
+from datetime import datetime, timezone
+
+router = APIRouter(prefix="/logs", tags=["logs"])
+
+class LogResponse(BaseModel):
+    id: int
+    item_id: int
+    action: str
+    old_status: Optional[ItemStatus]
+    new_status: Optional[ItemStatus]
+    changed_by: int
+    changed_at: datetime
+
+class LogPage(BaseModel):
+    logs: List[LogResponse]
+    next_cursor: Optional[str] = None
+
+def _utc(moment: Optional[datetime]):
+    # Stored timestamps are naive UTC
+    if moment is not None and moment.tzinfo is not None:
+        return moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+def _filtered_logs_query(db: Session, item_id, user_id, action, since, until):
+    query = db.query(*LOG_COLUMNS)
+    if item_id is not None:
+        query = query.filter(Log.item_id == item_id)
+    if user_id is not None:
+        query = query.filter(Log.changed_by == user_id)
+    if action:
+        query = query.filter(Log.action == action)
+    if since is not None:
+        query = query.filter(Log.changed_at >= since)
+    if until is not None:
+        query = query.filter(Log.changed_at < until)
+    return query
+
+def _get_recent_logs(db: Session, filters, cursor, limit):
+    query = apply_keyset(_filtered_logs_query(db, *filters), Log.changed_at, Log.id, cursor)
+    return [record_of(row) for row in query.limit(limit).all()]
+
+def _history(hot, filters, cursor):
+    item_id, user_id, action, since, until = filters
+    before = decode_cursor(cursor) if cursor else None
+    return history(hot, item_id=item_id, changed_by=user_id, action=action, since=since, until=until, before=before)
+
+def _merge_page(hot, filters, cursor, limit):
+    # Reads archive files, so it runs on the threadpool rather than in the DB session
+    records = list(islice(_history(hot, filters, cursor), limit + 1))
+    next_cursor = None
+    if len(records) > limit:
+        records = records[:limit]
+        next_cursor = encode_cursor(records[-1]["changed_at"], records[-1]["id"])
+    return LogPage(logs=records, next_cursor=next_cursor)
+
+@router.get("/", response_model=LogPage)
+async def get_logs(
+    item_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    action: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+    current_admin: User = Depends(get_current_admin)
+):
+    """Audit history, newest first, including months moved to the archive."""
+    if cursor:
+        decode_cursor(cursor)
+
+    filters = (item_id, user_id, action, _utc(since), _utc(until))
+    # One extra row tells whether another page exists
+    hot = await run_db(db, _get_recent_logs, filters, cursor, limit + 1)
+    return await run_in_threadpool(_merge_page, hot, filters, cursor, limit)
+
+def _stream_logs(filters, cursor):
+    # Sync in both DB modes: archive reads block anyway, StreamingResponse runs this on the threadpool
+    db = SessionLocal()
+    try:
+        query = apply_keyset(_filtered_logs_query(db, *filters), Log.changed_at, Log.id, cursor)
+        hot = (record_of(row) for row in query.yield_per(STREAM_CHUNK_SIZE))
+        batch = []
+        for record in _history(hot, filters, cursor):
+            batch.append(LogResponse(**record).json() + "\n")
+            if len(batch) >= STREAM_CHUNK_SIZE:
+                yield "".join(batch)
+                batch = []
+        if batch:
+            yield "".join(batch)
+    finally:
+        db.close()
+
+@router.get("/stream")
+async def stream_logs(
+    item_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    action: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    current_admin: User = Depends(get_current_admin)
+):
+    """Stream the whole matching audit history as NDJSON, newest first."""
+    # Decode the cursor up front so a bad one fails with 400 instead of mid-stream
+    if cursor:
+        decode_cursor(cursor)
+
+    filters = (item_id, user_id, action, _utc(since), _utc(until))
+    return StreamingResponse(_stream_logs(filters, cursor), media_type="application/x-ndjson")
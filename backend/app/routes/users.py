@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import case, func, true
 from sqlalchemy.orm import Session
-from ..database import get_db
-from ..models import User
-from ..auth import get_current_user
-from ..routes.auth import get_password_hash
+from typing import Dict, List, Optional
+from ..database import get_db, run_db
+from ..models import Item, ItemStatus, User
+from ..auth import get_current_user, invalidate_principal, save_password
+from ..hashing import verify_password, hash_password
+from ..pagination import apply_keyset, encode_cursor, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from ..responses import FastJSONResponse
+from .items import ItemResponse, ITEM_RESPONSE_COLUMNS, _row_response
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/users", tags=["users"])
@@ -12,23 +17,89 @@ class PasswordUpdate(BaseModel):
     current_password: str
     new_password: str
 
+class MyItemsPage(BaseModel):
+    items: List[ItemResponse]
+    next_cursor: Optional[str] = None
+    counts: Dict[str, int] = {}
+
+def _get_my_items(db: Session, current_user: User, item_status, cursor, limit):
+    """One page of the user's items plus their per-status counts, in one statement.
+    
+    Both halves are range reads of ix_items_user_id_status_created_at (or the
+    (user_id, created_at) index for an unfiltered page): the counts row is
+    joined to every page row, and still comes back once on an empty page.
+    """
+    page = db.query(*ITEM_RESPONSE_COLUMNS).filter(Item.user_id == current_user.id)
+    if item_status:
+        page = page.filter(Item.status == item_status)
+    page = apply_keyset(page, Item.created_at, Item.id, cursor).limit(limit + 1).subquery()
+    
+    counts = db.query(*[
+        func.count(case((Item.status == state, 1))).label(state.value)
+        for state in ItemStatus
+    ]).filter(Item.user_id == current_user.id).subquery()
+    
+    rows = db.query(counts, page)\
+             .select_from(counts)\
+             .outerjoin(page, true())\
+             .order_by(page.c.created_at.desc(), page.c.id.desc())\
+             .all()
+    
+    statuses = len(ItemStatus)
+    items = [
+        _row_response(list(row[statuses:]) + [current_user.name])
+        for row in rows if row[statuses] is not None
+    ]
+    has_more = len(items) > limit
+    items = items[:limit]
+    
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor(items[-1]["created_at"], items[-1]["id"])
+    
+    return {
+        "items": items,
+        "next_cursor": next_cursor,
+        "counts": {state.value: count for state, count in zip(ItemStatus, rows[0][:statuses])},
+    }
+
+@router.get("/me/items", response_model=MyItemsPage)
+async def get_my_items(
+    status: Optional[ItemStatus] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """The current user's own reports, newest first, with how many they have in each status."""
+    page = await run_db(db, _get_my_items, current_user, status, cursor, limit)
+    return FastJSONResponse(page)
+
+def _get_user(db: Session, user_id: int):
+    return db.query(User).filter(User.id == user_id).first()
+
 @router.patch("/password")
-def update_password(
+async def update_password(
     password_data: PasswordUpdate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    # Verify current password
-    from ..routes.auth import verify_password
+    # current_user is a cached snapshot without the password hash, load the row itself
+    user = await run_db(db, _get_user, current_user.id)
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     
-    if not verify_password(password_data.current_password, current_user.password):
+    # Verify current password
+    valid, _ = await verify_password(password_data.current_password, user.password)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Current password is incorrect"
         )
     
     # Update password
-    current_user.password = get_password_hash(password_data.new_password)
-    db.commit()
+    hashed_password = await hash_password(password_data.new_password)
+    await run_db(db, save_password, user, hashed_password)
+    invalidate_principal(user.student_number)
     
     return {"message": "Password updated successfully"}
\ No newline at end of file
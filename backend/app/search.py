@@ -0,0 +1,363 @@
+import bisect
+import math
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from dotenv import load_dotenv
+from sqlalchemy import Float, column, false, func, literal_column, or_, select, table, text, type_coerce
+from sqlalchemy.exc import OperationalError
+from .database import engine
+from .models import Item
+
+load_dotenv()
+
+# "auto" uses MySQL FULLTEXT on MySQL, FTS5 on SQLite, the in-process index otherwise
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto")
+# The in-process index is rebuilt this often to pick up other workers' writes
+SEARCH_RECONCILE_SECONDS = int(os.getenv("SEARCH_RECONCILE_SECONDS", "300"))
+
+SEARCH_FIELDS = ("title", "description", "location")
+FIELD_WEIGHTS = {"title": 3.0, "location": 1.5, "description": 1.0}
+
+FULLTEXT_INDEX_NAME = "ix_items_fulltext"
+LOCATION_FULLTEXT_INDEX_NAME = "ix_items_location_fulltext"
+
+# InnoDB ignores shorter tokens by default (innodb_ft_min_token_size)
+MYSQL_MIN_TOKEN_SIZE = 3
+
+# FTS5 external content table over items, kept in sync by triggers
+FTS_TABLE_NAME = "items_fts"
+ITEMS_FTS = table(FTS_TABLE_NAME, column("rowid"))
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(value):
+    if not value:
+        return []
+    return TOKEN_RE.findall(value.lower())
+
+
+class InvertedIndex:
+    """Per-field postings lists with prefix lookup over a sorted vocabulary.
+
+    Every query term is matched as a prefix, terms are ANDed together and hits
+    are ranked by field-weighted TF-IDF.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # field -> token -> {item_id: term frequency}
+        self._postings = {field: defaultdict(dict) for field in SEARCH_FIELDS}
+        self._vocabulary = {field: [] for field in SEARCH_FIELDS}
+        self._documents = {}
+
+    def __len__(self):
+        return len(self._documents)
+
+    def add(self, item_id, fields):
+        with self._lock:
+            self.remove(item_id)
+            tokens_by_field = {}
+            for field in SEARCH_FIELDS:
+                counts = defaultdict(int)
+                for token in tokenize(fields.get(field)):
+                    counts[token] += 1
+                postings = self._postings[field]
+                for token, count in counts.items():
+                    if token not in postings:
+                        bisect.insort(self._vocabulary[field], token)
+                    postings[token][item_id] = count
+                tokens_by_field[field] = list(counts)
+            self._documents[item_id] = tokens_by_field
+
+    def remove(self, item_id):
+        with self._lock:
+            tokens_by_field = self._documents.pop(item_id, None)
+            if tokens_by_field is None:
+                return
+            for field, tokens in tokens_by_field.items():
+                postings = self._postings[field]
+                for token in tokens:
+                    docs = postings.get(token)
+                    if docs is None:
+                        continue
+                    docs.pop(item_id, None)
+                    if not docs:
+                        del postings[token]
+                        vocabulary = self._vocabulary[field]
+                        del vocabulary[bisect.bisect_left(vocabulary, token)]
+
+    def _expand(self, field, prefix):
+        vocabulary = self._vocabulary[field]
+        start = bisect.bisect_left(vocabulary, prefix)
+        end = bisect.bisect_left(vocabulary, prefix + "\uffff")
+        return vocabulary[start:end]
+
+    def search(self, query, fields=SEARCH_FIELDS, limit=None):
+        """Return [(item_id, score)] best first for items matching every term."""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        with self._lock:
+            total = max(len(self._documents), 1)
+            expanded = []
+            for term in terms:
+                expanded.append([
+                    (field, self._postings[field][token])
+                    for field in fields
+                    for token in self._expand(field, term)
+                ])
+            # Start from the most selective term so later terms only probe candidates
+            expanded.sort(key=lambda postings: sum(len(docs) for _, docs in postings))
+            scores = None
+            for postings in expanded:
+                term_scores = defaultdict(float)
+                for field, docs in postings:
+                    weight = FIELD_WEIGHTS[field] * math.log(1 + total / len(docs))
+                    if scores is None:
+                        hits = docs.items()
+                    else:
+                        hits = ((item_id, docs[item_id]) for item_id in scores if item_id in docs)
+                    for item_id, count in hits:
+                        term_scores[item_id] += weight * (1 + math.log(count))
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {
+                        item_id: score + term_scores[item_id]
+                        for item_id, score in scores.items()
+                        if item_id in term_scores
+                    }
+                if not scores:
+                    return []
+        ranked = sorted(scores.items(), key=lambda hit: (-hit[1], -hit[0]))
+        return ranked[:limit] if limit else ranked
+
+
+class MemorySearchBackend:
+    """Inverted index kept in this process and built from the items table on first use.
+
+    Each worker holds its own copy and applies its own writes; other workers'
+    writes are picked up when it is rebuilt, every SEARCH_RECONCILE_SECONDS.
+    A filter passes every matching id to SQL, so a broad search is a long IN
+    list; only for databases without a full-text index of their own.
+    """
+
+    def __init__(self, reconcile_seconds=SEARCH_RECONCILE_SECONDS):
+        self.reconcile_seconds = reconcile_seconds
+        self.index = InvertedIndex()
+        self._built = False
+        self._built_at = None
+        self._build_lock = threading.Lock()
+
+    def _stale(self):
+        return not self._built or time.monotonic() - self._built_at >= self.reconcile_seconds
+
+    def _ensure_built(self, db):
+        if not self._stale():
+            return
+        with self._build_lock:
+            if not self._stale():
+                return
+            # Built aside and swapped in, so searches keep using the old index meanwhile
+            index = InvertedIndex()
+            rows = db.query(Item.id, Item.title, Item.description, Item.location).yield_per(1000)
+            for item_id, title, description, location in rows:
+                index.add(item_id, {"title": title, "description": description, "location": location})
+            self.index = index
+            self._built = True
+            self._built_at = time.monotonic()
+
+    def apply(self, db, query, value, fields=SEARCH_FIELDS):
+        self._ensure_built(db)
+        # Every match, not just the best ranked: the caller pages through them by date,
+        # so a cap would make older matches unreachable. Only rank() is limited.
+        item_ids = [item_id for item_id, _ in self.index.search(value, fields)]
+        if not item_ids:
+            return query.filter(false())
+        return query.filter(Item.id.in_(item_ids))
+
+    def rank(self, db, value, limit):
+        self._ensure_built(db)
+        return self.index.search(value, limit=limit)
+
+    def index_item(self, item):
+        if self._built:
+            self.index.add(item.id, {field: getattr(item, field) for field in SEARCH_FIELDS})
+
+    def remove_item(self, item_id):
+        self.index.remove(item_id)
+
+
+class MySQLFulltextBackend:
+    """Delegates to InnoDB FULLTEXT indexes, which MySQL keeps in sync on every write."""
+
+    def _boolean_query(self, value):
+        terms = [term for term in tokenize(value) if len(term) >= MYSQL_MIN_TOKEN_SIZE]
+        if not terms:
+            return None
+        return " ".join(f"+{term}*" for term in terms)
+
+    def _match(self, fields, boolean_query):
+        # Renders MATCH (items.a, items.b) AGAINST (... IN BOOLEAN MODE) as a relevance score
+        columns = literal_column(", ".join(f"{Item.__tablename__}.{field}" for field in fields))
+        return type_coerce(columns.match(boolean_query), Float)
+
+    def apply(self, db, query, value, fields=SEARCH_FIELDS):
+        boolean_query = self._boolean_query(value)
+        if boolean_query is None:
+            # Terms too short for the FULLTEXT index, fall back to a plain scan
+            pattern = f"%{value}%"
+            return query.filter(or_(*[getattr(Item, field).ilike(pattern) for field in fields]))
+        return query.filter(self._match(fields, boolean_query) > 0)
+
+    def rank(self, db, value, limit):
+        boolean_query = self._boolean_query(value)
+        if boolean_query is None:
+            return []
+        score = self._match(SEARCH_FIELDS, boolean_query)
+        rows = db.query(Item.id, score.label("score"))\
+                 .filter(score > 0)\
+                 .order_by(score.desc(), Item.id.desc())\
+                 .limit(limit)\
+                 .all()
+        return [(item_id, float(relevance)) for item_id, relevance in rows]
+
+    def index_item(self, item):
+        pass
+
+    def remove_item(self, item_id):
+        pass
+
+
+class SQLiteFTSBackend:
+    """Delegates to the FTS5 items_fts table, which triggers keep in sync on every write."""
+
+    def _match_query(self, value, fields=SEARCH_FIELDS):
+        # Tokens are [a-z0-9]+, so quoting each one is all the escaping needed
+        terms = tokenize(value)
+        if not terms:
+            return None
+        query = " ".join(f'"{term}"*' for term in terms)
+        if tuple(fields) != SEARCH_FIELDS:
+            query = "{" + " ".join(fields) + "} : (" + query + ")"
+        return query
+
+    def _match(self, match_query):
+        return literal_column(FTS_TABLE_NAME).op("MATCH")(match_query)
+
+    def apply(self, db, query, value, fields=SEARCH_FIELDS):
+        match_query = self._match_query(value, fields)
+        if match_query is None:
+            return query.filter(false())
+        # A subquery, so SQLite joins the postings instead of receiving the ids
+        return query.filter(Item.id.in_(select(ITEMS_FTS.c.rowid).where(self._match(match_query))))
+
+    def rank(self, db, value, limit):
+        match_query = self._match_query(value)
+        if match_query is None:
+            return []
+        # bm25() is lower for better matches; weights follow the column order
+        score = func.bm25(literal_column(FTS_TABLE_NAME), *[FIELD_WEIGHTS[field] for field in SEARCH_FIELDS])
+        rows = db.execute(
+            select(ITEMS_FTS.c.rowid, score.label("score"))
+            .where(self._match(match_query))
+            .order_by(score, ITEMS_FTS.c.rowid.desc())
+            .limit(limit)
+        ).all()
+        return [(item_id, -float(relevance)) for item_id, relevance in rows]
+
+    def index_item(self, item):
+        pass
+
+    def remove_item(self, item_id):
+        pass
+
+
+def _fts_row(prefix):
+    return ", ".join(f"{prefix}.{field}" for field in ("id",) + SEARCH_FIELDS)
+
+
+def create_sqlite_fulltext(conn):
+    """Create items_fts and its sync triggers on SQLite, filling it if it is new; True once present."""
+    if conn.dialect.name != "sqlite":
+        return False
+    exists = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE_NAME}
+    ).first() is not None
+    if not exists:
+        try:
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE_NAME} USING fts5("
+                f"{', '.join(SEARCH_FIELDS)}, content='items', content_rowid='id', prefix='2 3')"
+            ))
+        except OperationalError as error:
+            # SQLite built without FTS5; search falls back to the in-process index
+            print(f"Full-text search table not created: {error.orig}")
+            return False
+    columns = "rowid, " + ", ".join(SEARCH_FIELDS)
+    delete_old = f"INSERT INTO {FTS_TABLE_NAME}({FTS_TABLE_NAME}, {columns}) VALUES ('delete', {_fts_row('old')});"
+    insert_new = f"INSERT INTO {FTS_TABLE_NAME}({columns}) VALUES ({_fts_row('new')});"
+    for name, event, body in (
+        ("items_fts_insert", "AFTER INSERT ON items", insert_new),
+        ("items_fts_delete", "AFTER DELETE ON items", delete_old),
+        ("items_fts_update", f"AFTER UPDATE OF {', '.join(SEARCH_FIELDS)} ON items", delete_old + " " + insert_new),
+    ):
+        conn.execute(text(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END"))
+    if not exists:
+        conn.execute(text(f"INSERT INTO {FTS_TABLE_NAME}({FTS_TABLE_NAME}) VALUES ('rebuild')"))
+    return True
+
+
+def ensure_fulltext_indexes(bind):
+    """Add the full-text indexes (MySQL FULLTEXT, SQLite FTS5) to an existing items table if they are missing."""
+    if bind.dialect.name == "sqlite":
+        with bind.begin() as conn:
+            create_sqlite_fulltext(conn)
+        return
+    if bind.dialect.name != "mysql":
+        return
+    indexes = {
+        FULLTEXT_INDEX_NAME: ", ".join(SEARCH_FIELDS),
+        LOCATION_FULLTEXT_INDEX_NAME: "location",
+    }
+    with bind.begin() as conn:
+        existing = set(conn.execute(text(
+            "SELECT DISTINCT index_name FROM information_schema.statistics "
+            "WHERE table_schema = DATABASE() AND table_name = 'items'"
+        )).scalars())
+        for name, columns in indexes.items():
+            if name not in existing:
+                conn.execute(text(f"ALTER TABLE items ADD FULLTEXT INDEX {name} ({columns})"))
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_search_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _make_backend()
+    return _backend
+
+
+def _has_fts_table():
+    with engine.connect() as conn:
+        return conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE_NAME}
+        ).first() is not None
+
+
+def _make_backend():
+    dialect = engine.dialect.name
+    if SEARCH_BACKEND == "mysql" or (SEARCH_BACKEND == "auto" and dialect == "mysql"):
+        return MySQLFulltextBackend()
+    if SEARCH_BACKEND == "sqlite" or (SEARCH_BACKEND == "auto" and dialect == "sqlite" and _has_fts_table()):
+        return SQLiteFTSBackend()
+    return MemorySearchBackend()
@@ -0,0 +1,141 @@
+import os
+import threading
+import time
+from collections import defaultdict
+from functools import lru_cache
+from itertools import combinations
+from dotenv import load_dotenv
+from sqlalchemy.orm import Session
+from .models import Item
+
+load_dotenv()
+
+# Hamming distance (out of 64 bits) up to which two photos count as similar
+SIMILAR_MAX_DISTANCE = int(os.getenv("SIMILAR_MAX_DISTANCE", "10"))
+# Largest distance a query may ask for; the probe count grows quickly with it
+SIMILAR_MAX_RADIUS = 16
+# New items are picked up on every query; a full rebuild (which also drops
+# items deleted through other workers) happens at most this often
+SIMILARITY_RECONCILE_SECONDS = int(os.getenv("SIMILARITY_RECONCILE_SECONDS", "300"))
+
+# The 64-bit hash is split into 16-bit substrings, each with its own table
+HASH_BITS = 64
+SUBSTRINGS = 4
+SUBSTRING_BITS = HASH_BITS // SUBSTRINGS
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+@lru_cache(maxsize=None)
+def _flip_masks(radius: int):
+    """Every SUBSTRING_BITS-bit mask with at most radius bits set."""
+    return [
+        sum(1 << bit for bit in bits)
+        for flipped in range(radius + 1)
+        for bits in combinations(range(SUBSTRING_BITS), flipped)
+    ]
+
+
+class MultiIndexHash:
+    """Multi-index hashing (Norouzi et al.) over 64-bit hashes under Hamming distance.
+
+    If two hashes are within r bits, at least one of their SUBSTRINGS aligned
+    substrings is within r // SUBSTRINGS bits. A query only probes those
+    substring neighbourhoods by exact lookup and verifies the candidates, so it
+    reads a small fraction of the index instead of every hash.
+    """
+
+    def __init__(self):
+        # one {substring value: {key: hash}} table per substring
+        self._tables = [defaultdict(dict) for _ in range(SUBSTRINGS)]
+
+    @staticmethod
+    def _substrings(value: int):
+        mask = (1 << SUBSTRING_BITS) - 1
+        return [(value >> (i * SUBSTRING_BITS)) & mask for i in range(SUBSTRINGS)]
+
+    def add(self, value: int, key):
+        for table, substring in zip(self._tables, self._substrings(value)):
+            table[substring][key] = value
+
+    def discard(self, value: int, key):
+        for table, substring in zip(self._tables, self._substrings(value)):
+            bucket = table.get(substring)
+            if bucket is not None:
+                bucket.pop(key, None)
+                if not bucket:
+                    del table[substring]
+
+    def search(self, value: int, radius: int):
+        """[(distance, key)] for every key within radius of value."""
+        masks = _flip_masks(radius // SUBSTRINGS)
+        found = {}
+        for table, substring in zip(self._tables, self._substrings(value)):
+            for mask in masks:
+                bucket = table.get(substring ^ mask)
+                if not bucket:
+                    continue
+                for key, other in bucket.items():
+                    if key not in found:
+                        found[key] = hamming(value, other)
+        return [(distance, key) for key, distance in found.items() if distance <= radius]
+
+
+class ImageSimilarityIndex:
+    """Perceptual hashes of item photos, queried by Hamming distance."""
+
+    def __init__(self, reconcile_seconds=SIMILARITY_RECONCILE_SECONDS):
+        self.reconcile_seconds = reconcile_seconds
+        self._lock = threading.Lock()
+        self._index = MultiIndexHash()
+        self._hashes = {}
+        self._max_id = 0
+        self._loaded_at = None
+
+    def _add(self, item_id, image_hash):
+        value = int(image_hash, 16)
+        self._index.add(value, item_id)
+        self._hashes[item_id] = value
+        self._max_id = max(self._max_id, item_id)
+
+    def _refresh(self, db: Session):
+        query = db.query(Item.id, Item.image_hash).filter(Item.image_hash.isnot(None))
+        if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.reconcile_seconds:
+            self._index = MultiIndexHash()
+            self._hashes = {}
+            self._max_id = 0
+            self._loaded_at = time.monotonic()
+        else:
+            # Items created through other workers since the last look
+            query = query.filter(Item.id > self._max_id)
+        for item_id, image_hash in query.yield_per(1000):
+            if item_id not in self._hashes:
+                self._add(item_id, image_hash)
+
+    def item_changed(self, item_id: int, image_hash: str = None):
+        """Apply a write; image_hash is None when the item (or its photo) is gone."""
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            old = self._hashes.pop(item_id, None)
+            if old is not None:
+                self._index.discard(old, item_id)
+            if image_hash:
+                self._add(item_id, image_hash)
+
+    def similar(self, db: Session, image_hash: str, max_distance: int = SIMILAR_MAX_DISTANCE, limit: int = 20):
+        """[(item_id, distance)] closest first."""
+        with self._lock:
+            self._refresh(db)
+            hits = self._index.search(int(image_hash, 16), max_distance)
+        hits.sort(key=lambda hit: (hit[0], -hit[1]))
+        return [(item_id, distance) for distance, item_id in hits[:limit]]
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+
+image_index = ImageSimilarityIndex()
@@ -0,0 +1,125 @@
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from sqlalchemy import func
+from .models import Item, ItemStatus
+
+load_dotenv()
+
+# Counters are rebuilt from the database at most this often; writes in between
+# are applied as deltas. Other workers' writes show up after the next rebuild.
+STATS_RECONCILE_SECONDS = int(os.getenv("STATS_RECONCILE_SECONDS", "60"))
+STATS_DAYS = int(os.getenv("STATS_DAYS", "30"))
+
+
+def _value(enum_or_str):
+    return getattr(enum_or_str, "value", enum_or_str)
+
+
+def _day(created_at):
+    return str(created_at)[:10] if created_at else None
+
+
+class StatsCache:
+    """In-process item counters by status, category and creation day."""
+
+    def __init__(self, reconcile_seconds=STATS_RECONCILE_SECONDS, days=STATS_DAYS):
+        self.reconcile_seconds = reconcile_seconds
+        self.days = days
+        self._lock = threading.Lock()
+        self._by_status = Counter()
+        self._by_category = Counter()
+        self._by_day = Counter()
+        self._loaded_at = None
+
+    def _since(self):
+        return (datetime.utcnow() - timedelta(days=self.days - 1)).date()
+
+    def reconcile(self, db):
+        # One grouped scan replaces the per-status COUNT(*) queries
+        by_status = Counter()
+        by_category = Counter()
+        rows = db.query(Item.status, Item.category, func.count(Item.id))\
+                 .group_by(Item.status, Item.category)\
+                 .all()
+        for item_status, category, count in rows:
+            by_status[_value(item_status)] += count
+            by_category[_value(category)] += count
+
+        day = func.date(Item.created_at)
+        by_day = Counter()
+        rows = db.query(day, func.count(Item.id))\
+                 .filter(Item.created_at >= self._since())\
+                 .group_by(day)\
+                 .all()
+        for created_day, count in rows:
+            by_day[_day(created_day)] += count
+
+        with self._lock:
+            self._by_status = by_status
+            self._by_category = by_category
+            self._by_day = by_day
+            self._loaded_at = time.monotonic()
+
+    def refresh(self, db) -> bool:
+        """reconcile() ahead of the next read; skipped until the counters are first read."""
+        with self._lock:
+            loaded = self._loaded_at is not None
+        if loaded:
+            self.reconcile(db)
+        return loaded
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def _apply(self, item_status, category, created_at, delta):
+        if item_status is not None:
+            self._by_status[_value(item_status)] += delta
+        if category is not None:
+            self._by_category[_value(category)] += delta
+        if created_at is not None:
+            self._by_day[_day(created_at)] += delta
+
+    def item_changed(self, old=None, new=None):
+        """Apply a write as deltas; old/new are (status, category, created_at) or None."""
+        with self._lock:
+            if self._loaded_at is None:
+                # Nothing cached yet, the next read rebuilds from the database
+                return
+            if old is not None:
+                self._apply(*old, -1)
+            if new is not None:
+                self._apply(*new, 1)
+
+    def snapshot(self, db):
+        with self._lock:
+            stale = self._loaded_at is None or \
+                time.monotonic() - self._loaded_at >= self.reconcile_seconds
+        if stale:
+            self.reconcile(db)
+
+        since = str(self._since())
+        with self._lock:
+            by_status = dict(self._by_status)
+            return {
+                "total_items": sum(by_status.values()),
+                "lost_items": by_status.get(ItemStatus.LOST.value, 0),
+                "found_items": by_status.get(ItemStatus.FOUND.value, 0),
+                "claimed_items": by_status.get(ItemStatus.CLAIMED.value, 0),
+                "by_category": {key: count for key, count in self._by_category.items() if count},
+                "by_day": {
+                    key: count for key, count in sorted(self._by_day.items())
+                    if key >= since and count
+                },
+            }
+
+
+def item_key(item):
+    return (item.status, item.category, item.created_at)
+
+
+stats_cache = StatsCache()
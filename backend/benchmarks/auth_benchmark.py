@@ -0,0 +1,87 @@
+"""Requests/sec for an authenticated endpoint with and without the principal cache.
+
+Reports end-to-end GET /auth/me throughput through the test client, the raw
+throughput of the get_current_user dependency (which the test client overhead
+otherwise hides on a local SQLite file) and the queries issued per request.
+Run from the backend directory (needs httpx for the test client):
+
+    python -m benchmarks.auth_benchmark
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "auth_benchmark.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from app import auth  # noqa: E402
+from app.database import SessionLocal, engine, init_db  # noqa: E402
+from app.hashing import pwd_context  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import User  # noqa: E402
+
+REQUESTS = 2000
+DEPENDENCY_CALLS = 20000
+
+query_count = 0
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def count_query(*args):
+    global query_count
+    query_count += 1
+
+
+def measure_requests(client, headers):
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        response = client.get("/auth/me", headers=headers)
+        assert response.status_code == 200, response.text
+    return REQUESTS / (time.perf_counter() - start)
+
+
+async def measure_dependency(token):
+    db = SessionLocal()
+    start = time.perf_counter()
+    for _ in range(DEPENDENCY_CALLS):
+        await auth.get_current_user(token, db)
+    elapsed = time.perf_counter() - start
+    db.close()
+    return DEPENDENCY_CALLS / elapsed
+
+
+def main():
+    init_db()
+    db = SessionLocal()
+    user = User(student_number="bench", password=pwd_context.hash("bench"), name="Bench", email="b@x")
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    token = auth.create_access_token(auth.token_claims(user))
+    db.close()
+
+    global query_count
+    headers = {"Authorization": f"Bearer {token}"}
+    scenarios = [
+        ("lookup every request", 0, False),
+        ("principal cache", 60, False),
+        ("trusted token claims", 60, True),
+    ]
+    print(f"{'scenario':>22} {'req/s':>8} {'auth calls/s':>13} {'queries/req':>12}")
+    with TestClient(app) as client:
+        for name, ttl, trust_claims in scenarios:
+            auth.principal_cache.clear()
+            auth.principal_cache.ttl = ttl
+            auth.AUTH_TRUST_TOKEN_CLAIMS = trust_claims
+            query_count = 0
+            requests_per_second = measure_requests(client, headers)
+            queries_per_request = query_count / REQUESTS
+            calls_per_second = asyncio.run(measure_dependency(token))
+            print(f"{name:>22} {requests_per_second:>8.0f} {calls_per_second:>13.0f} {queries_per_request:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
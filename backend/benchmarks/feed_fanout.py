@@ -0,0 +1,110 @@
+"""Fan-out benchmark for the live item feed with thousands of simulated local clients.
+
+Each client is an asyncio task consuming its own subscriber queue, with a mix
+of category/status filters like the frontend tabs; a fraction of them are slow
+(they sleep per event) to show that they get dropped instead of holding up
+the rest. Reports the cost of one publish, delivery latency to consumers and
+how many clients were dropped. Runs in-process, without sockets:
+
+    python -m benchmarks.feed_fanout --clients 5000 --events 500 --rate 200
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from app.feed import ItemFeed
+from app.models import ItemCategory, ItemStatus
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+async def client(subscriber, sent, latencies, delay):
+    received = 0
+    while True:
+        message = await subscriber.next_event()
+        if message is None:
+            return received
+        latencies.append(time.perf_counter() - sent[message])
+        received += 1
+        if delay:
+            await asyncio.sleep(delay)
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    feed = ItemFeed(queue_size=args.queue_size)
+    categories = [category.value for category in ItemCategory]
+    statuses = [ItemStatus.LOST.value, ItemStatus.FOUND.value]
+
+    sent, latencies, publish_times = {}, [], []
+    deliver = feed._deliver
+
+    def timed_deliver(category, item_statuses, message):
+        started = time.perf_counter()
+        sent[message] = started
+        deliver(category, item_statuses, message)
+        publish_times.append(time.perf_counter() - started)
+
+    feed._deliver = timed_deliver
+
+    tasks = []
+    for i in range(args.clients):
+        # Mostly the status tabs, some narrowed to one category, some unfiltered
+        shape = rng.random()
+        chosen_categories = [rng.choice(categories)] if shape < 0.3 else None
+        chosen_statuses = [rng.choice(statuses)] if shape < 0.8 else None
+        subscriber = feed.subscribe(chosen_categories, chosen_statuses)
+        delay = args.slow_delay if rng.random() < args.slow_fraction else 0
+        tasks.append(asyncio.ensure_future(client(subscriber, sent, latencies, delay)))
+
+    started = time.perf_counter()
+    for i in range(args.events):
+        item = {
+            "id": i,
+            "title": f"Black leather wallet {i}",
+            "category": rng.choice(categories),
+            "status": rng.choice(statuses),
+            "location": "Library",
+        }
+        feed.publish("created", item)
+        if args.rate:
+            await asyncio.sleep(1 / args.rate)
+        elif i % 50 == 49:
+            await asyncio.sleep(0)  # let consumers run between bursts
+    # Let fast consumers drain, then end everyone
+    deadline = time.perf_counter() + 30
+    while time.perf_counter() < deadline and any(
+            subscriber.queue.qsize() for group in list(feed._groups.values()) for subscriber in group):
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    snapshot = feed.snapshot()
+    feed.close_all()
+    received = await asyncio.gather(*tasks)
+
+    print(f"clients {args.clients}, events {args.events}, filters {snapshot['filters'] or 'n/a'}")
+    print(f"publish (fan-out) per event: median {statistics.median(publish_times) * 1000:.3f} ms, "
+          f"p99 {percentile(publish_times, 0.99) * 1000:.3f} ms")
+    print(f"delivery latency: p50 {percentile(latencies, 0.50) * 1000:.2f} ms, "
+          f"p95 {percentile(latencies, 0.95) * 1000:.2f} ms, p99 {percentile(latencies, 0.99) * 1000:.2f} ms")
+    print(f"delivered {sum(received)} events in {elapsed:.2f}s "
+          f"({sum(received) / elapsed:,.0f}/s), dropped {feed.dropped} slow clients")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=5000)
+    parser.add_argument("--events", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=200, help="events per second, 0 for bursts")
+    parser.add_argument("--queue-size", type=int, default=100)
+    parser.add_argument("--slow-fraction", type=float, default=0.01)
+    parser.add_argument("--slow-delay", type=float, default=0.05, help="seconds a slow client spends per event")
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+"""Scripted load test of the whole API, with JSON results and a baseline comparison.
+
+Boots the app in-process (startup hooks included) against a throwaway SQLite
+file, or a throwaway MySQL database passed with --url, seeds registered
+students, users, items and logs, then runs each scenario with a fixed number
+of operations spread over --concurrency virtual users:
+
+    login     POST /auth/token for many different students at once
+    browse    filtered item pages, the next page, then one item
+    search    GET /items/search for every prefix of a word, as if typed
+    upload    create items with a freshly generated photo each
+    status    owners flipping their items between lost and found
+
+Requests go through an ASGI transport rather than a socket, so the numbers
+are for comparing runs of the same machine and database, not capacity
+planning. Needs httpx (pip install -r requirements-dev.txt). Run from the
+backend directory:
+
+    python -m benchmarks.load_test --output results.json
+    python -m benchmarks.load_test --baseline results.json --output new.json
+    python -m benchmarks.load_test --compare new.json --baseline results.json
+
+With --baseline the run exits non-zero if any endpoint's p95 got slower, or
+any scenario's throughput dropped, by more than --tolerance.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+SCENARIOS = ("login", "browse", "search", "upload", "status")
+PASSWORD = "loadtest-password"
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Recorder:
+    """Latency samples and status codes per endpoint for one scenario."""
+
+    def __init__(self):
+        self.samples = {}
+        self.statuses = {}
+
+    async def request(self, client, label, method, url, expected=(200,), **kwargs):
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        elapsed = time.perf_counter() - started
+        self.samples.setdefault(label, []).append(elapsed)
+        statuses = self.statuses.setdefault(label, {})
+        status = str(response.status_code)
+        statuses[status] = statuses.get(status, 0) + 1
+        if response.status_code not in expected:
+            return None
+        return response
+
+    def summary(self, elapsed):
+        endpoints = {}
+        for label, samples in sorted(self.samples.items()):
+            statuses = self.statuses[label]
+            endpoints[label] = {
+                "requests": len(samples),
+                "errors": sum(count for status, count in statuses.items() if int(status) >= 400),
+                "statuses": statuses,
+                "throughput_rps": round(len(samples) / elapsed, 1),
+                "mean_ms": round(statistics.mean(samples) * 1000, 2),
+                "p50_ms": round(percentile(samples, 50) * 1000, 2),
+                "p95_ms": round(percentile(samples, 95) * 1000, 2),
+                "p99_ms": round(percentile(samples, 99) * 1000, 2),
+                "max_ms": round(max(samples) * 1000, 2),
+            }
+        requests = sum(len(samples) for samples in self.samples.values())
+        return {
+            "duration_s": round(elapsed, 3),
+            "requests": requests,
+            "throughput_rps": round(requests / elapsed, 1),
+            "endpoints": endpoints,
+        }
+
+
+def make_image(rng):
+    from PIL import Image, ImageDraw
+
+    # Random blocks, so every upload is a new file and a new perceptual hash
+    image = Image.new("RGB", (800, 600), tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(12):
+        x, y = rng.randrange(800), rng.randrange(600)
+        draw.rectangle((x, y, x + rng.randrange(40, 300), y + rng.randrange(40, 200)),
+                       fill=tuple(rng.randrange(256) for _ in range(3)))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+
+class LoadTest:
+    def __init__(self, client, args, students, words):
+        self.client = client
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.students = students
+        self.words = words
+        self.sessions = []
+        self.owned = {}
+        self.uploaded = []
+
+    def headers(self, index):
+        token, _ = self.sessions[index % len(self.sessions)]
+        return {"Authorization": f"Bearer {token}"}
+
+    async def login_sessions(self, db_session):
+        from app.models import Item, User
+
+        for student_number in self.students[:self.args.sessions]:
+            response = await self.client.post("/auth/token", data={"username": student_number, "password": PASSWORD})
+            response.raise_for_status()
+            user_id = db_session.query(User.id).filter(User.student_number == student_number).scalar()
+            self.sessions.append((response.json()["access_token"], user_id))
+            self.owned[len(self.sessions) - 1] = [
+                item_id for (item_id,) in db_session.query(Item.id).filter(Item.user_id == user_id).limit(50)
+            ]
+
+    async def login(self, recorder, i):
+        student_number = self.students[i % len(self.students)]
+        await recorder.request(self.client, "POST /auth/token", "POST", "/auth/token",
+                               data={"username": student_number, "password": PASSWORD})
+
+    async def browse(self, recorder, i):
+        from app.models import ItemCategory, ItemStatus
+
+        headers = self.headers(i)
+        params = {"limit": 20}
+        if self.rng.random() < 0.7:
+            params["status"] = self.rng.choice([ItemStatus.LOST.value, ItemStatus.FOUND.value])
+        if self.rng.random() < 0.4:
+            params["category"] = self.rng.choice(list(ItemCategory)).value
+        response = await recorder.request(self.client, "GET /items/", "GET", "/items/", params=params, headers=headers)
+        if response is None:
+            return
+        page = response.json()
+        if page["next_cursor"]:
+            await recorder.request(self.client, "GET /items/", "GET", "/items/",
+                                   params={**params, "cursor": page["next_cursor"]}, headers=headers)
+        if page["items"]:
+            item_id = self.rng.choice(page["items"])["id"]
+            await recorder.request(self.client, "GET /items/{item_id}", "GET", f"/items/{item_id}", headers=headers)
+
+    async def search(self, recorder, i):
+        headers = self.headers(i)
+        word = self.rng.choice(self.words)
+        for end in range(1, len(word) + 1):
+            await recorder.request(self.client, "GET /items/search", "GET", "/items/search",
+                                   params={"q": word[:end]}, headers=headers)
+
+    async def upload(self, recorder, i):
+        from app.models import ItemCategory
+
+        image = await asyncio.get_running_loop().run_in_executor(None, make_image, random.Random(self.args.seed + i))
+        response = await recorder.request(
+            self.client, "POST /items/ (image)", "POST", "/items/", headers=self.headers(i),
+            data={
+                "title": f"Load test upload {i}",
+                "description": "Generated by the load test",
+                "category": self.rng.choice(list(ItemCategory)).value,
+                "location": "Library",
+            },
+            files={"image": (f"photo{i}.jpg", image, "image/jpeg")},
+        )
+        if response is not None and response.json().get("image_url"):
+            self.uploaded.append(response.json()["image_url"])
+
+    async def status(self, recorder, i):
+        session = i % len(self.sessions)
+        owned = self.owned.get(session)
+        if not owned:
+            return
+        item_id = owned[(i // len(self.sessions)) % len(owned)]
+        await recorder.request(self.client, "PATCH /items/{item_id}", "PATCH", f"/items/{item_id}",
+                               json={"status": "found" if i % 2 else "lost"}, headers=self.headers(session))
+
+    async def run_scenario(self, name, operations, concurrency):
+        operation = getattr(self, name)
+        # A short unrecorded warm-up fills caches and the connection pool
+        warmup = Recorder()
+        # (indices past the recorded ones, so uploads stay unique)
+        await asyncio.gather(*(operation(warmup, operations + i) for i in range(min(concurrency, operations))))
+
+        recorder = Recorder()
+        next_index = iter(range(operations))
+
+        async def virtual_user():
+            for i in next_index:
+                await operation(recorder, i)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(virtual_user() for _ in range(concurrency)))
+        return recorder.summary(time.perf_counter() - started)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args, operations):
+    import httpx
+    from app.database import SessionLocal, engine
+    from app.hashing import pwd_context
+    from app.images import Image, delete_image_files
+    from app.main import app
+    from benchmarks.seed_items import WORDS, seed
+
+    print(f"Seeding {args.users} users and {args.items} items...")
+    students = seed(engine, args.items, args.users, batch=5_000, seed=args.seed,
+                    password=pwd_context.hash(PASSWORD), registered=True, verbose=False)
+
+    scenarios = [name for name in args.scenarios if name != "upload" or Image is not None]
+    if len(scenarios) < len(args.scenarios):
+        print("Pillow is not installed; skipping the upload scenario")
+
+    results = {}
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest", timeout=60)
+    load_test = LoadTest(client, args, students, WORDS)
+    await app.router.startup()
+    try:
+        async with client:
+            db = SessionLocal()
+            try:
+                await load_test.login_sessions(db)
+            finally:
+                db.close()
+            for name in scenarios:
+                results[name] = await load_test.run_scenario(name, operations[name], args.concurrency)
+                print_scenario(name, results[name])
+    finally:
+        for image_url in load_test.uploaded:
+            delete_image_files(image_url, grace_seconds=0)
+        await app.router.shutdown()
+    return results
+
+
+def print_scenario(name, result):
+    print(f"\n{name}: {result['requests']} requests in {result['duration_s']:.2f}s ({result['throughput_rps']} req/s)")
+    for label, endpoint in result["endpoints"].items():
+        print(f"  {label:24} p50 {endpoint['p50_ms']:8.2f}  p95 {endpoint['p95_ms']:8.2f}  "
+              f"p99 {endpoint['p99_ms']:8.2f} ms  {endpoint['throughput_rps']:7.1f} req/s  errors {endpoint['errors']}")
+
+
+def _change(old, new):
+    return (new - old) / old if old else 0.0
+
+
+def compare(baseline, current, tolerance):
+    """Print per-endpoint changes against the baseline; returns the regressions."""
+    regressions = []
+    print(f"\nAgainst baseline {baseline['meta'].get('commit')} ({baseline['meta'].get('started_at')}):")
+    for name, result in current["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            print(f"  {name}: not in the baseline")
+            continue
+        change = _change(before["throughput_rps"], result["throughput_rps"])
+        flag = ""
+        if change < -tolerance:
+            flag = "  REGRESSION"
+            regressions.append(f"{name} throughput {change:+.0%}")
+        print(f"  {name:24} throughput {before['throughput_rps']:8.1f} -> {result['throughput_rps']:8.1f} req/s "
+              f"({change:+.0%}){flag}")
+        for label, endpoint in result["endpoints"].items():
+            old = before["endpoints"].get(label)
+            if old is None:
+                continue
+            change = _change(old["p95_ms"], endpoint["p95_ms"])
+            flag = ""
+            if change > tolerance:
+                flag = "  REGRESSION"
+                regressions.append(f"{name} {label} p95 {change:+.0%}")
+            print(f"    {label:22} p95 {old['p95_ms']:8.2f} -> {endpoint['p95_ms']:8.2f} ms ({change:+.0%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="throwaway database to seed and test against (default: a temporary SQLite file)")
+    parser.add_argument("--items", type=int, default=20_000)
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--sessions", type=int, default=20, help="logged-in users shared by the virtual users")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every scenario's operation count")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--compare", help="compare this results JSON with --baseline instead of running")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed p95/throughput change (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    if args.compare:
+        if not args.baseline:
+            parser.error("--compare needs --baseline")
+        with open(args.compare) as current, open(args.baseline) as baseline:
+            regressions = compare(json.load(baseline), json.load(current), args.tolerance)
+        sys.exit(1 if regressions else 0)
+
+    # Login costs a real bcrypt verification each, so it gets fewer operations
+    operations = {
+        name: max(1, int(count * args.scale))
+        for name, count in {"login": 100, "browse": 500, "search": 200, "upload": 50, "status": 500}.items()
+    }
+    # Several scenarios are slow on purpose; keep the app's slow-query logging out of the report
+    for name in ("SLOW_QUERY_MS", "SLOW_REQUEST_MS", "REQUEST_QUERY_WARN"):
+        os.environ.setdefault(name, "1000000")
+    # Every virtual user shares one client IP; measure the routes, not the limiter
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    # Nor a background job that happens to run mid-measurement
+    os.environ.setdefault("JOBS_MODE", "off")
+    directory = None
+    if args.url:
+        os.environ["DATABASE_URL"] = args.url
+    else:
+        directory = tempfile.mkdtemp()
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'load_test.db')}"
+
+    started_at = datetime.utcnow().isoformat(timespec="seconds") + "Z"
+    try:
+        scenarios = asyncio.run(run(args, operations))
+    finally:
+        if directory is not None:
+            for filename in os.listdir(directory):
+                os.remove(os.path.join(directory, filename))
+            os.rmdir(directory)
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "started_at": started_at,
+            "python": platform.python_version(),
+            "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+            "items": args.items,
+            "users": args.users,
+            "sessions": args.sessions,
+            "concurrency": args.concurrency,
+            "operations": {name: operations[name] for name in scenarios},
+            "seed": args.seed,
+        },
+        "scenarios": scenarios,
+    }
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            regressions = compare(json.load(baseline), results, args.tolerance)
+        if regressions:
+            print("\nRegressions: " + "; ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Drive the instrumented connection pool to saturation.
+
+More workers than pool_size + max_overflow each check out a connection, run a
+query and hold it for a while, so some have to wait and some time out. Works
+against a throwaway SQLite file by default or any DATABASE_URL passed with
+--url (e.g. a local MySQL). Run from the backend directory:
+
+    python -m benchmarks.pool_load_test --workers 60 --pool-size 5 --max-overflow 5
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from sqlalchemy import create_engine, exc, text
+from app.pool import InstrumentedQueuePool, pool_snapshot
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=None)
+    parser.add_argument("--workers", type=int, default=60)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--pool-size", type=int, default=5)
+    parser.add_argument("--max-overflow", type=int, default=5)
+    parser.add_argument("--pool-timeout", type=float, default=0.5)
+    parser.add_argument("--hold-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    url = args.url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'pool_load_test.db')}"
+    connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+    engine = create_engine(
+        url,
+        connect_args=connect_args,
+        poolclass=InstrumentedQueuePool,
+        pool_size=args.pool_size,
+        max_overflow=args.max_overflow,
+        pool_timeout=args.pool_timeout,
+        pool_pre_ping=True,
+    )
+
+    waits = []
+    peak = {"checked_out": 0, "overflow": 0}
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(args.workers)
+
+    def worker():
+        start_barrier.wait()
+        for _ in range(args.rounds):
+            started = time.perf_counter()
+            try:
+                with engine.connect() as conn:
+                    waited = time.perf_counter() - started
+                    conn.execute(text("SELECT 1"))
+                    with lock:
+                        waits.append(waited)
+                        peak["checked_out"] = max(peak["checked_out"], engine.pool.checkedout())
+                        peak["overflow"] = max(peak["overflow"], engine.pool.overflow())
+                    time.sleep(args.hold_ms / 1000)
+            except exc.TimeoutError:
+                pass
+
+    threads = [threading.Thread(target=worker) for _ in range(args.workers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    snapshot = pool_snapshot(engine.pool)
+    attempts = args.workers * args.rounds
+    print(f"pool_size={args.pool_size} max_overflow={args.max_overflow} timeout={args.pool_timeout}s "
+          f"workers={args.workers} hold={args.hold_ms}ms")
+    print(f"checkouts: {snapshot['checkouts']}/{attempts} in {elapsed:.2f}s, timeouts: {snapshot['timeouts']}")
+    print(f"checkout wait ms p50={percentile(waits, 50) * 1000:.1f} "
+          f"p95={percentile(waits, 95) * 1000:.1f} p99={percentile(waits, 99) * 1000:.1f} "
+          f"mean={statistics.mean(waits) * 1000 if waits else 0:.1f}")
+    print(f"peak checked out: {peak['checked_out']}, peak overflow: {max(peak['overflow'], 0)}")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
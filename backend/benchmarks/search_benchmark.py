@@ -0,0 +1,89 @@
+"""Search latency as the item count grows: in-process inverted index vs ILIKE scan.
+
+Run from the backend directory:
+
+    python -m benchmarks.search_benchmark
+"""
+import random
+import statistics
+import time
+from sqlalchemy import create_engine, or_
+from sqlalchemy.orm import sessionmaker
+from app.models import Base, Item, ItemCategory
+from app.search import InvertedIndex
+
+SIZES = [1_000, 10_000, 100_000]
+QUERY_COUNT = 20
+REPEATS = 20
+
+WORDS = (
+    "blue black red green leather wallet purse card student library lecture hall "
+    "iphone samsung charger cable laptop bag backpack umbrella jacket hoodie keys "
+    "lanyard bottle glasses watch earphones cafeteria gym residence parking"
+).split()
+
+# Descriptions mix common words with distinctive ones (brands, names, serials),
+# so the distinctive vocabulary grows with the corpus like it does in practice
+DISTINCT_PER_ITEM = 0.5
+
+
+def random_text(rng, words, vocabulary):
+    tokens = [rng.choice(WORDS) for _ in range(words)]
+    tokens.append(f"tag{rng.randrange(vocabulary)}")
+    return " ".join(tokens)
+
+
+def timed(fn):
+    samples = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def run(size):
+    rng = random.Random(size)
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+
+    vocabulary = int(size * DISTINCT_PER_ITEM)
+    index = InvertedIndex()
+    rows = []
+    for item_id in range(1, size + 1):
+        fields = {
+            "title": random_text(rng, 2, vocabulary),
+            "description": random_text(rng, 20, vocabulary),
+            "location": rng.choice(WORDS),
+        }
+        index.add(item_id, fields)
+        rows.append({"id": item_id, "category": ItemCategory.OTHERS, "user_id": 1, **fields})
+    db.bulk_insert_mappings(Item, rows)
+    db.commit()
+
+    index_ms = []
+    scan_ms = []
+    queries = [f"{rng.choice(WORDS)} tag{rng.randrange(vocabulary)}" for _ in range(QUERY_COUNT)]
+    for query in queries:
+        index_ms.append(timed(lambda: index.search(query, limit=50)))
+        # The old get_items filter, one ILIKE pair per term
+        filters = [
+            or_(Item.title.ilike(f"%{term}%"), Item.description.ilike(f"%{term}%"))
+            for term in query.split()
+        ]
+        scan_ms.append(timed(lambda: db.query(Item.id).filter(*filters).limit(50).all()))
+    db.close()
+    return statistics.median(index_ms), statistics.median(scan_ms)
+
+
+def main():
+    print(f"{'items':>8} {'index ms':>10} {'ILIKE ms':>10}")
+    for size in SIZES:
+        index_ms, scan_ms = run(size)
+        print(f"{size:>8} {index_ms:>10.3f} {scan_ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Fill a database with synthetic users, items and logs for query plans and latency.
+
+Creates the schema (create_all plus migrations) if needed, then bulk inserts
+in batches. Run from the backend directory, e.g. against a throwaway SQLite
+file or a local MySQL:
+
+    python -m benchmarks.seed_items --url sqlite:////tmp/lostfound_1m.db --items 1000000
+
+The query plan tests seed a small database with seed(); to check the plans
+at this size, point them at it:
+
+    QUERY_PLAN_DATABASE_URL=sqlite:////tmp/lostfound_1m.db python -m pytest tests/test_query_plans.py
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, func, select
+from app.migrations import migrate
+from app.models import Base, Item, ItemCategory, ItemStatus, Log, RegisteredStudent, User
+
+WORDS = (
+    "blue black red green grey white leather wallet purse card student library "
+    "lecture hall iphone samsung charger cable laptop bag backpack umbrella jacket "
+    "hoodie keys lanyard bottle glasses watch earphones calculator textbook ring"
+).split()
+LOCATIONS = (
+    "Library", "Cafeteria", "Main Hall", "Gym", "Parking Lot", "Residence A",
+    "Residence B", "Lecture Room 101", "Lecture Room 204", "Computer Lab",
+)
+# Most reports stay lost, some are found, few get claimed
+STATUS_WEIGHTS = ((ItemStatus.LOST.value, 6), (ItemStatus.FOUND.value, 3), (ItemStatus.CLAIMED.value, 1))
+
+
+def seed(engine, items, users, days=365, batch=10_000, logs=True, seed=42, password="!", registered=False, verbose=True):
+    """Bulk insert users, items and (unless logs=False) one CREATE log per item.
+
+    Seeded users get the given password hash; the default is not a valid bcrypt
+    hash, so they cannot log in. registered=True also adds their
+    registered_students rows. Returns the new users' student numbers.
+    """
+    rng = random.Random(seed)
+    Base.metadata.create_all(engine)
+    migrate(engine)
+
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        first_user = (conn.execute(select(func.max(User.id))).scalar() or 0) + 1
+        students = [
+            {
+                "student_number": f"seed{first_user + i:08d}",
+                "name": f"Seed Student {first_user + i}",
+                "email": f"seed{first_user + i}@example.com",
+            }
+            for i in range(users)
+        ]
+        if registered:
+            conn.execute(RegisteredStudent.__table__.insert(), students)
+        conn.execute(User.__table__.insert(), [
+            {**student, "password": password, "role": "student"} for student in students
+        ])
+        user_ids = [row[0] for row in conn.execute(select(User.id).where(User.id >= first_user))]
+
+    statuses, weights = zip(*STATUS_WEIGHTS)
+    categories = [category.value for category in ItemCategory]
+    now = datetime.utcnow()
+    inserted = 0
+    while inserted < items:
+        count = min(batch, items - inserted)
+        rows = []
+        for _ in range(count):
+            created_at = now - timedelta(seconds=rng.random() * days * 86400)
+            rows.append({
+                "title": " ".join(rng.choices(WORDS, k=3)).capitalize(),
+                "description": " ".join(rng.choices(WORDS, k=12)),
+                "category": rng.choice(categories),
+                "status": rng.choices(statuses, weights)[0],
+                "location": rng.choice(LOCATIONS),
+                "user_id": rng.choice(user_ids),
+                "created_at": created_at,
+                "updated_at": created_at,
+            })
+        with engine.begin() as conn:
+            conn.execute(Item.__table__.insert(), rows)
+            if logs:
+                last_id = conn.execute(select(func.max(Item.id))).scalar()
+                conn.execute(Log.__table__.insert(), [
+                    {
+                        "item_id": last_id - count + 1 + i,
+                        "action": "CREATE",
+                        "new_status": row["status"],
+                        "changed_by": row["user_id"],
+                        "changed_at": row["created_at"],
+                    }
+                    for i, row in enumerate(rows)
+                ])
+        inserted += count
+        if verbose:
+            print(f"{inserted}/{items} items ({time.perf_counter() - started:.0f}s)", end="\r", flush=True)
+
+    if verbose:
+        print(f"\nSeeded {users} users and {items} items in {time.perf_counter() - started:.1f}s")
+    return [student["student_number"] for student in students]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", required=True)
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=5_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--batch", type=int, default=10_000)
+    parser.add_argument("--no-logs", action="store_true", help="skip one CREATE log per item")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    connect_args = {"check_same_thread": False} if args.url.startswith("sqlite") else {}
+    engine = create_engine(args.url, connect_args=connect_args)
+    seed(engine, args.items, args.users, args.days, args.batch, not args.no_logs, args.seed)
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Micro-benchmark of item page serialization, in ms per 1k items.
+
+Compares the ORM path (Item entities, ItemResponse models validated again by
+FastAPI's response_model, then json.dumps) with the fast path the list, get
+and create routes use (column tuples, plain dicts, orjson). Runs against a
+throwaway SQLite file, from the backend directory:
+
+    python -m benchmarks.serialization --items 1000 --repeat 30 [--output results.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.models import Base, Item, ItemCategory, User
+from app.responses import FastJSONResponse, orjson
+from app.routes.items import ItemPage, ITEM_ROW_COLUMNS, _row_response, _to_response
+
+
+def seed(db, count):
+    db.add(User(student_number="bench", password="!", name="Bench Student", email="bench@example.com"))
+    db.flush()
+    now = datetime.utcnow()
+    categories = list(ItemCategory)
+    db.bulk_insert_mappings(Item, [
+        {
+            "title": f"Black leather wallet {i}",
+            "description": "Found near the library entrance, contains a student card and some coins",
+            "category": categories[i % len(categories)],
+            "location": "Library",
+            "image_url": f"/static/images/{i:064x}.jpg" if i % 2 else None,
+            "contact_phone": "+27 21 555 0100",
+            "user_id": 1,
+            "created_at": now - timedelta(minutes=i),
+            "updated_at": now - timedelta(minutes=i),
+        }
+        for i in range(count)
+    ])
+    db.commit()
+
+
+def orm_path(db, field):
+    rows = db.query(Item, User.name).join(User, Item.user_id == User.id).all()
+    page = ItemPage(items=[_to_response(item, owner_name) for item, owner_name in rows], next_cursor=None)
+    # What FastAPI does with a response_model: validate, jsonable_encoder, json.dumps
+    content = asyncio.run(serialize_response(field=field, response_content=page))
+    body = json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+    db.expunge_all()
+    return body
+
+
+def fast_path(db):
+    rows = db.query(*ITEM_ROW_COLUMNS).join(User, Item.user_id == User.id).all()
+    return FastJSONResponse({"items": [_row_response(row) for row in rows], "next_cursor": None}).body
+
+
+def measure(fn, repeat, per):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000 * per
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--output", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    handle, path = tempfile.mkstemp(suffix=".db")
+    os.close(handle)
+    engine = create_engine(f"sqlite:///{path}")
+    try:
+        Base.metadata.create_all(engine)
+        db = sessionmaker(bind=engine)()
+        seed(db, args.items)
+        field = create_response_field(name="Response", type_=ItemPage)
+        assert json.loads(orm_path(db, field)) == json.loads(fast_path(db)), "paths disagree"
+
+        per = 1000 / args.items
+        results = {
+            "items": args.items,
+            "encoder": "orjson" if orjson is not None else "json",
+            "orm_pydantic_ms_per_1k": measure(lambda: orm_path(db, field), args.repeat, per),
+            "rows_fast_json_ms_per_1k": measure(lambda: fast_path(db), args.repeat, per),
+        }
+        db.close()
+    finally:
+        engine.dispose()
+        os.remove(path)
+
+    print(f"{'ORM + pydantic + json':28} {results['orm_pydantic_ms_per_1k']:8.2f} ms / 1k items")
+    print(f"{'rows + ' + results['encoder']:28} {results['rows_fast_json_ms_per_1k']:8.2f} ms / 1k items")
+    print(f"speedup {results['orm_pydantic_ms_per_1k'] / results['rows_fast_json_ms_per_1k']:.1f}x")
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
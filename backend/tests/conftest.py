@@ -0,0 +1,9 @@
+import os
+import tempfile
+
+# The app reads its settings at import time: point it at a throwaway database
+# and spool before any test module imports it
+_scratch = tempfile.mkdtemp(prefix="lostfound-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_scratch, 'app.db')}")
+os.environ.setdefault("AUDIT_SPOOL_DIR", os.path.join(_scratch, "audit_spool"))
+os.environ.setdefault("JOBS_MODE", "off")
@@ -0,0 +1,67 @@
+"""Audit entries are written exactly when the change they describe commits."""
+import pytest
+from sqlalchemy.exc import IntegrityError
+from app import matching
+from app.audit import audit_log
+from app.database import SessionLocal, init_db
+from app.models import Item, ItemCategory, ItemMatch, Log, User
+from app.routes.items import _create_item
+
+
+@pytest.fixture
+def db():
+    init_db()
+    session = SessionLocal()
+    yield session
+    session.rollback()
+    audit_log.flush()
+    session.close()
+
+
+@pytest.fixture
+def user(db):
+    user = User(student_number="audit-test", password="!", name="Audit Test")
+    db.add(user)
+    db.commit()
+    yield user
+    db.query(Log).filter(Log.changed_by == user.id).delete()
+    db.query(Item).filter(Item.user_id == user.id).delete()
+    db.delete(user)
+    db.commit()
+
+
+def _item_data(title):
+    return {"title": title, "description": "black leather wallet", "category": ItemCategory.ACCESSORIES, "location": "Library", "image_hash": None}
+
+
+def _logs_of(db, item_id):
+    audit_log.flush()
+    return [(log.action, log.item_id) for log in db.query(Log).filter(Log.item_id == item_id)]
+
+
+def test_create_is_audited(db, user):
+    item = _create_item(db, _item_data("Wallet"), None, None, user)
+    assert _logs_of(db, item["id"]) == [("CREATE", item["id"])]
+
+
+def test_failed_savepoint_keeps_the_entry(db, user, monkeypatch):
+    # The same pair twice makes the matches savepoint fail with an IntegrityError
+    other = _create_item(db, _item_data("Other wallet"), None, None, user)
+    monkeypatch.setattr(matching, "score_candidates", lambda db, item: [(other["id"], 0.5), (other["id"], 0.4)])
+    item = _create_item(db, _item_data("Wallet"), None, None, user)
+    assert db.query(Item).filter(Item.id == item["id"]).count() == 1
+    assert db.query(ItemMatch).filter(ItemMatch.lost_item_id == item["id"]).count() == 0
+    assert _logs_of(db, item["id"]) == [("CREATE", item["id"])]
+
+
+def test_rolled_back_change_is_not_audited(db, user):
+    db.add(Item(**_item_data("Dropped"), user_id=user.id))
+    db.flush()
+    item_id = db.query(Item.id).filter(Item.title == "Dropped").scalar()
+    audit_log.record(db, item_id=item_id, action="CREATE", changed_by=user.id)
+    with pytest.raises(IntegrityError):
+        # A second account with the same student number fails the whole transaction
+        db.add(User(student_number="audit-test", password="!", name="Duplicate"))
+        db.commit()
+    db.rollback()
+    assert _logs_of(db, item_id) == []
@@ -0,0 +1,155 @@
+"""Query plan regression tests for the queries the item and log routes generate.
+
+Each query is run through EXPLAIN (EXPLAIN QUERY PLAN on SQLite) and fails if
+it reads a whole table or index instead of seeking into an index, or sorts
+rows that an index should have returned in order. By default this seeds a
+small SQLite database; to check a big one, or MySQL, seed it with
+benchmarks.seed_items and point QUERY_PLAN_DATABASE_URL at it:
+
+    python -m benchmarks.seed_items --url sqlite:////tmp/lostfound_1m.db
+    QUERY_PLAN_DATABASE_URL=sqlite:////tmp/lostfound_1m.db python -m pytest tests/test_query_plans.py
+"""
+import os
+import pytest
+from sqlalchemy import create_engine, func, text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from app.matching import candidate_query, matches_query
+from app.models import Item, ItemCategory, ItemStatus, Log, User
+from app.pagination import DEFAULT_PAGE_SIZE, apply_keyset, encode_cursor
+from app.routes.items import _filtered_items_query
+from app.routes.logs import _filtered_logs_query
+from benchmarks.seed_items import seed
+
+QUERY_PLAN_DATABASE_URL = os.getenv("QUERY_PLAN_DATABASE_URL")
+# Enough rows per category and status that ANALYZE statistics favour the indexes
+SEED_ITEMS = 5_000
+SEED_USERS = 200
+
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain)
+def _compile_explain(element, compiler, **kw):
+    prefix = "EXPLAIN QUERY PLAN " if compiler.dialect.name == "sqlite" else "EXPLAIN "
+    return prefix + compiler.process(element.statement, **kw)
+
+
+def page(query, cursor=None):
+    return apply_keyset(query, Item.created_at, Item.id, cursor).limit(DEFAULT_PAGE_SIZE + 1)
+
+
+def audit_page(query):
+    return apply_keyset(query, Log.changed_at, Log.id).limit(DEFAULT_PAGE_SIZE + 1)
+
+
+def route_queries(db, sample):
+    """{name: (query, must_be_index_ordered)} for each query shape the routes run."""
+    lost, cards = ItemStatus.LOST.value, ItemCategory.CARDS.value
+    cursor = encode_cursor(sample.created_at, sample.id)
+    return {
+        "list": (page(_filtered_items_query(db, None, None, None, None)), True),
+        "list next page": (page(_filtered_items_query(db, None, None, None, None), cursor), True),
+        "list by status": (page(_filtered_items_query(db, None, lost, None, None)), True),
+        "list by category": (page(_filtered_items_query(db, cards, None, None, None)), True),
+        "list by status and category": (page(_filtered_items_query(db, cards, lost, None, None), cursor), True),
+        "page etag": (page(_filtered_items_query(db, cards, lost, None, None)).with_entities(Item.id, Item.updated_at), True),
+        "get item": (db.query(Item, User.name).join(User, Item.user_id == User.id).filter(Item.id == sample.id), False),
+        "items of user": (page(db.query(Item).filter(Item.user_id == sample.user_id)), True),
+        "image in use": (db.query(Item.id).filter(Item.image_url == "/static/images/missing.jpg"), False),
+        "match candidates": (candidate_query(db, cards, ItemStatus.FOUND.value, sample.created_at, sample.id), False),
+        "stored matches": (matches_query(db, sample.id).limit(10), False),
+        "logs of item": (db.query(Log).filter(Log.item_id == sample.id).order_by(Log.changed_at.desc()), True),
+        "logs by user": (db.query(Log).filter(Log.changed_by == sample.user_id).order_by(Log.changed_at.desc()).limit(50), True),
+        "audit log": (audit_page(_filtered_logs_query(db, None, None, None, None, None)), True),
+        "audit log since": (audit_page(_filtered_logs_query(db, None, None, None, sample.created_at, None)), True),
+        "audit log of item": (audit_page(_filtered_logs_query(db, sample.id, None, None, None, None)), True),
+        "audit log of user": (audit_page(_filtered_logs_query(db, None, sample.user_id, None, sample.created_at, None)), True),
+    }
+
+
+QUERY_NAMES = (
+    "list", "list next page", "list by status", "list by category", "list by status and category",
+    "page etag", "get item", "items of user", "image in use", "match candidates", "stored matches",
+    "logs of item", "logs by user", "audit log", "audit log since", "audit log of item", "audit log of user",
+)
+
+# Unfiltered first page: walking the created_at index from the newest row and
+# stopping after LIMIT rows is the best plan there is
+MAY_WALK_INDEX = {"list", "audit log"}
+
+
+def plan_problems(dialect, rows, may_walk_index=False):
+    """(scans, sorts) found in an EXPLAIN result.
+
+    A scan is a full table read or, unless may_walk_index, a walk over a whole
+    index, which filters row by row just like a table scan does.
+    """
+    scans, sorts = [], []
+    for row in rows:
+        if dialect == "sqlite":
+            detail = row["detail"]
+            # "SCAN items" reads the table, "SCAN items USING INDEX ..." walks an index,
+            # "SEARCH items USING INDEX ..." seeks into one
+            if detail.startswith("SCAN ") and ("INDEX" not in detail or not may_walk_index):
+                scans.append(detail)
+            if "TEMP B-TREE" in detail:
+                sorts.append(detail)
+        else:
+            if row.get("type") == "ALL" or (row.get("type") == "index" and not may_walk_index):
+                scans.append(f"{row.get('table')}: type={row.get('type')} rows={row.get('rows')}")
+            if "filesort" in (row.get("Extra") or ""):
+                sorts.append(f"{row.get('table')}: {row.get('Extra')}")
+    return scans, sorts
+
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    url = QUERY_PLAN_DATABASE_URL
+    if url is None:
+        url = f"sqlite:///{tmp_path_factory.mktemp('query_plans') / 'plans.db'}"
+    connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+    engine = create_engine(url, connect_args=connect_args)
+    if QUERY_PLAN_DATABASE_URL is None:
+        seed(engine, SEED_ITEMS, SEED_USERS, verbose=False)
+        # Plans as the planner picks them with statistics, the way a live database has them
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(scope="module")
+def queries(engine):
+    db = sessionmaker(bind=engine)()
+    item_count = db.query(func.count(Item.id)).scalar()
+    # A report from the middle of the table, so cursors and time windows are realistic
+    sample = db.query(Item).order_by(Item.id).offset(item_count // 2).first()
+    if sample is None:
+        pytest.skip("No items; seed the database first (python -m benchmarks.seed_items)")
+    yield db, route_queries(db, sample)
+    db.close()
+
+
+@pytest.mark.parametrize("name", QUERY_NAMES)
+def test_query_uses_indexes(queries, name):
+    db, by_name = queries
+    query, ordered = by_name[name]
+    result = db.execute(Explain(query.statement))
+    # Column names from the driver: the result map is the explained query's
+    columns = [description[0] for description in result.cursor.description]
+    rows = [dict(zip(columns, row)) for row in result.fetchall()]
+    scans, sorts = plan_problems(db.bind.dialect.name, rows, name in MAY_WALK_INDEX)
+    problems = scans + (sorts if ordered else [])
+    assert not problems, f"{name}: {problems}"
+
+
+def test_every_route_query_is_checked(queries):
+    db, by_name = queries
+    assert set(by_name) == set(QUERY_NAMES)
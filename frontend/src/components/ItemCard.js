@@ -104,7 +104,13 @@ const ItemCard = ({ item, onStatusUpdate, onItemDelete }) => {
     <div className="item-card">
       {item.image_url && (
         <img 
-          src={`http://localhost:8000${item.image_url}`} 
+          src={`http://localhost:8000${item.thumbnail_url || item.image_url}`} 
+          srcSet={item.srcset && item.srcset
+            .split(', ')
+            .map(candidate => `http://localhost:8000${candidate}`)
+            .join(', ')}
+          sizes="(max-width: 600px) 100vw, 350px"
+          loading="lazy"
           alt={item.title}
           className="item-image"
         />
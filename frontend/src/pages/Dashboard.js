@@ -8,6 +8,7 @@ import '../styles/Dashboard.css';
 
 const Dashboard = () => {
   const [items, setItems] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [stats, setStats] = useState({});
   const [filters, setFilters] = useState({});
   const [showReportForm, setShowReportForm] = useState(false);
@@ -18,15 +19,17 @@ const Dashboard = () => {
     fetchStats();
   }, [filters]);
 
-  const fetchItems = async () => {
+  const fetchItems = async (cursor = null) => {
     try {
       const params = new URLSearchParams();
       Object.entries(filters).forEach(([key, value]) => {
         if (value) params.append(key, value);
       });
+      if (cursor) params.append('cursor', cursor);
 
       const response = await axios.get(`http://localhost:8000/items?${params}`);
-      setItems(response.data);
+      setItems(cursor ? [...items, ...response.data.items] : response.data.items);
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       console.error('Error fetching items:', error);
     } finally {
@@ -92,6 +95,12 @@ const Dashboard = () => {
             onItemDelete={handleItemDelete}
           />
         )}
+
+        {!showReportForm && nextCursor && (
+          <button className="load-more-btn" onClick={() => fetchItems(nextCursor)}>
+            Load more
+          </button>
+        )}
       </div>
     </div>
   );
@@ -33,15 +33,21 @@ CREATE TABLE IF NOT EXISTS items (
     location VARCHAR(255) NULL,
     contact_phone VARCHAR(100),
     image_url VARCHAR(255),
+    image_hash CHAR(16),
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-    FOREIGN KEY (user_id) REFERENCES users(id)
+    FOREIGN KEY (user_id) REFERENCES users(id),
+    INDEX ix_items_image_url (image_url),
+    INDEX ix_items_created_at (created_at),
+    INDEX ix_items_category_created_at (category, created_at),
+    INDEX ix_items_status_created_at (status, created_at),
+    INDEX ix_items_status_category_created_at (status, category, created_at),
+    INDEX ix_items_user_id_created_at (user_id, created_at),
+    INDEX ix_items_user_id_status_created_at (user_id, status, created_at),
+    FULLTEXT INDEX ix_items_fulltext (title, description, location),
+    FULLTEXT INDEX ix_items_location_fulltext (location)
 );
 
-
-select * from logs;
-
-
 -- Logs
 CREATE TABLE IF NOT EXISTS logs (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -51,8 +57,67 @@ CREATE TABLE IF NOT EXISTS logs (
     new_status ENUM('lost','found','claimed'),
     changed_by INT NOT NULL,
     changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (item_id) REFERENCES items(id),
-    FOREIGN KEY (changed_by) REFERENCES users(id)
+    -- item_id has no foreign key so DELETE entries outlive their item
+    FOREIGN KEY (changed_by) REFERENCES users(id),
+    INDEX ix_logs_item_id_changed_at (item_id, changed_at),
+    INDEX ix_logs_changed_by_changed_at (changed_by, changed_at),
+    INDEX ix_logs_changed_at (changed_at)
+);
+
+-- Scored LOST/FOUND pairs (app/matching.py)
+CREATE TABLE IF NOT EXISTS item_matches (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    lost_item_id INT NOT NULL,
+    found_item_id INT NOT NULL,
+    score FLOAT NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (lost_item_id) REFERENCES items(id),
+    FOREIGN KEY (found_item_id) REFERENCES items(id),
+    UNIQUE KEY uq_item_matches_pair (lost_item_id, found_item_id),
+    INDEX ix_item_matches_found_item_id (found_item_id)
+);
+
+-- Unclaimed items archived by the archive_items job (app/jobs.py)
+CREATE TABLE IF NOT EXISTS archived_items (
+    id INT PRIMARY KEY,
+    title VARCHAR(100) NOT NULL,
+    description TEXT,
+    category ENUM('Accessories','Cards','Clothing','Electronics','Others') NOT NULL,
+    status ENUM('lost','found','claimed') NOT NULL,
+    location VARCHAR(255),
+    image_url VARCHAR(255),
+    image_hash CHAR(16),
+    user_id INT NOT NULL,
+    contact_phone VARCHAR(100),
+    created_at DATETIME,
+    updated_at DATETIME,
+    archived_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id),
+    INDEX ix_archived_items_image_url (image_url),
+    INDEX ix_archived_items_user_id (user_id),
+    INDEX ix_archived_items_archived_at (archived_at)
+);
+
+-- Background job runs (app/jobs.py)
+CREATE TABLE IF NOT EXISTS job_runs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    job VARCHAR(50) NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    worker VARCHAR(100) NOT NULL,
+    started_at DATETIME NOT NULL,
+    finished_at DATETIME,
+    duration_ms FLOAT,
+    processed INT DEFAULT 0,
+    error VARCHAR(500),
+    INDEX ix_job_runs_started_at (started_at),
+    INDEX ix_job_runs_job_started_at (job, started_at)
+);
+
+-- Applied migrations (app/migrations.py); the backend records them on startup
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INT PRIMARY KEY,
+    description VARCHAR(255) NOT NULL,
+    applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
 );
 
 -- Insert sample registered students
@@ -61,5 +126,3 @@ INSERT INTO registered_students (student_number, name, email) VALUES
 ('202100860', 'Walefa Bosele', '202100860@spu.ac.za'),
 ('202204500', 'Mothibi Isaac Bantjies', '202204500@spu.ac.za'),
 ('202204682', 'Amogelang Plaatje', '202204682@spu.ac.za');
-
-;